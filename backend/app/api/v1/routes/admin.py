@@ -23,14 +23,16 @@ from app.schemas.admin_schema import (
     ImprovementDataListResponse,
     ImprovementDataItem,
 )
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_claims
+from app.services.authz import AuthClaims
+from app.core.cache import cached
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-def require_admin(current_user: User = Depends(get_current_user)):
+def require_admin(current_user: AuthClaims = Depends(get_current_claims)):
     """Dependency to ensure user is admin"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -40,86 +42,97 @@ def require_admin(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+STATISTICS_CACHE_TTL = 60  # seconds
+
+
+@cached("admin:statistics", ttl=STATISTICS_CACHE_TTL, key=lambda db: "general")
+def compute_general_statistics(db: Session) -> StatisticsResponse:
+    """Run the dashboard aggregate queries"""
+    # Total chats
+    total_chats = db.query(func.count(ChatSession.id)).scalar() or 0
+    
+    # Average user rating from ChatFeedback
+    avg_user_rating_result = db.query(func.avg(ChatFeedback.rating)).scalar()
+    avg_user_rating = float(avg_user_rating_result) if avg_user_rating_result else 0.0
+    
+    # Problems solved percentage
+    if total_chats > 0:
+        solved_count = db.query(func.count(ChatSession.id)).filter(
+            ChatSession.problem_solved == True
+        ).scalar() or 0
+        problems_solved_percent = (solved_count / total_chats) * 100
+    else:
+        problems_solved_percent = 0.0
+    
+    # Technician dispatch percentage
+    if total_chats > 0:
+        dispatched_count = db.query(func.count(ChatSession.id)).filter(
+            ChatSession.technician_dispatched == True
+        ).scalar() or 0
+        technician_dispatch_percent = (dispatched_count / total_chats) * 100
+    else:
+        technician_dispatch_percent = 0.0
+    
+    # Technician feedback stats
+    total_tech_feedback = db.query(func.count(TechnicianFeedback.id)).scalar() or 0
+    
+    if total_tech_feedback > 0:
+        # Diagnosis accuracy
+        correct_diagnosis = db.query(func.count(TechnicianFeedback.id)).filter(
+            TechnicianFeedback.diagnosis_correct == True
+        ).scalar() or 0
+        diagnosis_accuracy_percent = (correct_diagnosis / total_tech_feedback) * 100
+        
+        # Parts accuracy
+        sufficient_parts = db.query(func.count(TechnicianFeedback.id)).filter(
+            TechnicianFeedback.parts_sufficient == True
+        ).scalar() or 0
+        parts_accuracy_percent = (sufficient_parts / total_tech_feedback) * 100
+        
+        # Average technician rating
+        avg_tech_rating_result = db.query(func.avg(TechnicianFeedback.rating)).scalar()
+        avg_tech_rating = float(avg_tech_rating_result) if avg_tech_rating_result else 0.0
+    else:
+        diagnosis_accuracy_percent = 0.0
+        parts_accuracy_percent = 0.0
+        avg_tech_rating = 0.0
+    
+    # User counts
+    total_users = db.query(func.count(User.id)).filter(User.role == "user").scalar() or 0
+    total_technicians = db.query(func.count(User.id)).filter(User.role == "technician").scalar() or 0
+    total_feedback_count = db.query(func.count(ChatFeedback.id)).scalar() or 0
+    
+    statistics = GeneralStatistics(
+        total_chats=total_chats,
+        average_user_rating=round(avg_user_rating, 2),
+        problems_solved_percent=round(problems_solved_percent, 1),
+        technician_dispatch_percent=round(technician_dispatch_percent, 1),
+        diagnosis_accuracy_percent=round(diagnosis_accuracy_percent, 1),
+        parts_accuracy_percent=round(parts_accuracy_percent, 1),
+        average_technician_rating=round(avg_tech_rating, 2),
+        total_users=total_users,
+        total_technicians=total_technicians,
+        total_feedback_count=total_feedback_count
+    )
+    
+    return StatisticsResponse(
+        statistics=statistics,
+        last_updated=datetime.utcnow()
+    )
+
+
 @router.get("/statistics", response_model=StatisticsResponse)
-async def get_general_statistics(
+def get_general_statistics(
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    current_user: AuthClaims = Depends(require_admin)
 ):
     """
     Get general platform statistics for admin dashboard.
+    Cached for a minute with stampede protection; ``last_updated`` tells
+    when the numbers were computed.
     """
     try:
-        # Total chats
-        total_chats = db.query(func.count(ChatSession.id)).scalar() or 0
-        
-        # Average user rating from ChatFeedback
-        avg_user_rating_result = db.query(func.avg(ChatFeedback.rating)).scalar()
-        avg_user_rating = float(avg_user_rating_result) if avg_user_rating_result else 0.0
-        
-        # Problems solved percentage
-        if total_chats > 0:
-            solved_count = db.query(func.count(ChatSession.id)).filter(
-                ChatSession.problem_solved == True
-            ).scalar() or 0
-            problems_solved_percent = (solved_count / total_chats) * 100
-        else:
-            problems_solved_percent = 0.0
-        
-        # Technician dispatch percentage
-        if total_chats > 0:
-            dispatched_count = db.query(func.count(ChatSession.id)).filter(
-                ChatSession.technician_dispatched == True
-            ).scalar() or 0
-            technician_dispatch_percent = (dispatched_count / total_chats) * 100
-        else:
-            technician_dispatch_percent = 0.0
-        
-        # Technician feedback stats
-        total_tech_feedback = db.query(func.count(TechnicianFeedback.id)).scalar() or 0
-        
-        if total_tech_feedback > 0:
-            # Diagnosis accuracy
-            correct_diagnosis = db.query(func.count(TechnicianFeedback.id)).filter(
-                TechnicianFeedback.diagnosis_correct == True
-            ).scalar() or 0
-            diagnosis_accuracy_percent = (correct_diagnosis / total_tech_feedback) * 100
-            
-            # Parts accuracy
-            sufficient_parts = db.query(func.count(TechnicianFeedback.id)).filter(
-                TechnicianFeedback.parts_sufficient == True
-            ).scalar() or 0
-            parts_accuracy_percent = (sufficient_parts / total_tech_feedback) * 100
-            
-            # Average technician rating
-            avg_tech_rating_result = db.query(func.avg(TechnicianFeedback.rating)).scalar()
-            avg_tech_rating = float(avg_tech_rating_result) if avg_tech_rating_result else 0.0
-        else:
-            diagnosis_accuracy_percent = 0.0
-            parts_accuracy_percent = 0.0
-            avg_tech_rating = 0.0
-        
-        # User counts
-        total_users = db.query(func.count(User.id)).filter(User.role == "user").scalar() or 0
-        total_technicians = db.query(func.count(User.id)).filter(User.role == "technician").scalar() or 0
-        total_feedback_count = db.query(func.count(ChatFeedback.id)).scalar() or 0
-        
-        statistics = GeneralStatistics(
-            total_chats=total_chats,
-            average_user_rating=round(avg_user_rating, 2),
-            problems_solved_percent=round(problems_solved_percent, 1),
-            technician_dispatch_percent=round(technician_dispatch_percent, 1),
-            diagnosis_accuracy_percent=round(diagnosis_accuracy_percent, 1),
-            parts_accuracy_percent=round(parts_accuracy_percent, 1),
-            average_technician_rating=round(avg_tech_rating, 2),
-            total_users=total_users,
-            total_technicians=total_technicians,
-            total_feedback_count=total_feedback_count
-        )
-        
-        return StatisticsResponse(
-            statistics=statistics,
-            last_updated=datetime.utcnow()
-        )
+        return compute_general_statistics(db)
     
     except Exception as e:
         logger.error(f"Error fetching statistics: {e}")
@@ -130,11 +143,11 @@ async def get_general_statistics(
 
 
 @router.get("/user-feedback", response_model=UserFeedbackListResponse)
-async def get_user_feedback(
+def get_user_feedback(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    current_user: AuthClaims = Depends(require_admin)
 ):
     """
     Get paginated list of user feedback for admin review.
@@ -190,11 +203,11 @@ async def get_user_feedback(
 
 
 @router.get("/technician-feedback", response_model=TechnicianFeedbackListResponse)
-async def get_technician_feedback(
+def get_technician_feedback(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    current_user: AuthClaims = Depends(require_admin)
 ):
     """
     Get paginated list of technician feedback for admin review.
@@ -272,12 +285,12 @@ async def get_technician_feedback(
 
 
 @router.get("/improvement-data", response_model=ImprovementDataListResponse)
-async def get_improvement_data(
+def get_improvement_data(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     unused_only: bool = Query(False),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    current_user: AuthClaims = Depends(require_admin)
 ):
     """
     Get paginated list of improvement data for model training.
@@ -27,6 +27,7 @@ def create_appointment(
     - If created by a technician, it's for a specified customer and assigned to the technician.
     """
     # Allow users, admins, and technicians to create appointments
+    # (guests are refused, so an ephemeral guest never needs materializing here)
     allowed_roles = ["user", "admin", "technician", "senior_technician", "branch_manager", "enterprise_admin"]
     user_role = getattr(current_user, 'enterprise_role', getattr(current_user, 'role', ''))
     if not user_role:
@@ -3,14 +3,17 @@ Authentication endpoints for V-Fix API
 Includes registration, login, logout, session management, and login history
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import logging
 
 from app import models, schemas
 from app.database import get_db
 from app.core.security import verify_token, AUTH_RATE_LIMITS, get_rate_limit_decorator
-from app.core.dependencies import get_current_user
-from app.services import AuthService
+from app.core.password_pool import PasswordPoolOverloaded
+from app.core.dependencies import get_current_user, password_pool_busy
+from app.services import AuthService, guest_sessions
+from app.services.login_throttle import LoginThrottled
 
 logger = logging.getLogger(__name__)
 
@@ -31,15 +34,19 @@ async def register(request: Request, user_data: schemas.UserRegister, db: Sessio
     """
     try:
         auth_service = AuthService(db)
-        user, access_token, jti = auth_service.register_user(user_data, request)
+        # Password hashing blocks; keep it off the event loop
+        user, access_token, jti = await run_in_threadpool(auth_service.register_user, user_data, request)
         
         logger.info(f"User registered: {user.email}")
         
         return {
             "user": schemas.UserResponse.model_validate(user),
             "access_token": access_token,
-            "token_type": "bearer"
+            "token_type": "bearer",
+            "refresh_token": auth_service.issue_refresh_token(user.id, jti)
         }
+    except PasswordPoolOverloaded:
+        raise password_pool_busy()
     except ValueError as e:
         if "already exists" in str(e) or "kullanılıyor" in str(e):
             raise HTTPException(
@@ -63,17 +70,28 @@ async def login(request: Request, credentials: schemas.UserLogin, db: Session =
     """
     try:
         auth_service = AuthService(db)
-        user, access_token, jti = auth_service.login_user(credentials.email, credentials.password, request)
+        user, access_token, jti = await run_in_threadpool(
+            auth_service.login_user, credentials.email, credentials.password, request
+        )
         
         logger.info(f"User logged in: {user.email} (role: {user.role})")
         
         return {
             "access_token": access_token,
             "token_type": "bearer",
+            "refresh_token": auth_service.issue_refresh_token(user.id, jti),
             "role": user.role,
             "enterprise_id": str(user.enterprise_id) if user.enterprise_id else None,
             "enterprise_role": user.enterprise_role
         }
+    except PasswordPoolOverloaded:
+        raise password_pool_busy()
+    except LoginThrottled as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except ValueError as e:
         error_message = str(e)
         # Check for specific error types
@@ -101,8 +119,37 @@ async def login(request: Request, credentials: schemas.UserLogin, db: Session =
         )
 
 
+@router.post("/refresh", response_model=schemas.TokenResponse)
+@get_rate_limit_decorator(AUTH_RATE_LIMITS["refresh"])
+def refresh(request: Request, refresh_data: schemas.RefreshTokenRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token.
+    
+    The refresh token is rotated: the response carries its replacement and
+    the old one stops working. Reusing an old refresh token revokes the
+    session.
+    """
+    auth_service = AuthService(db)
+    try:
+        user, access_token, refresh_token = auth_service.refresh_access_token(refresh_data.refresh_token)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "role": user.role,
+        "enterprise_id": str(user.enterprise_id) if user.enterprise_id else None,
+        "enterprise_role": user.enterprise_role
+    }
+
+
 @router.post("/google", response_model=schemas.TokenResponse)
-async def google_login(google_data: schemas.GoogleLogin, db: Session = Depends(get_db)):
+def google_login(google_data: schemas.GoogleLogin, db: Session = Depends(get_db)):
     # In a real implementation, you would verify the Google token here
     # For now, we'll return an error for invalid tokens
     if not google_data.token or len(google_data.token) < 10:
@@ -123,11 +170,11 @@ async def google_login(google_data: schemas.GoogleLogin, db: Session = Depends(g
 
 @router.post("/guest", response_model=schemas.TokenResponse)
 @get_rate_limit_decorator(AUTH_RATE_LIMITS["guest_login"])
-async def guest_login(request: Request, guest_data: schemas.GuestLogin, db: Session = Depends(get_db)):
+def guest_login(request: Request, guest_data: schemas.GuestLogin, db: Session = Depends(get_db)):
     """
     Guest login with product barcode.
     
-    Creates temporary guest account for accessing product-specific features.
+    Starts a temporary guest session for accessing product-specific features.
     """
     try:
         auth_service = AuthService(db)
@@ -149,7 +196,7 @@ async def guest_login(request: Request, guest_data: schemas.GuestLogin, db: Sess
 
 @router.post("/password-reset")
 @get_rate_limit_decorator(AUTH_RATE_LIMITS["password_reset"])
-async def password_reset(request: Request, reset_request: schemas.PasswordResetRequest, db: Session = Depends(get_db)):
+def password_reset(request: Request, reset_request: schemas.PasswordResetRequest, db: Session = Depends(get_db)):
     """
     Request password reset link.
     
@@ -168,7 +215,7 @@ async def password_reset(request: Request, reset_request: schemas.PasswordResetR
 
 
 @router.post("/logout")
-async def logout(
+def logout(
     request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -180,7 +227,9 @@ async def logout(
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
     payload = verify_token(token)
     
-    if payload and payload.get("jti"):
+    if payload and payload.get("guest"):
+        guest_sessions.end_guest(current_user.id)
+    elif payload and payload.get("jti"):
         session_repo = SessionRepository(db)
         session = session_repo.get_by_token_id(payload.get("jti"))
         if session:
@@ -193,7 +242,7 @@ async def logout(
 # Session Management Endpoints
 @router.get("/sessions", response_model=schemas.SessionsListResponse)
 @get_rate_limit_decorator("30/hour")
-async def get_sessions(
+def get_sessions(
     request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -235,7 +284,7 @@ async def get_sessions(
 
 @router.delete("/sessions/{session_id}")
 @get_rate_limit_decorator("10/hour")
-async def revoke_session(
+def revoke_session(
     request: Request,
     session_id: str,
     current_user: models.User = Depends(get_current_user),
@@ -261,7 +310,7 @@ async def revoke_session(
 
 @router.post("/sessions/revoke-all")
 @get_rate_limit_decorator("5/hour")
-async def revoke_all_sessions(
+def revoke_all_sessions(
     request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -289,7 +338,7 @@ async def revoke_all_sessions(
 # Login History Endpoint
 @router.get("/login-history", response_model=schemas.LoginHistoryListResponse)
 @get_rate_limit_decorator("30/hour")
-async def get_login_history(
+def get_login_history(
     request: Request,
     limit: int = 50,
     current_user: models.User = Depends(get_current_user),
@@ -28,14 +28,16 @@ from app.schemas.branch_manager_schema import (
     ReassignTechnicianRequest,
     BranchTechnician,
 )
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_claims
+from app.services.authz import AuthClaims
+from app.core.cache import cached
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-def require_branch_manager(current_user: User = Depends(get_current_user)):
+def require_branch_manager(current_user: AuthClaims = Depends(get_current_claims)):
     """Dependency to ensure user is a branch manager"""
     if current_user.enterprise_role != "branch_manager":
         raise HTTPException(
@@ -50,133 +52,146 @@ def require_branch_manager(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-@router.get("/statistics", response_model=BranchStatisticsResponse)
-async def get_branch_statistics(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_branch_manager)
-):
-    """
-    Get branch statistics including technician performance.
-    """
-    try:
-        branch_id = current_user.branch_id
-        
-        # Get branch info
-        branch = db.query(Branch).filter(Branch.id == branch_id).first()
-        if not branch:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Şube bulunamadı"
-            )
-        
-        # Get all technicians in the branch
-        technicians = db.query(User).filter(
-            User.branch_id == branch_id,
-            User.enterprise_role.in_(["technician", "senior_technician"]),
-            User.is_active == True
-        ).all()
-        
-        technician_ids = [t.id for t in technicians]
-        
-        # Get all appointments for branch technicians
-        total_appointments = db.query(func.count(Appointment.id)).filter(
-            Appointment.technician_id.in_(technician_ids)
-        ).scalar() or 0
+STATISTICS_CACHE_TTL = 60  # seconds
+
+
+@cached(
+    "branch:statistics",
+    ttl=STATISTICS_CACHE_TTL,
+    key=lambda db, branch_id: str(branch_id),
+    tags=lambda db, branch_id: [f"branch:{branch_id}"],
+)
+def compute_branch_statistics(db: Session, branch_id: UUID) -> BranchStatisticsResponse:
+    """Run the branch dashboard queries (technician performance included)"""
+    # Get branch info
+    branch = db.query(Branch).filter(Branch.id == branch_id).first()
+    if not branch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Şube bulunamadı"
+        )
+    
+    # Get all technicians in the branch
+    technicians = db.query(User).filter(
+        User.branch_id == branch_id,
+        User.enterprise_role.in_(["technician", "senior_technician"]),
+        User.is_active == True
+    ).all()
+    
+    technician_ids = [t.id for t in technicians]
+    
+    # Get all appointments for branch technicians
+    total_appointments = db.query(func.count(Appointment.id)).filter(
+        Appointment.technician_id.in_(technician_ids)
+    ).scalar() or 0
+    
+    completed_appointments = db.query(func.count(Appointment.id)).filter(
+        Appointment.technician_id.in_(technician_ids),
+        Appointment.status == AppointmentStatus.COMPLETED
+    ).scalar() or 0
+    
+    pending_appointments = db.query(func.count(Appointment.id)).filter(
+        Appointment.technician_id.in_(technician_ids),
+        Appointment.status.in_([AppointmentStatus.PENDING, AppointmentStatus.SCHEDULED])
+    ).scalar() or 0
+    
+    # Get feedback statistics for branch
+    total_feedbacks = db.query(func.count(TechnicianFeedback.id)).filter(
+        TechnicianFeedback.technician_id.in_(technician_ids)
+    ).scalar() or 0
+    
+    if total_feedbacks > 0:
+        avg_rating_result = db.query(func.avg(TechnicianFeedback.rating)).filter(
+            TechnicianFeedback.technician_id.in_(technician_ids)
+        ).scalar()
+        avg_rating = float(avg_rating_result) if avg_rating_result else 0.0
         
-        completed_appointments = db.query(func.count(Appointment.id)).filter(
-            Appointment.technician_id.in_(technician_ids),
-            Appointment.status == AppointmentStatus.COMPLETED
+        correct_diagnosis = db.query(func.count(TechnicianFeedback.id)).filter(
+            TechnicianFeedback.technician_id.in_(technician_ids),
+            TechnicianFeedback.diagnosis_correct == True
         ).scalar() or 0
+        diagnosis_accuracy = (correct_diagnosis / total_feedbacks) * 100
         
-        pending_appointments = db.query(func.count(Appointment.id)).filter(
-            Appointment.technician_id.in_(technician_ids),
-            Appointment.status.in_([AppointmentStatus.PENDING, AppointmentStatus.SCHEDULED])
+        sufficient_parts = db.query(func.count(TechnicianFeedback.id)).filter(
+            TechnicianFeedback.technician_id.in_(technician_ids),
+            TechnicianFeedback.parts_sufficient == True
         ).scalar() or 0
-        
-        # Get feedback statistics for branch
-        total_feedbacks = db.query(func.count(TechnicianFeedback.id)).filter(
-            TechnicianFeedback.technician_id.in_(technician_ids)
+        parts_accuracy = (sufficient_parts / total_feedbacks) * 100
+    else:
+        avg_rating = 0.0
+        diagnosis_accuracy = 0.0
+        parts_accuracy = 0.0
+    
+    # Build technician ratings list
+    technician_ratings = []
+    for tech in technicians:
+        tech_feedbacks = db.query(func.count(TechnicianFeedback.id)).filter(
+            TechnicianFeedback.technician_id == tech.id
         ).scalar() or 0
         
-        if total_feedbacks > 0:
-            avg_rating_result = db.query(func.avg(TechnicianFeedback.rating)).filter(
-                TechnicianFeedback.technician_id.in_(technician_ids)
+        if tech_feedbacks > 0:
+            tech_avg = db.query(func.avg(TechnicianFeedback.rating)).filter(
+                TechnicianFeedback.technician_id == tech.id
             ).scalar()
-            avg_rating = float(avg_rating_result) if avg_rating_result else 0.0
+            tech_avg_rating = float(tech_avg) if tech_avg else 0.0
             
-            correct_diagnosis = db.query(func.count(TechnicianFeedback.id)).filter(
-                TechnicianFeedback.technician_id.in_(technician_ids),
+            tech_correct = db.query(func.count(TechnicianFeedback.id)).filter(
+                TechnicianFeedback.technician_id == tech.id,
                 TechnicianFeedback.diagnosis_correct == True
             ).scalar() or 0
-            diagnosis_accuracy = (correct_diagnosis / total_feedbacks) * 100
+            tech_diagnosis = (tech_correct / tech_feedbacks) * 100
             
-            sufficient_parts = db.query(func.count(TechnicianFeedback.id)).filter(
-                TechnicianFeedback.technician_id.in_(technician_ids),
+            tech_parts = db.query(func.count(TechnicianFeedback.id)).filter(
+                TechnicianFeedback.technician_id == tech.id,
                 TechnicianFeedback.parts_sufficient == True
             ).scalar() or 0
-            parts_accuracy = (sufficient_parts / total_feedbacks) * 100
+            tech_parts_acc = (tech_parts / tech_feedbacks) * 100
         else:
-            avg_rating = 0.0
-            diagnosis_accuracy = 0.0
-            parts_accuracy = 0.0
-        
-        # Build technician ratings list
-        technician_ratings = []
-        for tech in technicians:
-            tech_feedbacks = db.query(func.count(TechnicianFeedback.id)).filter(
-                TechnicianFeedback.technician_id == tech.id
-            ).scalar() or 0
-            
-            if tech_feedbacks > 0:
-                tech_avg = db.query(func.avg(TechnicianFeedback.rating)).filter(
-                    TechnicianFeedback.technician_id == tech.id
-                ).scalar()
-                tech_avg_rating = float(tech_avg) if tech_avg else 0.0
-                
-                tech_correct = db.query(func.count(TechnicianFeedback.id)).filter(
-                    TechnicianFeedback.technician_id == tech.id,
-                    TechnicianFeedback.diagnosis_correct == True
-                ).scalar() or 0
-                tech_diagnosis = (tech_correct / tech_feedbacks) * 100
-                
-                tech_parts = db.query(func.count(TechnicianFeedback.id)).filter(
-                    TechnicianFeedback.technician_id == tech.id,
-                    TechnicianFeedback.parts_sufficient == True
-                ).scalar() or 0
-                tech_parts_acc = (tech_parts / tech_feedbacks) * 100
-            else:
-                tech_avg_rating = 0.0
-                tech_diagnosis = 0.0
-                tech_parts_acc = 0.0
-            
-            technician_ratings.append(TechnicianRating(
-                technician_id=tech.id,
-                technician_name=tech.full_name or tech.username,
-                employee_id=tech.employee_id,
-                total_feedbacks=tech_feedbacks,
-                average_rating=round(tech_avg_rating, 2),
-                diagnosis_accuracy=round(tech_diagnosis, 1),
-                parts_accuracy=round(tech_parts_acc, 1)
-            ))
-        
-        statistics = BranchStatistics(
-            branch_id=branch_id,
-            branch_name=branch.name,
-            total_technicians=len(technicians),
-            total_appointments=total_appointments,
-            completed_appointments=completed_appointments,
-            pending_appointments=pending_appointments,
-            average_rating=round(avg_rating, 2),
-            diagnosis_accuracy=round(diagnosis_accuracy, 1),
-            parts_accuracy=round(parts_accuracy, 1),
-            total_feedbacks=total_feedbacks
-        )
-        
-        return BranchStatisticsResponse(
-            statistics=statistics,
-            technician_ratings=technician_ratings,
-            last_updated=datetime.utcnow()
-        )
+            tech_avg_rating = 0.0
+            tech_diagnosis = 0.0
+            tech_parts_acc = 0.0
+        
+        technician_ratings.append(TechnicianRating(
+            technician_id=tech.id,
+            technician_name=tech.full_name or tech.username,
+            employee_id=tech.employee_id,
+            total_feedbacks=tech_feedbacks,
+            average_rating=round(tech_avg_rating, 2),
+            diagnosis_accuracy=round(tech_diagnosis, 1),
+            parts_accuracy=round(tech_parts_acc, 1)
+        ))
+    
+    statistics = BranchStatistics(
+        branch_id=branch_id,
+        branch_name=branch.name,
+        total_technicians=len(technicians),
+        total_appointments=total_appointments,
+        completed_appointments=completed_appointments,
+        pending_appointments=pending_appointments,
+        average_rating=round(avg_rating, 2),
+        diagnosis_accuracy=round(diagnosis_accuracy, 1),
+        parts_accuracy=round(parts_accuracy, 1),
+        total_feedbacks=total_feedbacks
+    )
+    
+    return BranchStatisticsResponse(
+        statistics=statistics,
+        technician_ratings=technician_ratings,
+        last_updated=datetime.utcnow()
+    )
+
+
+@router.get("/statistics", response_model=BranchStatisticsResponse)
+def get_branch_statistics(
+    db: Session = Depends(get_db),
+    current_user: AuthClaims = Depends(require_branch_manager)
+):
+    """
+    Get branch statistics including technician performance.
+    Cached for a minute per branch.
+    """
+    try:
+        return compute_branch_statistics(db, current_user.branch_id)
     
     except HTTPException:
         raise
@@ -189,12 +204,12 @@ async def get_branch_statistics(
 
 
 @router.get("/appointments", response_model=AppointmentCalendarResponse)
-async def get_branch_appointments(
+def get_branch_appointments(
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
     technician_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_branch_manager)
+    current_user: AuthClaims = Depends(require_branch_manager)
 ):
     """
     Get appointments for branch calendar view.
@@ -291,12 +306,12 @@ async def get_branch_appointments(
 
 
 @router.get("/vacations", response_model=VacationListResponse)
-async def get_branch_vacations(
+def get_branch_vacations(
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
     employee_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_branch_manager)
+    current_user: AuthClaims = Depends(require_branch_manager)
 ):
     """
     Get vacations for branch employees.
@@ -358,12 +373,12 @@ async def get_branch_vacations(
 
 
 @router.get("/technician-feedback", response_model=TechnicianFeedbackListResponse)
-async def get_branch_technician_feedback(
+def get_branch_technician_feedback(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     technician_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_branch_manager)
+    current_user: AuthClaims = Depends(require_branch_manager)
 ):
     """
     Get technician feedback for the branch.
@@ -438,9 +453,9 @@ async def get_branch_technician_feedback(
 
 
 @router.get("/technicians", response_model=list[BranchTechnician])
-async def get_branch_technicians(
+def get_branch_technicians(
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_branch_manager)
+    current_user: AuthClaims = Depends(require_branch_manager)
 ):
     """
     Get list of technicians in the branch with vacation status.
@@ -485,11 +500,11 @@ async def get_branch_technicians(
 
 
 @router.post("/appointments/{appointment_id}/reassign")
-async def reassign_appointment(
+def reassign_appointment(
     appointment_id: int,
     reassign_data: ReassignTechnicianRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_branch_manager)
+    current_user: AuthClaims = Depends(require_branch_manager)
 ):
     """
     Reassign a technician to an appointment.
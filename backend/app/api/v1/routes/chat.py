@@ -4,7 +4,7 @@ from typing import List
 from uuid import UUID
 
 from app import schemas, models
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, get_persistent_user
 from app.database import get_db
 from app.services.chat_service import ChatService
 
@@ -16,9 +16,9 @@ router = APIRouter()
     response_model=schemas.ChatFeedbackResponse,
     status_code=status.HTTP_201_CREATED,
 )
-async def submit_feedback(
+def submit_feedback(
     feedback: schemas.ChatFeedbackCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: models.User = Depends(get_persistent_user),
     db: Session = Depends(get_db),
 ):
     """Create or update feedback for a chat session."""
@@ -35,7 +35,7 @@ async def submit_feedback(
     response_model=schemas.ChatFeedbackResponse,
     status_code=status.HTTP_200_OK,
 )
-async def get_feedback_for_session(
+def get_feedback_for_session(
     session_id: str,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -56,7 +56,7 @@ async def get_feedback_for_session(
     response_model=schemas.ChatFeedbackListResponse,
     status_code=status.HTTP_200_OK,
 )
-async def list_feedback(
+def list_feedback(
     limit: int = Query(50, ge=1, le=200),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -73,9 +73,9 @@ async def list_feedback(
     response_model=schemas.ChatSessionResponse,
     status_code=status.HTTP_201_CREATED,
 )
-async def create_session(
+def create_session(
     payload: schemas.ChatSessionCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: models.User = Depends(get_persistent_user),
     db: Session = Depends(get_db),
 ):
     """Create a new chat session."""
@@ -89,7 +89,7 @@ async def create_session(
     response_model=schemas.ChatSessionListResponse,
     status_code=status.HTTP_200_OK,
 )
-async def list_sessions(
+def list_sessions(
     limit: int = Query(50, ge=1, le=200),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -105,7 +105,7 @@ async def list_sessions(
     response_model=schemas.ChatSessionWithMessagesResponse,
     status_code=status.HTTP_200_OK,
 )
-async def get_session(
+def get_session(
     session_id: UUID,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -144,7 +144,7 @@ async def get_session(
     response_model=schemas.ChatSessionResponse,
     status_code=status.HTTP_200_OK,
 )
-async def update_session(
+def update_session(
     session_id: UUID,
     payload: schemas.ChatSessionUpdate,
     current_user: models.User = Depends(get_current_user),
@@ -165,7 +165,7 @@ async def update_session(
     "/sessions/{session_id}",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-async def delete_session(
+def delete_session(
     session_id: UUID,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -186,7 +186,7 @@ async def delete_session(
     response_model=schemas.ChatMessageResponse,
     status_code=status.HTTP_201_CREATED,
 )
-async def add_message(
+def add_message(
     session_id: UUID,
     payload: schemas.ChatMessageCreate,
     current_user: models.User = Depends(get_current_user),
@@ -2,12 +2,15 @@
 Enterprise API routes for organization management
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import logging
 
 from app.database import get_db
 from app import schemas
 from app.services.enterprise_service import EnterpriseService
+from app.core.password_pool import PasswordPoolOverloaded
+from app.core.dependencies import password_pool_busy
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +33,10 @@ async def register_enterprise(
     """
     try:
         service = EnterpriseService(db)
-        user, enterprise, branch, access_token, jti = service.register_enterprise_user(user_data, request)
+        # Password hashing blocks; keep it off the event loop
+        user, enterprise, branch, access_token, jti = await run_in_threadpool(
+            service.register_enterprise_user, user_data, request
+        )
         
         logger.info(f"Enterprise user registered: {user.email} ({user.enterprise_role}) in {enterprise.name}/{branch.name}")
         
@@ -41,6 +47,8 @@ async def register_enterprise(
             access_token=access_token,
             token_type="bearer"
         )
+    except PasswordPoolOverloaded:
+        raise password_pool_busy()
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -3,6 +3,7 @@ System endpoints for V-Fix API
 Includes health checks, metrics, and system monitoring
 """
 from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import logging
@@ -37,7 +38,7 @@ async def health_check(db: Session = Depends(get_db)):
     - Database connectivity
     - Cache availability
     """
-    from app.core.cache import cache
+    from app.core.async_cache import async_cache
     
     health_status = {
         "status": "ok",
@@ -49,7 +50,7 @@ async def health_check(db: Session = Depends(get_db)):
     
     # Database check
     try:
-        db.execute(text("SELECT 1"))
+        await run_in_threadpool(db.execute, text("SELECT 1"))
         health_status["checks"]["database"] = "healthy"
     except Exception as e:
         health_status["checks"]["database"] = f"unhealthy: {str(e)}"
@@ -59,9 +60,9 @@ async def health_check(db: Session = Depends(get_db)):
     # Cache check
     try:
         test_key = "_health_check"
-        cache.set(test_key, "test", ttl=10)
-        result = cache.get(test_key)
-        cache.delete(test_key)
+        await async_cache.set(test_key, "test", ttl=10)
+        result = await async_cache.get(test_key)
+        await async_cache.delete(test_key)
         health_status["checks"]["cache"] = "healthy" if result else "unavailable"
     except Exception as e:
         health_status["checks"]["cache"] = "unavailable"
@@ -71,12 +72,22 @@ async def health_check(db: Session = Depends(get_db)):
 
 
 @router.get("/metrics")
-async def metrics(db: Session = Depends(get_db)):
+def metrics(db: Session = Depends(get_db)):
     """
     Basic metrics endpoint for monitoring.
     
     Returns application metrics for observability.
     """
+    from app.core.cache import cache, cached_stats
+    from app.services.barcode_filter import barcode_filter
+    from app.services.write_behind import write_behind
+    from app.core.password_pool import password_pool
+    from app.core.password_hasher import password_policy
+    from app.services.revocation import revocation_registry
+    from app.services.retention import retention_scheduler
+    from app.database import replica_pool
+    from app.database.write_queue import write_queue
+    
     user_repo = UserRepository(db)
     
     # Calculate metrics
@@ -93,7 +104,17 @@ async def metrics(db: Session = Depends(get_db)):
             "timestamp": datetime.utcnow().isoformat(),
             "metrics": {
                 "active_users": active_users_count,
-                "new_users_24h": new_users_24h
+                "new_users_24h": new_users_24h,
+                "cache": cache.stats(),
+                "cached_functions": cached_stats(),
+                "barcode_filter": barcode_filter.stats(),
+                "write_behind": write_behind.stats(),
+                "password_pool": password_pool.stats(),
+                "password_policy": password_policy.stats(),
+                "revocation": revocation_registry.stats(),
+                "retention": retention_scheduler.stats(),
+                "replicas": replica_pool.stats(),
+                "write_queue": write_queue.stats()
             }
         }
         
@@ -12,7 +12,7 @@ from app.core.dependencies import get_current_user, get_db, require_technician
 from app.services.repositories import UserRepository
 from app.services.technician_service import TechnicianService
 from app.database import get_db
-from app.models.user import User
+from app.services.authz import AuthClaims
 from app.models.vacation import VacationType, Vacation, VacationStatus
 
 logger = logging.getLogger(__name__)
@@ -77,7 +77,7 @@ def get_all_technicians(
 
 @router.get("/vacations", response_model=schemas.VacationListResponse)
 def get_my_vacations(
-    current_user: User = Depends(require_technician),
+    current_user: AuthClaims = Depends(require_technician),
     db: Session = Depends(get_db)
 ):
     """
@@ -96,7 +96,7 @@ def get_my_vacations(
 @router.post("/vacations", response_model=schemas.VacationResponse, status_code=status.HTTP_201_CREATED)
 def request_vacation(
     vacation_data: schemas.VacationRequest,
-    current_user: User = Depends(require_technician),
+    current_user: AuthClaims = Depends(require_technician),
     db: Session = Depends(get_db)
 ):
     """
@@ -137,7 +137,7 @@ def request_vacation(
 @router.delete("/vacations/{vacation_id}", status_code=status.HTTP_204_NO_CONTENT)
 def cancel_vacation_request(
     vacation_id: UUID,
-    current_user: User = Depends(require_technician),
+    current_user: AuthClaims = Depends(require_technician),
     db: Session = Depends(get_db)
 ):
     """
@@ -173,7 +173,7 @@ def cancel_vacation_request(
 )
 def submit_feedback(
     feedback_data: schemas.TechnicianFeedbackCreate,
-    current_user: User = Depends(require_technician),
+    current_user: AuthClaims = Depends(require_technician),
     db: Session = Depends(get_db),
 ):
     """Submit technician feedback after a field visit."""
@@ -192,7 +192,7 @@ def submit_feedback(
 )
 def list_my_feedback(
     limit: int = 50,
-    current_user: User = Depends(require_technician),
+    current_user: AuthClaims = Depends(require_technician),
     db: Session = Depends(get_db),
 ):
     """List feedback entries submitted by the current technician."""
@@ -208,7 +208,7 @@ def list_my_feedback(
 )
 def get_feedback(
     feedback_id: UUID,
-    current_user: User = Depends(require_technician),
+    current_user: AuthClaims = Depends(require_technician),
     db: Session = Depends(get_db),
 ):
     """Get a specific feedback entry by ID."""
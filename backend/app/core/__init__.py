@@ -1,6 +1,7 @@
 from app.core.security import verify_token, create_access_token, get_password_hash, verify_password
 from app.core.logger import setup_logging
 from app.core.cache import cache
+from app.core.async_cache import async_cache
 
 __all__ = [
     "verify_token",
@@ -8,5 +9,6 @@ __all__ = [
     "get_password_hash",
     "verify_password",
     "setup_logging",
-    "cache"
+    "cache",
+    "async_cache"
 ]
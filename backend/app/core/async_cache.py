@@ -0,0 +1,205 @@
+"""
+Asyncio cache client for async route handlers.
+Same keys, envelope and tag semantics as the blocking CacheService, built
+on redis.asyncio with its own connection pool so a slow Redis call never
+stalls the event loop. Sync code paths keep using app.core.cache.cache.
+"""
+import os
+import time
+import logging
+from typing import Optional, Any
+
+from app.core.cache import CacheService, SCAN_BATCH_SIZE, TAG_TTL_SECONDS, cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+    ASYNC_REDIS_AVAILABLE = True
+except ImportError:
+    ASYNC_REDIS_AVAILABLE = False
+    logger.warning("redis.asyncio not available, async cache uses in-memory cache")
+
+
+class AsyncCacheService:
+    """
+    Async counterpart to CacheService.
+
+    Only the Redis round trips are async: envelopes, tag lists, snapshot
+    checks and L1 bookkeeping are the blocking service's own helpers, and
+    its in-process state (memory store, tag generations, L1 and worker
+    identity) is shared so both clients stay coherent inside one worker.
+    In memory mode every operation is served in-process and never awaits I/O.
+    """
+
+    def __init__(self, sync_cache: CacheService, redis_client=None):
+        self.sync = sync_cache
+        self.redis_client = redis_client
+        self.use_redis = redis_client is not None or (ASYNC_REDIS_AVAILABLE and sync_cache.use_redis)
+
+        if self.use_redis and self.redis_client is None:
+            pool = aioredis.ConnectionPool.from_url(
+                sync_cache.redis_url,
+                decode_responses=False,
+                max_connections=int(os.getenv("CACHE_ASYNC_MAX_CONNECTIONS", "50")),
+                socket_connect_timeout=2,
+                socket_timeout=2,
+                retry_on_timeout=True,
+                health_check_interval=30,
+            )
+            self.redis_client = aioredis.Redis(connection_pool=pool)
+            logger.info("Async Redis cache initialized")
+
+    @property
+    def l1(self):
+        return self.sync.l1
+
+    async def close(self) -> None:
+        """Release the connection pool"""
+        if self.redis_client is not None:
+            await self.redis_client.aclose()
+
+    async def _publish(self, op: str, **payload) -> None:
+        if self.l1 is None:
+            return
+        try:
+            await self.redis_client.publish(
+                self.sync.invalidation_channel, self.sync._invalidation_message(op, **payload)
+            )
+        except Exception as e:
+            logger.error(f"Cache invalidation publish error ({op}): {e}")
+
+    async def _read_tag_versions(self, tags: list) -> dict:
+        if not tags:
+            return {}
+        versions, missing = self.sync._l1_tag_versions(tags)
+        if missing:
+            values = await self.redis_client.mget([CacheService._tag_key(tag) for tag in missing])
+            versions.update(self.sync._remember_tag_versions(missing, values))
+        return versions
+
+    async def _ensure_tag_versions(self, tags: list) -> dict:
+        """See CacheService._ensure_tag_versions"""
+        versions = await self._read_tag_versions(tags)
+        for tag, version in versions.items():
+            if version is None:
+                tag_key = CacheService._tag_key(tag)
+                await self.redis_client.set(tag_key, time.time_ns(), nx=True, ex=TAG_TTL_SECONDS)
+                versions[tag] = int(await self.redis_client.get(tag_key))
+        return versions
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from cache (entries with an invalidated tag are misses)"""
+        if not self.use_redis:
+            return self.sync.get(key)
+        try:
+            implicit = {}
+            raw = self.l1.get(key) if self.l1 is not None else None
+            if raw is None and self.l1 is None:
+                tags = CacheService._implicit_tags(key)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.get(key)
+                if tags:
+                    pipe.mget([CacheService._tag_key(tag) for tag in tags])
+                results = await pipe.execute()
+                raw = results[0]
+                if tags:
+                    implicit = CacheService._parse_tag_versions(tags, results[1])
+            elif raw is None:
+                raw = await self.redis_client.get(key)
+                if raw is not None:
+                    self.l1.set(key, raw, ttl=self.sync.l1_ttl)
+            if raw is None:
+                return None
+
+            value, snapshot = CacheService._unwrap(raw)
+            if snapshot:
+                implicit.update(await self._read_tag_versions(CacheService._unknown_tags(snapshot, implicit)))
+                if not CacheService._matches_snapshot(snapshot, implicit):
+                    if self.l1 is not None:
+                        self.l1.delete(key)
+                    await self.redis_client.delete(key)
+                    return None
+            return value
+        except Exception as e:
+            logger.error(f"Async cache get error for key {key}: {e}")
+        return None
+
+    async def set(self, key: str, value: Any, ttl: int = 300, tags: Optional[list] = None) -> bool:
+        """Set value in cache with TTL in seconds (see CacheService.set)"""
+        if not self.use_redis:
+            return self.sync.set(key, value, ttl=ttl, tags=tags)
+        try:
+            snapshot = await self._ensure_tag_versions(CacheService._entry_tags(key, tags))
+            serialized = CacheService._wrap(value, snapshot)
+            await self.redis_client.setex(key, ttl, serialized)
+            if self.l1 is not None:
+                self.l1.set(key, serialized, ttl=min(self.sync.l1_ttl, ttl))
+                await self._publish("delete", keys=[key])
+            return True
+        except Exception as e:
+            logger.error(f"Async cache set error for key {key}: {e}")
+            return False
+
+    async def delete(self, key: str) -> bool:
+        """Delete value from cache"""
+        if not self.use_redis:
+            return self.sync.delete(key)
+        try:
+            if self.l1 is not None:
+                self.l1.delete(key)
+            await self.redis_client.delete(key)
+            await self._publish("delete", keys=[key])
+            return True
+        except Exception as e:
+            logger.error(f"Async cache delete error for key {key}: {e}")
+            return False
+
+    async def exists(self, key: str) -> bool:
+        """Check if key exists in cache"""
+        return (await self.get(key)) is not None
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Bump tag generations (see CacheService.invalidate_tags)"""
+        if not self.use_redis:
+            return self.sync.invalidate_tags(*tags)
+        if not tags:
+            return 0
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(CacheService._tag_key(tag))
+                pipe.expire(CacheService._tag_key(tag), TAG_TTL_SECONDS)
+            await pipe.execute()
+            tag_keys = self.sync._forget_tag_versions(tags)
+            await self._publish("delete", keys=tag_keys)
+            return len(tags)
+        except Exception as e:
+            logger.error(f"Async cache tag invalidation error for tags {tags}: {e}")
+            return 0
+
+    async def delete_pattern(self, pattern: str) -> int:
+        """Delete all keys matching a glob pattern using SCAN + UNLINK"""
+        if not self.use_redis:
+            return self.sync.delete_pattern(pattern)
+        try:
+            if self.l1 is not None:
+                self.sync._apply_local_invalidation({"op": "pattern", "pattern": pattern})
+                await self._publish("pattern", pattern=pattern)
+            deleted = 0
+            batch = []
+            async for key in self.redis_client.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    deleted += await self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.redis_client.unlink(*batch)
+            return deleted
+        except Exception as e:
+            logger.error(f"Async cache pattern delete error for pattern {pattern}: {e}")
+        return 0
+
+
+# Global async cache instance, paired with the blocking one
+async_cache = AsyncCacheService(cache)
@@ -0,0 +1,58 @@
+"""
+In-memory Bloom filter.
+Answers "definitely not present" or "maybe present" for a set of strings
+in a few bits per element; used to reject unknown keys before they reach
+the cache or the database.
+"""
+import math
+import hashlib
+import threading
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized for ``capacity`` items at ``error_rate``
+    false positives. Items cannot be removed; rebuild the filter to drop
+    deleted ones. Adding past ``capacity`` raises the false-positive rate
+    but never produces false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str) -> None:
+        positions = self._positions(item)
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self._count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> dict:
+        return {
+            "items": self._count,
+            "capacity": self.capacity,
+            "bits": self.num_bits,
+            "hashes": self.num_hashes,
+            "bytes": len(self._bits),
+        }
@@ -1,13 +1,30 @@
 """
 Caching layer using Redis for performance at scale.
 Falls back to in-memory cache if Redis is unavailable.
+Values are serialized with app.core.cache_codec (see CACHE_CODEC).
 """
 import os
 import json
+import time
+import uuid
+import fnmatch
 import logging
-from typing import Optional, Any
+import threading
+import math
+import random
+import inspect
+import functools
+import typing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Any, Callable
 from datetime import timedelta
 import hashlib
+import re
+
+from pydantic import BaseModel
+
+from app.core import cache_codec
+from app.core.memory_cache import MemoryCache
 
 logger = logging.getLogger(__name__)
 
@@ -19,26 +36,74 @@ except ImportError:
     REDIS_AVAILABLE = False
     logger.warning("Redis not available, using in-memory cache")
 
-# In-memory cache fallback
-_memory_cache = {}
+# In-memory cache fallback (bounded LRU with TTL)
+_memory_cache = MemoryCache()
+
+TAG_KEY_PREFIX = "cache:tag:"
+# Tag counters expire (and a missing counter only turns its entries into
+# misses), so this must be at least the longest entry TTL
+TAG_TTL_SECONDS = int(os.getenv("CACHE_TAG_TTL", str(2 * 24 * 3600)))
+# Only this many leading key segments are namespaces (user:id:1 -> user, user:id);
+# the rest of a key may carry caller input and never becomes a tag
+IMPLICIT_TAG_DEPTH = 2
+
+# Tag generations for the memory backend (bounded, see _ensure_tag_versions)
+_memory_tag_versions = MemoryCache(max_entries=int(os.getenv("CACHE_TAG_MAX_ENTRIES", "10000")))
+_memory_tag_lock = threading.Lock()
+
+# Counters (see CacheService.incr) in the memory backend or as Redis fallback
+_memory_counter_lock = threading.Lock()
+
+ENVELOPE_MARKER = "__cache__"
+SCAN_BATCH_SIZE = 500
+
+# get_or_load (stampede protection) settings
+LOAD_MARKER = "__load__"
+LOAD_LOCK_PREFIX = "cache:lock:"
+LOAD_LOCK_TTL_SECONDS = float(os.getenv("CACHE_LOAD_LOCK_TTL", "10"))
+LOAD_LOCK_POLL_SECONDS = 0.05
+XFETCH_BETA = float(os.getenv("CACHE_XFETCH_BETA", "1.0"))
+STALE_GRACE_SECONDS = int(os.getenv("CACHE_STALE_GRACE", "60"))
+_MISSING = object()
 
 
 class CacheService:
     """
     Cache service with Redis support and in-memory fallback.
     Supports automatic serialization/deserialization.
+
+    With CACHE_L1_ENABLED=true and Redis available the service runs in
+    layered mode: a short-TTL per-worker L1 (MemoryCache) sits in front of
+    Redis (L2). Every write and delete is broadcast over Redis pub/sub so
+    the other workers drop their stale L1 copies.
     """
     
-    def __init__(self):
+    def __init__(self, redis_client=None):
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        self.redis_client = None
-        self.use_redis = REDIS_AVAILABLE and os.getenv("USE_REDIS", "false").lower() == "true"
+        self.redis_client = redis_client
+        self.use_redis = redis_client is not None or (
+            REDIS_AVAILABLE and os.getenv("USE_REDIS", "false").lower() == "true"
+        )
         
-        if self.use_redis:
+        # Layered (L1 + Redis) configuration
+        self.l1 = None
+        self.l1_ttl = float(os.getenv("CACHE_L1_TTL", "5"))
+        self.invalidation_channel = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+        self.instance_id = uuid.uuid4().hex
+        self._pubsub = None
+        self._pubsub_thread = None
+        
+        # Single-flight bookkeeping for get_or_load
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._lock_tokens = {}
+        
+        if self.use_redis and self.redis_client is None:
             try:
+                # Values are codec bytes, so responses are not decoded
                 self.redis_client = redis.from_url(
                     self.redis_url,
-                    decode_responses=True,
+                    decode_responses=False,
                     socket_connect_timeout=2,
                     socket_timeout=2,
                     retry_on_timeout=True,
@@ -51,60 +116,345 @@ class CacheService:
                 logger.error(f"Failed to connect to Redis: {e}. Falling back to memory cache.")
                 self.redis_client = None
                 self.use_redis = False
+        
+        if self.use_redis and os.getenv("CACHE_L1_ENABLED", "false").lower() == "true":
+            self.enable_l1()
+    
+    # ------------------------------------------------------------------
+    # L1 layer and cross-worker invalidation
+    # ------------------------------------------------------------------
+    
+    def enable_l1(self, ttl: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        """Put a per-worker L1 in front of Redis and subscribe to invalidations"""
+        if not (self.use_redis and self.redis_client):
+            return
+        if ttl is not None:
+            self.l1_ttl = ttl
+        self.l1 = MemoryCache(
+            max_entries=max_entries or int(os.getenv("CACHE_L1_MAX_ENTRIES", "5000")),
+            max_bytes=int(os.getenv("CACHE_L1_MAX_BYTES", str(16 * 1024 * 1024))),
+        )
+        try:
+            self._pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{self.invalidation_channel: self._handle_invalidation})
+            self._pubsub_thread = self._pubsub.run_in_thread(
+                sleep_time=1.0,
+                daemon=True,
+                exception_handler=self._handle_pubsub_error,
+            )
+            logger.info(f"L1 cache enabled (ttl={self.l1_ttl}s), listening on {self.invalidation_channel}")
+        except Exception as e:
+            logger.error(f"Failed to subscribe to cache invalidations: {e}. L1 cache disabled.")
+            self.l1 = None
+    
+    def close(self) -> None:
+        """Stop the invalidation listener"""
+        if self._pubsub_thread is not None:
+            self._pubsub_thread.stop()
+            self._pubsub_thread = None
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception:
+                pass
+            self._pubsub = None
+    
+    def _publish(self, op: str, **payload) -> None:
+        """Broadcast an invalidation to the other workers"""
+        if self.l1 is None:
+            return
+        try:
+            self.redis_client.publish(self.invalidation_channel, self._invalidation_message(op, **payload))
+        except Exception as e:
+            # Peers fall back to L1 TTL expiry
+            logger.error(f"Cache invalidation publish error ({op}): {e}")
+    
+    def _invalidation_message(self, op: str, **payload) -> str:
+        return json.dumps({"op": op, "origin": self.instance_id, **payload})
+    
+    def _handle_invalidation(self, message: dict) -> None:
+        """Apply an invalidation received from another worker"""
+        if self.l1 is None:
+            return
+        try:
+            data = json.loads(message["data"])
+        except (ValueError, TypeError, KeyError):
+            logger.warning(f"Ignoring malformed cache invalidation message: {message!r}")
+            return
+        if data.get("origin") == self.instance_id:
+            return
+        self._apply_local_invalidation(data)
+    
+    def _apply_local_invalidation(self, data: dict) -> None:
+        op = data.get("op")
+        if op == "delete":
+            for key in data.get("keys", []):
+                self.l1.delete(key)
+        elif op == "pattern":
+            pattern = data.get("pattern", "*")
+            for key in self.l1.keys():
+                if fnmatch.fnmatchcase(key, pattern):
+                    self.l1.delete(key)
+        elif op == "clear":
+            self.l1.clear()
+    
+    def _handle_pubsub_error(self, error: Exception, pubsub, thread) -> None:
+        """Missed invalidations make every L1 entry suspect, so drop them all"""
+        logger.error(f"Cache invalidation listener error: {error}")
+        if self.l1 is not None:
+            self.l1.clear()
+        time.sleep(1.0)
+    
+    # ------------------------------------------------------------------
+    # Tag versions (generation counters)
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"{TAG_KEY_PREFIX}{tag}"
+    
+    @staticmethod
+    def _implicit_tags(key: str) -> list:
+        """The key's namespace prefixes are tags: user:id:1 -> user, user:id"""
+        parts = key.split(":")
+        return [":".join(parts[:i]) for i in range(1, min(len(parts), IMPLICIT_TAG_DEPTH + 1))]
+    
+    @classmethod
+    def _entry_tags(cls, key: str, tags: Optional[list] = None) -> list:
+        """Tags an entry is stored with: its namespace prefixes plus ``tags``"""
+        return list(dict.fromkeys(cls._implicit_tags(key) + [t for t in (tags or []) if t]))
+    
+    @staticmethod
+    def _parse_tag_versions(tags: list, values: list) -> dict:
+        return {tag: int(v) if v is not None else None for tag, v in zip(tags, values)}
+    
+    def _l1_tag_versions(self, tags: list) -> tuple:
+        """Generations held in L1, and the tags that must be read from Redis"""
+        versions = {}
+        missing = []
+        for tag in tags:
+            cached = self.l1.get(self._tag_key(tag)) if self.l1 is not None else None
+            if cached is not None:
+                versions[tag] = int(cached)
+            else:
+                missing.append(tag)
+        return versions, missing
+    
+    def _remember_tag_versions(self, tags: list, values: list) -> dict:
+        """Parse generations read from Redis and keep them in L1"""
+        if self.l1 is not None:
+            for tag, value in zip(tags, values):
+                if value is not None:
+                    self.l1.set(self._tag_key(tag), value, ttl=self.l1_ttl)
+        return self._parse_tag_versions(tags, values)
+    
+    def _forget_tag_versions(self, tags: tuple) -> list:
+        """Drop bumped generations from L1; returns their keys for the peers"""
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        if self.l1 is not None:
+            for tag_key in tag_keys:
+                self.l1.delete(tag_key)
+        return tag_keys
+    
+    @staticmethod
+    def _unknown_tags(snapshot: dict, known: dict) -> list:
+        return [tag for tag in snapshot if tag not in known]
+    
+    @staticmethod
+    def _matches_snapshot(snapshot: dict, versions: dict) -> bool:
+        return all(versions.get(tag) == version for tag, version in snapshot.items())
+    
+    def _read_tag_versions(self, tags: list) -> dict:
+        """Current generation of each tag (None when the counter is missing)"""
+        if not tags:
+            return {}
+        if not (self.use_redis and self.redis_client):
+            return {tag: _memory_tag_versions.get(tag) for tag in tags}
+        
+        versions, missing = self._l1_tag_versions(tags)
+        if missing:
+            values = self.redis_client.mget([self._tag_key(tag) for tag in missing])
+            versions.update(self._remember_tag_versions(missing, values))
+        return versions
+    
+    def _ensure_tag_versions(self, tags: list) -> dict:
+        """
+        Read tag generations, initialising missing counters.
+        Counters start at a timestamp rather than 0 so a counter lost to
+        eviction or expiry can never make an older snapshot look current
+        again (its entries just become misses).
+        """
+        versions = self._read_tag_versions(tags)
+        for tag, version in versions.items():
+            if version is not None:
+                continue
+            initial = time.time_ns()
+            if self.use_redis and self.redis_client:
+                self.redis_client.set(self._tag_key(tag), initial, nx=True, ex=TAG_TTL_SECONDS)
+                versions[tag] = int(self.redis_client.get(self._tag_key(tag)))
+            else:
+                with _memory_tag_lock:
+                    versions[tag] = _memory_tag_versions.get(tag)
+                    if versions[tag] is None:
+                        versions[tag] = initial
+                        _memory_tag_versions.set(tag, initial, ttl=TAG_TTL_SECONDS)
+        return versions
+    
+    def _snapshot_is_current(self, snapshot: dict, known: Optional[dict] = None) -> bool:
+        known = dict(known or {})
+        known.update(self._read_tag_versions(self._unknown_tags(snapshot, known)))
+        return self._matches_snapshot(snapshot, known)
+    
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        Invalidate every entry carrying any of the given tags.
+        O(1) per tag: the tag generation is bumped and stale entries are
+        rejected on read and left to expire.
+        """
+        if not tags:
+            return 0
+        try:
+            if self.use_redis and self.redis_client:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for tag in tags:
+                    pipe.incr(self._tag_key(tag))
+                    pipe.expire(self._tag_key(tag), TAG_TTL_SECONDS)
+                pipe.execute()
+                tag_keys = self._forget_tag_versions(tags)
+                self._publish("delete", keys=tag_keys)
+            else:
+                with _memory_tag_lock:
+                    for tag in tags:
+                        version = _memory_tag_versions.get(tag, time.time_ns()) + 1
+                        _memory_tag_versions.set(tag, version, ttl=TAG_TTL_SECONDS)
+            return len(tags)
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error for tags {tags}: {e}")
+            return 0
+    
+    @staticmethod
+    def _wrap(value: Any, snapshot: dict) -> bytes:
+        return cache_codec.encode({ENVELOPE_MARKER: 1, "t": snapshot, "v": value})
+    
+    @staticmethod
+    def _unwrap(raw) -> tuple:
+        """Returns (value, tag snapshot); legacy entries have no snapshot"""
+        data = cache_codec.decode(raw)
+        if isinstance(data, dict) and ENVELOPE_MARKER in data:
+            return data.get("v"), data.get("t") or {}
+        return data, None
+    
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
     
     def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
+        """Get value from cache (entries with an invalidated tag are misses)"""
         try:
+            implicit = {}
             if self.use_redis and self.redis_client:
-                value = self.redis_client.get(key)
-                if value:
-                    return json.loads(value)
+                raw = self.l1.get(key) if self.l1 is not None else None
+                if raw is None and self.l1 is None:
+                    # One round trip for the value and its namespace generations
+                    pipe = self.redis_client.pipeline(transaction=False)
+                    pipe.get(key)
+                    tags = self._implicit_tags(key)
+                    if tags:
+                        pipe.mget([self._tag_key(tag) for tag in tags])
+                    results = pipe.execute()
+                    raw = results[0]
+                    if tags:
+                        implicit = self._parse_tag_versions(tags, results[1])
+                elif raw is None:
+                    raw = self.redis_client.get(key)
+                    if raw is not None:
+                        self.l1.set(key, raw, ttl=self.l1_ttl)
             else:
-                return _memory_cache.get(key)
+                raw = _memory_cache.get(key)
+            if raw is None:
+                return None
+            
+            value, snapshot = self._unwrap(raw)
+            if snapshot and not self._snapshot_is_current(snapshot, implicit):
+                self._discard(key)
+                return None
+            return value
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {e}")
         return None
     
-    def set(self, key: str, value: Any, ttl: int = 300) -> bool:
+    def set(self, key: str, value: Any, ttl: int = 300, tags: Optional[list] = None) -> bool:
         """
         Set value in cache with TTL (Time To Live) in seconds.
         Default TTL is 5 minutes (300 seconds).
+        
+        The entry is tagged with each namespace prefix of its key plus any
+        extra ``tags``; invalidate_tags() on any of them expires it.
         """
         try:
-            serialized = json.dumps(value)
+            serialized = self._wrap(value, self._ensure_tag_versions(self._entry_tags(key, tags)))
             if self.use_redis and self.redis_client:
                 self.redis_client.setex(key, ttl, serialized)
+                if self.l1 is not None:
+                    self.l1.set(key, serialized, ttl=min(self.l1_ttl, ttl))
+                    self._publish("delete", keys=[key])
             else:
-                _memory_cache[key] = serialized
+                _memory_cache.set(key, serialized, ttl=ttl)
             return True
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {e}")
             return False
     
+    def _discard(self, key: str) -> None:
+        """Drop a stale entry from this worker (peers reject it on their own)"""
+        if self.use_redis and self.redis_client:
+            if self.l1 is not None:
+                self.l1.delete(key)
+            self.redis_client.delete(key)
+        else:
+            _memory_cache.delete(key)
+    
     def delete(self, key: str) -> bool:
         """Delete value from cache"""
         try:
             if self.use_redis and self.redis_client:
+                if self.l1 is not None:
+                    self.l1.delete(key)
                 self.redis_client.delete(key)
+                self._publish("delete", keys=[key])
             else:
-                _memory_cache.pop(key, None)
+                _memory_cache.delete(key)
             return True
         except Exception as e:
             logger.error(f"Cache delete error for key {key}: {e}")
             return False
     
     def delete_pattern(self, pattern: str) -> int:
-        """Delete all keys matching pattern (Redis only)"""
+        """
+        Delete all keys matching a glob pattern.
+        Uses incremental SCAN + UNLINK so Redis is never blocked; prefer
+        invalidate_tags() for bulk invalidation of tagged entries.
+        """
         try:
             if self.use_redis and self.redis_client:
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    return self.redis_client.delete(*keys)
+                if self.l1 is not None:
+                    self._apply_local_invalidation({"op": "pattern", "pattern": pattern})
+                    self._publish("pattern", pattern=pattern)
+                deleted = 0
+                batch = []
+                for key in self.redis_client.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+                    batch.append(key)
+                    if len(batch) >= SCAN_BATCH_SIZE:
+                        deleted += self.redis_client.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted += self.redis_client.unlink(*batch)
+                return deleted
             else:
                 # Memory cache pattern deletion
-                keys_to_delete = [k for k in _memory_cache.keys() if pattern.replace("*", "") in k]
+                keys_to_delete = [k for k in _memory_cache.keys() if fnmatch.fnmatchcase(k, pattern)]
                 for k in keys_to_delete:
-                    del _memory_cache[k]
+                    _memory_cache.delete(k)
                 return len(keys_to_delete)
         except Exception as e:
             logger.error(f"Cache pattern delete error for pattern {pattern}: {e}")
@@ -114,9 +464,14 @@ class CacheService:
         """Clear all cache"""
         try:
             if self.use_redis and self.redis_client:
+                if self.l1 is not None:
+                    self.l1.clear()
+                    self._publish("clear")
                 self.redis_client.flushdb()
             else:
                 _memory_cache.clear()
+                with _memory_tag_lock:
+                    _memory_tag_versions.clear()
             return True
         except Exception as e:
             logger.error(f"Cache clear error: {e}")
@@ -124,14 +479,220 @@ class CacheService:
     
     def exists(self, key: str) -> bool:
         """Check if key exists in cache"""
+        return self.get(key) is not None
+    
+    # ------------------------------------------------------------------
+    # Counters
+    # ------------------------------------------------------------------
+    
+    def incr(self, key: str, amount: int = 1, ttl: int = 300) -> int:
+        """
+        Atomically add amount to an integer counter and return the new value.
+        Counters are plain integers, not tagged entries: read them with
+        get_counters(), not get(). If Redis fails the counter continues in
+        this worker's memory.
+        """
+        if self.use_redis and self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.incrby(key, amount)
+                pipe.expire(key, ttl)
+                return int(pipe.execute()[0])
+            except Exception as e:
+                logger.error(f"Cache incr error for key {key}, counting in memory: {e}")
+        with _memory_counter_lock:
+            value = (_memory_cache.get(key) or 0) + amount
+            _memory_cache.set(key, value, ttl=ttl)
+            return value
+    
+    def get_counters(self, keys: list) -> list:
+        """Current values of counters written by incr() (missing ones are 0)"""
+        if not keys:
+            return []
+        if self.use_redis and self.redis_client:
+            try:
+                return [int(v or 0) for v in self.redis_client.mget(keys)]
+            except Exception as e:
+                logger.error(f"Cache counter read error, using memory: {e}")
+        return [_memory_cache.get(key) or 0 for key in keys]
+    
+    def delete_counters(self, keys: list) -> None:
+        """Drop counters written by incr() in one round trip"""
+        if not keys:
+            return
+        if self.use_redis and self.redis_client:
+            try:
+                self.redis_client.delete(*keys)
+            except Exception as e:
+                logger.error(f"Cache counter delete error: {e}")
+        for key in keys:
+            _memory_cache.delete(key)
+    
+    # ------------------------------------------------------------------
+    # Stampede protection
+    # ------------------------------------------------------------------
+    
+    def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: int = 300,
+        tags: Optional[list] = None,
+        beta: float = XFETCH_BETA,
+        stale_ttl: Optional[int] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, computing it with loader() on a miss.
+        
+        - Single-flight: concurrent misses in this worker share one loader
+          call, and a short Redis lock lets one worker load while the others
+          wait for the result.
+        - Early refresh (XFetch): before the TTL ends a caller is picked with
+          rising probability to recompute, weighted by how long loading takes.
+        - Stale serving: entries are kept ``stale_ttl`` seconds past their TTL
+          and returned while another caller refreshes them (or if the refresh
+          fails).
+        
+        ``None`` results are not cached.
+        """
+        stale_ttl = STALE_GRACE_SECONDS if stale_ttl is None else stale_ttl
+        entry = self.get(key)
+        stale = _MISSING
+        if isinstance(entry, dict) and LOAD_MARKER in entry:
+            now = time.time()
+            delta = entry.get("d", 0.0)
+            expiry = entry.get("e", 0.0)
+            if now - delta * beta * math.log(random.random() or 1e-12) < expiry:
+                return entry["v"]
+            stale = entry["v"]
+        
+        if stale is not _MISSING:
+            # This caller refreshes; concurrent callers keep getting the
+            # stale value until the new one is stored.
+            with self._inflight_lock:
+                if key in self._inflight:
+                    return stale
+                future = self._inflight[key] = Future()
+            try:
+                if not self._acquire_load_lock(key):
+                    value = stale
+                else:
+                    try:
+                        value = self._load_and_store(key, loader, ttl, tags, stale_ttl)
+                    finally:
+                        self._release_load_lock(key)
+            except Exception as e:
+                logger.error(f"Cache refresh failed for key {key}, serving stale value: {e}")
+                value = stale
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+            future.set_result(value)
+            return value
+        
+        # Cold miss: share a single in-flight load within this worker
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            try:
+                return future.result(timeout=LOAD_LOCK_TTL_SECONDS)
+            except FutureTimeoutError:
+                return loader()
+        
         try:
-            if self.use_redis and self.redis_client:
-                return self.redis_client.exists(key) > 0
-            else:
-                return key in _memory_cache
+            value = self._load_across_workers(key, loader, ttl, tags, stale_ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    def _load_across_workers(self, key, loader, ttl, tags, stale_ttl) -> Any:
+        """Load under the distributed lock, or wait for the worker holding it"""
+        deadline = time.monotonic() + LOAD_LOCK_TTL_SECONDS
+        while not self._acquire_load_lock(key):
+            if time.monotonic() >= deadline:
+                # Lock holder is slow or gone; compute rather than fail
+                return self._load_and_store(key, loader, ttl, tags, stale_ttl)
+            time.sleep(LOAD_LOCK_POLL_SECONDS)
+            entry = self.get(key)
+            if isinstance(entry, dict) and LOAD_MARKER in entry:
+                return entry["v"]
+        try:
+            # Another worker may have stored the value before we got the lock
+            entry = self.get(key)
+            if isinstance(entry, dict) and LOAD_MARKER in entry and time.time() < entry.get("e", 0):
+                return entry["v"]
+            return self._load_and_store(key, loader, ttl, tags, stale_ttl)
+        finally:
+            self._release_load_lock(key)
+    
+    def _load_and_store(self, key, loader, ttl, tags, stale_ttl) -> Any:
+        started = time.monotonic()
+        value = loader()
+        delta = time.monotonic() - started
+        if value is not None:
+            entry = {LOAD_MARKER: 1, "v": value, "d": delta, "e": time.time() + ttl}
+            self.set(key, entry, ttl=ttl + stale_ttl, tags=tags)
+        return value
+    
+    def _acquire_load_lock(self, key: str) -> bool:
+        """Short Redis lock so only one worker loads a key (always granted in memory mode)"""
+        if not (self.use_redis and self.redis_client):
+            return True
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis_client.set(
+                f"{LOAD_LOCK_PREFIX}{key}", token, nx=True, px=int(LOAD_LOCK_TTL_SECONDS * 1000)
+            )
         except Exception as e:
-            logger.error(f"Cache exists error for key {key}: {e}")
-            return False
+            logger.error(f"Cache load lock error for key {key}: {e}")
+            return True
+        if acquired:
+            self._lock_tokens[key] = token
+        return bool(acquired)
+    
+    def _release_load_lock(self, key: str) -> None:
+        token = self._lock_tokens.pop(key, None)
+        if token is None or not (self.use_redis and self.redis_client):
+            return
+        lock_key = f"{LOAD_LOCK_PREFIX}{key}"
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) in (token, token.encode()):
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+        except redis.WatchError:
+            pass
+        except Exception as e:
+            logger.error(f"Cache load lock release error for key {key}: {e}")
+    
+    def stats(self) -> dict:
+        """Cache backend statistics (entry count, memory usage, evictions)"""
+        if self.use_redis and self.redis_client:
+            try:
+                info = self.redis_client.info(section="memory")
+                stats = {
+                    "backend": "layered" if self.l1 is not None else "redis",
+                    "entries": self.redis_client.dbsize(),
+                    "bytes": info.get("used_memory", 0),
+                    "evictions": self.redis_client.info(section="stats").get("evicted_keys", 0),
+                }
+            except Exception as e:
+                logger.error(f"Cache stats error: {e}")
+                stats = {"backend": "layered" if self.l1 is not None else "redis"}
+            if self.l1 is not None:
+                stats["l1"] = self.l1.stats()
+            return stats
+        return {"backend": "memory", **_memory_cache.stats()}
 
 
 # Global cache instance
@@ -146,10 +707,135 @@ def cache_key(*args, **kwargs) -> str:
     return hashlib.md5(key_string.encode()).hexdigest()
 
 
-def invalidate_cache(prefix: str):
-    """Invalidate all cache entries with given prefix"""
-    pattern = f"{prefix}:*"
-    deleted = cache.delete_pattern(pattern)
-    logger.info(f"Invalidated {deleted} cache entries with prefix: {prefix}")
-    return deleted
+_PLAIN_KEY_PART = re.compile(r"[A-Za-z0-9_.\-]{1,64}")
+
+
+def key_part(value: Any) -> str:
+    """Caller-supplied input as a key segment: kept if plain, hashed otherwise"""
+    text = str(value)
+    if _PLAIN_KEY_PART.fullmatch(text):
+        return text
+    return "#" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def invalidate_cache(prefix: str, include_legacy: bool = False) -> int:
+    """
+    Invalidate all cache entries with given prefix.
+    Bumps the prefix's tag generation (O(1)); with include_legacy, entries
+    written before tagging existed are also removed with a SCAN sweep.
+    """
+    invalidated = cache.invalidate_tags(prefix)
+    if include_legacy:
+        invalidated += cache.delete_pattern(f"{prefix}:*")
+    logger.info(f"Invalidated cache entries with prefix: {prefix}")
+    return invalidated
+
+
+# Hit/miss counters for @cached functions, by namespace
+_cached_metrics = {}
+_cached_metrics_lock = threading.Lock()
+
+
+def _record_cached_call(namespace: str, hit: bool) -> None:
+    with _cached_metrics_lock:
+        counters = _cached_metrics.setdefault(namespace, {"hits": 0, "misses": 0})
+        counters["hits" if hit else "misses"] += 1
+
+
+def cached_stats() -> dict:
+    """Hit/miss counters of @cached functions, by namespace"""
+    with _cached_metrics_lock:
+        return {namespace: dict(counters) for namespace, counters in _cached_metrics.items()}
+
 
+def cached(
+    namespace: str,
+    ttl: int = 300,
+    key: Optional[Callable[..., Any]] = None,
+    tags: Optional[Any] = None,
+    model: Optional[type] = None,
+    ignore: tuple = ("db",),
+    stale_ttl: Optional[int] = None,
+):
+    """
+    Cache a function's (or method's) return value through cache.get_or_load.
+    
+    Keys are ``{namespace}:{suffix}``. The suffix is ``key(**arguments)`` when
+    given, otherwise a hash of the arguments (see cache_key) leaving out
+    ``ignore`` and self/cls. ``tags`` is a list of extra tags or a callable
+    taking the same arguments. Pydantic results (``model`` or the return
+    annotation) are stored as dicts and validated again on the way out.
+    
+    The wrapper exposes ``key_for(*args, **kwargs)``, ``invalidate(*args,
+    **kwargs)`` for one call and ``invalidate_all()`` for the namespace; for
+    methods these take the arguments without self.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters.values())
+        is_method = bool(parameters) and parameters[0].name in ("self", "cls")
+        if is_method:
+            signature = signature.replace(parameters=parameters[1:])
+        
+        dto = model
+        if dto is None:
+            try:
+                hint = typing.get_type_hints(func).get("return")
+            except Exception:
+                hint = None
+            if isinstance(hint, type) and issubclass(hint, BaseModel):
+                dto = hint
+        
+        def _arguments(args, kwargs) -> dict:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return dict(bound.arguments)
+        
+        def _key(arguments: dict) -> str:
+            if key is not None:
+                suffix = key(**arguments)
+            else:
+                suffix = cache_key(**{k: v for k, v in arguments.items() if k not in ignore})
+            return f"{namespace}:{suffix}"
+        
+        def key_for(*args, **kwargs) -> str:
+            return _key(_arguments(args, kwargs))
+        
+        def invalidate(*args, **kwargs) -> bool:
+            return cache.delete(key_for(*args, **kwargs))
+        
+        def invalidate_all() -> int:
+            return cache.invalidate_tags(namespace)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = _arguments(args[1:] if is_method else args, kwargs)
+            extra_tags = tags(**arguments) if callable(tags) else tags
+            loaded = False
+            
+            def loader():
+                nonlocal loaded
+                loaded = True
+                # Cached results outlive the request: read them from the primary
+                from app.database.replicas import primary_reads
+                session = arguments.get("db", getattr(args[0], "db", None) if is_method else None)
+                with primary_reads(session):
+                    result = func(*args, **kwargs)
+                if dto is not None and isinstance(result, BaseModel):
+                    return result.model_dump()
+                return result
+            
+            value = cache.get_or_load(
+                _key(arguments), loader, ttl=ttl, tags=extra_tags, stale_ttl=stale_ttl
+            )
+            _record_cached_call(namespace, hit=not loaded)
+            if dto is not None and isinstance(value, dict):
+                return dto.model_validate(value)
+            return value
+        
+        wrapper.key_for = key_for
+        wrapper.invalidate = invalidate
+        wrapper.invalidate_all = invalidate_all
+        return wrapper
+    
+    return decorator
@@ -0,0 +1,241 @@
+"""
+Codecs for cached values.
+
+Every entry starts with a 4-byte header (magic, format version, codec id,
+flags) so the configured codec can change without flushing Redis: readers
+pick the decoder from the header, and headerless values are treated as
+legacy JSON text. UUID, datetime, date, Decimal and Enum values round-trip
+with their types. Payloads above CACHE_COMPRESS_THRESHOLD bytes are
+zlib-compressed transparently.
+"""
+import os
+import json
+import zlib
+import uuid
+import logging
+import importlib
+from datetime import datetime, date
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+MAGIC = 0xCA
+FORMAT_VERSION = 1
+FLAG_COMPRESSED = 0x01
+
+COMPRESS_THRESHOLD = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "1024"))
+COMPRESS_LEVEL = int(os.getenv("CACHE_COMPRESS_LEVEL", "1"))
+
+# Enum classes are only re-imported from our own package
+ENUM_MODULE_PREFIX = "app."
+
+TYPE_TAG = "__t"
+
+
+def _enum_path(member: Enum) -> str:
+    cls = type(member)
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _load_enum(path: str, value: Any) -> Any:
+    module_name, _, qualname = path.partition(":")
+    if not module_name.startswith(ENUM_MODULE_PREFIX):
+        logger.warning(f"Refusing to load enum {path} from cache, returning raw value")
+        return value
+    try:
+        obj = importlib.import_module(module_name)
+        for part in qualname.split("."):
+            obj = getattr(obj, part)
+        return obj(value)
+    except Exception as e:
+        logger.warning(f"Could not restore enum {path} from cache: {e}")
+        return value
+
+
+def _tag(obj: Any) -> Any:
+    """Replace non-JSON types with tagged dicts (JSON-family codecs)"""
+    if isinstance(obj, dict):
+        return {k: _tag(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_tag(v) for v in obj]
+    if isinstance(obj, Enum):
+        return {TYPE_TAG: "enum", "c": _enum_path(obj), "v": _tag(obj.value)}
+    if isinstance(obj, uuid.UUID):
+        return {TYPE_TAG: "uuid", "v": str(obj)}
+    if isinstance(obj, datetime):
+        return {TYPE_TAG: "dt", "v": obj.isoformat()}
+    if isinstance(obj, date):
+        return {TYPE_TAG: "date", "v": obj.isoformat()}
+    if isinstance(obj, Decimal):
+        return {TYPE_TAG: "dec", "v": str(obj)}
+    return obj
+
+
+def _untag(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        kind = obj.get(TYPE_TAG)
+        if kind is not None and len(obj) <= 3:
+            value = obj.get("v")
+            if kind == "uuid":
+                return uuid.UUID(value)
+            if kind == "dt":
+                return datetime.fromisoformat(value)
+            if kind == "date":
+                return date.fromisoformat(value)
+            if kind == "dec":
+                return Decimal(value)
+            if kind == "enum":
+                return _load_enum(obj.get("c", ""), _untag(value))
+        return {k: _untag(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_untag(v) for v in obj]
+    return obj
+
+
+class JsonCodec:
+    """Stdlib JSON with type tags (always available)"""
+    codec_id = 1
+    name = "json"
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(_tag(obj), separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        value = json.loads(data)
+        # Skip the walk when nothing was tagged
+        return _untag(value) if b'"__t"' in data else value
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson with type tags (fast JSON)"""
+    codec_id = 2
+    name = "orjson"
+
+    def encode(self, obj: Any) -> bytes:
+        return orjson.dumps(_tag(obj))
+
+    def decode(self, data: bytes) -> Any:
+        value = orjson.loads(data)
+        return _untag(value) if b'"__t"' in data else value
+
+
+# msgpack extension type codes
+EXT_UUID = 1
+EXT_DATETIME = 2
+EXT_DATE = 3
+EXT_DECIMAL = 4
+EXT_ENUM = 5
+
+
+class MsgpackCodec:
+    """msgpack with extension types (compact binary, no tagging walk)"""
+    codec_id = 3
+    name = "msgpack"
+
+    def _default(self, obj: Any) -> Any:
+        if isinstance(obj, Enum):
+            return msgpack.ExtType(EXT_ENUM, self.encode([_enum_path(obj), obj.value]))
+        if isinstance(obj, uuid.UUID):
+            return msgpack.ExtType(EXT_UUID, obj.bytes)
+        if isinstance(obj, datetime):
+            return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode("ascii"))
+        if isinstance(obj, date):
+            return msgpack.ExtType(EXT_DATE, obj.isoformat().encode("ascii"))
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(EXT_DECIMAL, str(obj).encode("ascii"))
+        # strict_types hands subclasses of builtins to us as well
+        for base in (dict, list, str, int, float, bytes):
+            if isinstance(obj, base):
+                return base(obj)
+        if isinstance(obj, tuple):
+            return list(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not cacheable")
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == EXT_UUID:
+            return uuid.UUID(bytes=data)
+        if code == EXT_DATETIME:
+            return datetime.fromisoformat(data.decode("ascii"))
+        if code == EXT_DATE:
+            return date.fromisoformat(data.decode("ascii"))
+        if code == EXT_DECIMAL:
+            return Decimal(data.decode("ascii"))
+        if code == EXT_ENUM:
+            path, value = self.decode(data)
+            return _load_enum(path, value)
+        return msgpack.ExtType(code, data)
+
+    def encode(self, obj: Any) -> bytes:
+        # Enum is checked in _default, so str/int enum subclasses must not
+        # be packed as their base type
+        return msgpack.packb(obj, default=self._default, use_bin_type=True, strict_types=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+
+_CODECS = {JsonCodec.codec_id: JsonCodec()}
+if ORJSON_AVAILABLE:
+    _CODECS[OrjsonCodec.codec_id] = OrjsonCodec()
+if MSGPACK_AVAILABLE:
+    _CODECS[MsgpackCodec.codec_id] = MsgpackCodec()
+
+_CODECS_BY_NAME = {codec.name: codec for codec in _CODECS.values()}
+
+
+def get_codec(name: str = "auto"):
+    """Resolve a codec by name; 'auto' picks the fastest one installed"""
+    if name == "auto":
+        for preferred in ("msgpack", "orjson", "json"):
+            if preferred in _CODECS_BY_NAME:
+                return _CODECS_BY_NAME[preferred]
+    codec = _CODECS_BY_NAME.get(name)
+    if codec is None:
+        logger.warning(f"Cache codec {name!r} not available, using json")
+        codec = _CODECS_BY_NAME["json"]
+    return codec
+
+
+def encode(obj: Any, codec=None) -> bytes:
+    """Serialize obj with a header, compressing large payloads"""
+    codec = codec or default_codec
+    payload = codec.encode(obj)
+    flags = 0
+    if len(payload) > COMPRESS_THRESHOLD:
+        compressed = zlib.compress(payload, COMPRESS_LEVEL)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_COMPRESSED
+    return bytes((MAGIC, FORMAT_VERSION, codec.codec_id, flags)) + payload
+
+
+def decode(data) -> Any:
+    """Deserialize a value written by encode() or a legacy JSON string"""
+    if isinstance(data, str):
+        return json.loads(data)
+    if len(data) >= 4 and data[0] == MAGIC and data[1] == FORMAT_VERSION:
+        codec = _CODECS.get(data[2])
+        if codec is None:
+            raise ValueError(f"Cache entry written with unavailable codec id {data[2]}")
+        payload = data[4:]
+        if data[3] & FLAG_COMPRESSED:
+            payload = zlib.decompress(payload)
+        return codec.decode(payload)
+    return json.loads(data)
+
+
+default_codec = get_codec(os.getenv("CACHE_CODEC", "auto"))
@@ -3,57 +3,92 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from app.core.security import verify_token
+from app.core.memory_cache import MemoryCache
 from app.database import get_db
-from app import models
+from app.database.replicas import primary_reads
 from app.services.repositories import SessionRepository
+from app.services import entity_cache, guest_sessions, authz
+from app.services.authz import AuthClaims
+from app.services.entity_cache import get_user_snapshot, UserSnapshot
+from app.services.revocation import revocation_registry, REVOKED, ACTIVE, UNKNOWN
 from datetime import datetime, timezone
 
 
 security = HTTPBearer()
 
+# Sessions whose last_used_at was updated recently (per worker)
+_touched_sessions = MemoryCache(max_entries=50000, max_bytes=8 * 1024 * 1024)
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> models.User:
-    """
-    Dependency that validates the Authorization header and returns
-    the authenticated user.
-    """
-    token = credentials.credentials
-    payload = verify_token(token)
-    if payload is None:
+
+def _touch_session(db: Session, jti: str) -> None:
+    """Update last_used_at at most once per CACHE_SESSION_TTL per session"""
+    if _touched_sessions.get(jti) is None:
+        _touched_sessions.set(jti, True, ttl=entity_cache.SESSION_CACHE_TTL)
+        SessionRepository(db).update_last_used_by_token(jti)
+
+
+def _token_payload(credentials: HTTPAuthorizationCredentials) -> dict:
+    """Decoded access token (with a subject) or 401"""
+    payload = verify_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated"
         )
-    user_id = payload.get("sub")
-    jti = payload.get("jti")
-    if user_id is None:
+    return payload
+
+
+def _current_guest(payload: dict) -> UserSnapshot:
+    """Ephemeral guests: the cache entry is the session (no users row yet)"""
+    guest = guest_sessions.get_guest(payload["sub"])
+    if guest is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
+            detail="Session expired"
         )
+    return guest
 
-    # Validate session if jti is present
-    if jti:
-        session_repo = SessionRepository(db)
-        session = session_repo.get_by_token_id(jti)
-        if not session or not session.is_active:
+
+def _validate_session(payload: dict, db: Session) -> None:
+    """Reject tokens whose session was revoked or has expired"""
+    user_id = payload["sub"]
+    jti = payload.get("jti")
+    # Validate session if jti is present: the revocation registry answers
+    # without SQL; if it cannot, fall back to the (briefly cached) session row
+    verdict = revocation_registry.check(jti, user_id, payload.get("iat"), db) if jti else UNKNOWN
+    if verdict == REVOKED:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired or revoked"
+        )
+    if verdict == ACTIVE:
+        _touch_session(db, jti)
+    elif jti:
+        state = entity_cache.get_cached_session_state(jti)
+        if state is None:
+            session_repo = SessionRepository(db)
+            with primary_reads(db):
+                session = session_repo.get_by_token_id(jti)
+            state = entity_cache.session_state(session)
+            entity_cache.cache_session_state(jti, state)
+            if state["is_active"]:
+                # Update last used timestamp (skipped on cache hits)
+                session_repo.update_last_used(session)
+        if not state["is_active"] or str(state["user_id"]) != str(user_id):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Session expired or revoked"
             )
         # Check if session is expired
-        if session.expires_at < datetime.now(timezone.utc):
+        if state["expires_at"] < datetime.now(timezone.utc):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Session expired"
             )
-        # Update last used timestamp
-        session_repo.update_last_used(session)
 
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+
+def _load_user(payload: dict, db: Session) -> UserSnapshot:
+    user = get_user_snapshot(db, payload["sub"])
     if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,13 +97,61 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> UserSnapshot:
+    """
+    Dependency that validates the Authorization header and returns
+    the authenticated user as a read-only snapshot (served from the
+    entity cache, so a hit does not query the users table).
+    """
+    payload = _token_payload(credentials)
+    if payload.get("guest"):
+        return _current_guest(payload)
+    _validate_session(payload, db)
+    return _load_user(payload, db)
+
+
+def get_current_claims(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> AuthClaims:
+    """
+    Like get_current_user, for endpoints that only need the caller's
+    id, role, enterprise, branch and enterprise role. These come from the
+    token's authz claims while its authz version is current; otherwise
+    (older tokens, role changes since issue) from the user.
+    """
+    payload = _token_payload(credentials)
+    if payload.get("guest"):
+        return AuthClaims.from_user(_current_guest(payload))
+    _validate_session(payload, db)
+    claims = authz.claims_from_payload(payload)
+    if claims is None:
+        claims = AuthClaims.from_user(_load_user(payload, db))
+    return claims
+
+
+def get_persistent_user(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> UserSnapshot:
+    """
+    get_current_user for endpoints that store rows referencing the user:
+    an ephemeral guest is written to the users table first.
+    """
+    guest_sessions.materialize(db, current_user)
+    return current_user
+
+
 # ============================================================================
 # ENTERPRISE RBAC DEPENDENCIES
 # ============================================================================
 
 def require_enterprise_user(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: AuthClaims = Depends(get_current_claims)
+) -> AuthClaims:
     """Dependency to ensure user belongs to an enterprise"""
     if not current_user.enterprise_id:
         raise HTTPException(
@@ -79,8 +162,8 @@ def require_enterprise_user(
 
 
 def require_enterprise_admin(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: AuthClaims = Depends(get_current_claims)
+) -> AuthClaims:
     """Dependency to ensure user is an enterprise admin"""
     if not current_user.enterprise_id:
         raise HTTPException(
@@ -96,8 +179,8 @@ def require_enterprise_admin(
 
 
 def require_branch_manager(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: AuthClaims = Depends(get_current_claims)
+) -> AuthClaims:
     """Dependency to ensure user is a branch manager or higher"""
     if not current_user.enterprise_id:
         raise HTTPException(
@@ -113,8 +196,8 @@ def require_branch_manager(
 
 
 def require_technician(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: AuthClaims = Depends(get_current_claims)
+) -> AuthClaims:
     """Dependency to ensure user is a technician or higher"""
     if not current_user.enterprise_id:
         raise HTTPException(
@@ -131,8 +214,8 @@ def require_technician(
 
 
 def require_senior_technician(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: AuthClaims = Depends(get_current_claims)
+) -> AuthClaims:
     """Dependency to ensure user is a senior technician or higher"""
     if not current_user.enterprise_id:
         raise HTTPException(
@@ -146,3 +229,12 @@ def require_senior_technician(
             detail="Senior technician access required"
         )
     return current_user
+
+
+def password_pool_busy() -> HTTPException:
+    """503 for when password hashing is saturated (login storms)"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Sunucu şu anda yoğun, lütfen tekrar deneyin",
+        headers={"Retry-After": "1"}
+    )
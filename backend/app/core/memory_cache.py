@@ -0,0 +1,182 @@
+"""
+Bounded in-process cache engine.
+Used by CacheService when Redis is disabled and as a per-worker L1 store.
+Entries honour per-key TTL and are evicted least-recently-used first once
+the entry count or total byte budget is exceeded.
+"""
+import os
+import sys
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Optional, Dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "10000"))
+DEFAULT_MAX_BYTES = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))  # 64 MB
+DEFAULT_SWEEP_INTERVAL = float(os.getenv("CACHE_MEMORY_SWEEP_INTERVAL", "60"))
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate memory footprint of a cached value in bytes"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU cache with per-key TTL and memory bounds.
+
+    Expired entries are dropped lazily on access and by a periodic sweep
+    that runs at most once per ``sweep_interval`` seconds during writes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # key -> (value, expires_at or None, size)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get value for key, refreshing its LRU position"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store value with optional TTL in seconds.
+        Returns False if the value alone exceeds the byte budget.
+        """
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            logger.warning(f"Memory cache value for key {key} exceeds max_bytes ({size} bytes), not cached")
+            return False
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            self._maybe_sweep()
+            self._evict()
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Delete key, returns True if it was present"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+            return False
+
+    def exists(self, key: str) -> bool:
+        """Check if a non-expired entry exists (does not affect LRU order)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            expires_at = entry[1]
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return False
+            return True
+
+    def ttl(self, key: str) -> Optional[float]:
+        """Remaining TTL in seconds, None if the key is missing or has no expiry"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] is None:
+                return None
+            remaining = entry[1] - time.monotonic()
+            return remaining if remaining > 0 else None
+
+    def keys(self):
+        """Snapshot of current keys (may include not-yet-swept expired keys)"""
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Remove all expired entries, returns the number removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (_, exp, _) in self._data.items() if exp is not None and exp <= now]
+            for k in expired:
+                self._remove(k)
+            self.expirations += len(expired)
+            self._next_sweep = now + self.sweep_interval
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        """Size and eviction counters"""
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.exists(key)
+
+    # Internal helpers (caller must hold the lock)
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            key, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def _maybe_sweep(self) -> None:
+        if time.monotonic() >= self._next_sweep:
+            self.purge_expired()
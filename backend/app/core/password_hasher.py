@@ -0,0 +1,291 @@
+"""
+Password hashing policy.
+Hashers are pluggable (bcrypt, PBKDF2-SHA256) and identified by the stored
+hash format, so old hashes keep verifying after the policy changes. The
+work factor is either fixed (PASSWORD_HASH_COST) or calibrated at startup
+to a wall-time budget (PASSWORD_HASH_TARGET_MS) on the current hardware,
+once per deployment: the first worker to start measures and shares the
+cost through the cache. Hashes made with another algorithm or cost are
+rehashed on the next successful login.
+"""
+import os
+import time
+import base64
+import hashlib
+import hmac
+import secrets
+import logging
+from typing import Dict, Optional, Type
+
+import bcrypt
+
+from app.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "bcrypt")
+HASH_COST = os.getenv("PASSWORD_HASH_COST")  # fixed cost; overrides calibration
+HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "0"))  # 0 = no calibration
+CALIBRATION_TTL = int(os.getenv("PASSWORD_HASH_CALIBRATION_TTL", "86400"))  # 1 day
+
+
+class PasswordHasher:
+    """
+    Base class for a password hashing algorithm.
+
+    ``cost`` is the algorithm's work factor (bcrypt log rounds, PBKDF2
+    iterations). Hashers only hold plain attributes so they can be sent to
+    a process pool.
+    """
+
+    name = ""
+    default_cost = 0
+    min_cost = 0
+    max_cost = 0
+
+    def __init__(self, cost: Optional[int] = None):
+        cost = self.default_cost if cost is None else int(cost)
+        self.cost = min(max(cost, self.min_cost), self.max_cost)
+
+    def identify(self, hashed: str) -> bool:
+        """True if hashed was produced by this algorithm"""
+        raise NotImplementedError
+
+    def hash(self, password: str) -> str:
+        raise NotImplementedError
+
+    def verify(self, password: str, hashed: str) -> bool:
+        raise NotImplementedError
+
+    def cost_of(self, hashed: str) -> Optional[int]:
+        """Work factor stored in hashed, or None if it cannot be parsed"""
+        raise NotImplementedError
+
+    def next_cost(self, cost: int) -> int:
+        """Next cost to try while calibrating (about twice the time)"""
+        raise NotImplementedError
+
+    def with_cost(self, cost: int) -> "PasswordHasher":
+        return type(self)(cost)
+
+
+class BcryptHasher(PasswordHasher):
+    """bcrypt; cost is log2 rounds (each step doubles the time)"""
+
+    name = "bcrypt"
+    default_cost = 12
+    min_cost = 10
+    max_cost = 16
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(("$2a$", "$2b$", "$2y$"))
+
+    def hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.cost)).decode('utf-8')
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except Exception:
+            return False
+
+    def cost_of(self, hashed: str) -> Optional[int]:
+        try:
+            return int(hashed.split("$")[2])
+        except (IndexError, ValueError):
+            return None
+
+    def next_cost(self, cost: int) -> int:
+        return cost + 1
+
+
+class PBKDF2Hasher(PasswordHasher):
+    """PBKDF2-HMAC-SHA256 stored as pbkdf2_sha256$<iterations>$<salt>$<hash>"""
+
+    name = "pbkdf2_sha256"
+    default_cost = 600000
+    min_cost = 100000
+    max_cost = 10000000
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(self.name + "$")
+
+    def _derive(self, password: str, salt: str, iterations: int) -> str:
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode('utf-8'), salt.encode('ascii'), iterations)
+        return base64.b64encode(digest).decode('ascii').rstrip("=")
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_urlsafe(16)
+        return f"{self.name}${self.cost}${salt}${self._derive(password, salt, self.cost)}"
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            _, iterations, salt, expected = hashed.split("$", 3)
+            return hmac.compare_digest(self._derive(password, salt, int(iterations)), expected)
+        except Exception:
+            return False
+
+    def cost_of(self, hashed: str) -> Optional[int]:
+        try:
+            return int(hashed.split("$")[1])
+        except (IndexError, ValueError):
+            return None
+
+    def next_cost(self, cost: int) -> int:
+        return cost * 2
+
+
+# Registry of available algorithms (name -> hasher class)
+HASHERS: Dict[str, Type[PasswordHasher]] = {}
+
+
+def register_hasher(hasher_class: Type[PasswordHasher]) -> Type[PasswordHasher]:
+    """Make an algorithm available to PASSWORD_HASH_ALGORITHM and to verification"""
+    HASHERS[hasher_class.name] = hasher_class
+    return hasher_class
+
+
+register_hasher(BcryptHasher)
+register_hasher(PBKDF2Hasher)
+
+
+def get_hasher(name: str, cost: Optional[int] = None) -> PasswordHasher:
+    if name not in HASHERS:
+        raise ValueError(f"Unknown password hash algorithm: {name}")
+    return HASHERS[name](cost)
+
+
+def identify_hasher(hashed: str) -> Optional[PasswordHasher]:
+    """Hasher for the algorithm that produced hashed, or None"""
+    for hasher_class in HASHERS.values():
+        hasher = hasher_class()
+        if hasher.identify(hashed):
+            return hasher
+    return None
+
+
+def hash_with(algorithm: str, cost: int, password: str) -> str:
+    """Hash with an explicit algorithm and cost (safe to run in a worker process)"""
+    return get_hasher(algorithm, cost).hash(password)
+
+
+def verify_any(password: str, hashed: str) -> bool:
+    """Verify against whichever registered algorithm produced hashed"""
+    hasher = identify_hasher(hashed)
+    if hasher is None:
+        return False
+    return hasher.verify(password, hashed)
+
+
+def calibrate(algorithm: str, target_ms: float, password: str = "calibration-password") -> int:
+    """
+    Highest cost whose hash time stays within target_ms on this machine.
+    Starts at the algorithm's minimum and steps up while the next step
+    (each roughly doubles the time) is still expected to fit the budget.
+    """
+    hasher = get_hasher(algorithm, HASHERS[algorithm].min_cost)
+    cost = hasher.cost
+    while cost < hasher.max_cost:
+        started = time.perf_counter()
+        hasher.with_cost(cost).hash(password)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms * 2 > target_ms:
+            break
+        cost = min(hasher.next_cost(cost), hasher.max_cost)
+    return cost
+
+
+class PasswordPolicy:
+    """
+    Current algorithm and cost for new hashes.
+
+    ``needs_rehash`` is true for hashes made with another algorithm or
+    cost, so a policy change (upgrade or downgrade) converges as users log
+    in. A calibrated cost that is not shared through Redis may differ
+    between workers, so then only weaker hashes are rehashed and logins
+    never flip a hash back and forth.
+    """
+
+    def __init__(self, algorithm: str = HASH_ALGORITHM, cost: Optional[int] = None):
+        self.configure(algorithm, cost)
+        self.calibrated_ms = None
+
+    def configure(self, algorithm: str, cost: Optional[int] = None) -> None:
+        self.hasher = get_hasher(algorithm, cost)
+
+    @property
+    def algorithm(self) -> str:
+        return self.hasher.name
+
+    @property
+    def cost(self) -> int:
+        return self.hasher.cost
+
+    def calibrate(self, target_ms: float) -> int:
+        """Pick the cost for target_ms on this machine and apply it"""
+        started = time.perf_counter()
+        cost = calibrate(self.algorithm, target_ms)
+        self.configure(self.algorithm, cost)
+        self.calibrated_ms = target_ms
+        logger.info(
+            f"Password hash cost calibrated: {self.algorithm} cost={cost} for "
+            f"{target_ms:.0f} ms budget (took {time.perf_counter() - started:.2f}s)"
+        )
+        return cost
+
+    def needs_rehash(self, hashed: str) -> bool:
+        if not hashed:
+            return False
+        if not self.hasher.identify(hashed):
+            return True
+        cost = self.hasher.cost_of(hashed)
+        if cost is None or cost < self.cost:
+            return True
+        return cost != self.cost and self.cost_is_shared()
+
+    def cost_is_shared(self) -> bool:
+        """True if every worker hashes with this cost (fixed, or calibrated through Redis)"""
+        return self.calibrated_ms is None or bool(cache.use_redis and cache.redis_client)
+
+    def stats(self) -> dict:
+        return {
+            "algorithm": self.algorithm,
+            "cost": self.cost,
+            "calibrated_ms": self.calibrated_ms,
+            "available": sorted(HASHERS),
+        }
+
+
+def _initial_policy() -> PasswordPolicy:
+    try:
+        return PasswordPolicy(HASH_ALGORITHM, int(HASH_COST) if HASH_COST else None)
+    except ValueError as e:
+        logger.error(f"Invalid password hash policy ({e}), falling back to bcrypt")
+        return PasswordPolicy(BcryptHasher.name)
+
+
+# Global policy (one per worker; calibrated at startup when configured)
+password_policy = _initial_policy()
+
+
+def calibration_cache_key(algorithm: str, target_ms: float) -> str:
+    return f"password:cost:{algorithm}:{target_ms:g}"
+
+
+def calibrate_from_env() -> None:
+    """
+    Startup hook: calibrate unless a fixed cost is configured. The cost is
+    measured once and shared through the cache, so every worker (and every
+    restart within CALIBRATION_TTL) hashes with the same cost.
+    """
+    if not HASH_TARGET_MS or HASH_COST:
+        return
+    cost = cache.get_or_load(
+        calibration_cache_key(password_policy.algorithm, HASH_TARGET_MS),
+        lambda: password_policy.calibrate(HASH_TARGET_MS),
+        ttl=CALIBRATION_TTL, stale_ttl=0
+    )
+    if cost != password_policy.cost:
+        password_policy.configure(password_policy.algorithm, cost)
+        password_policy.calibrated_ms = HASH_TARGET_MS
+        logger.info(f"Password hash cost taken from the shared calibration: {password_policy.algorithm} cost={cost}")
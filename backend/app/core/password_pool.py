@@ -0,0 +1,131 @@
+"""
+Bounded executor for password hashing.
+bcrypt costs 100-250 ms of CPU per call; running it on a dedicated,
+size-limited pool keeps a burst of logins from starving other traffic.
+When more than PASSWORD_POOL_MAX_QUEUE calls are waiting, new calls fail
+fast with PasswordPoolOverloaded instead of queueing (mapped to HTTP 503
+by app.core.dependencies.password_pool_busy).
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+POOL_MODE = os.getenv("PASSWORD_POOL_MODE", "thread")  # thread | process
+POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", "32"))
+POOL_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_POOL_TIMEOUT", "10"))
+
+
+class PasswordPoolOverloaded(Exception):
+    """Raised when the password hashing pool is saturated"""
+
+
+class PasswordHashPool:
+    """
+    Runs password hashing functions on a dedicated executor.
+
+    ``run`` blocks the calling thread (a request worker thread, never the
+    event loop) until the result is ready. Bcrypt releases the GIL, so the
+    thread mode scales with ``size`` cores; the process mode isolates the
+    work completely at the cost of pickling arguments.
+    """
+
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        max_queue: int = POOL_MAX_QUEUE,
+        mode: str = POOL_MODE,
+        timeout: float = POOL_TIMEOUT_SECONDS,
+    ):
+        self.size = max(size, 1)
+        self.max_queue = max_queue
+        self.mode = mode
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.in_flight = 0  # queued + running
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._wait_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.mode == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.size)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.size, thread_name_prefix="password-hash"
+                        )
+                    logger.info(f"Password hash pool started ({self.mode}, {self.size} workers)")
+        return self._executor
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool and return its result"""
+        with self._lock:
+            if self.in_flight >= self.size + self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolOverloaded("Password hashing pool is overloaded")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.monotonic()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        # The slot is held until the call really finishes (a timed-out call
+        # may still be running on a worker)
+        future.add_done_callback(lambda done: self._release(done, started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordPoolOverloaded("Password hashing timed out")
+
+    def _release(self, future, started: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if not future.cancelled() and future.exception() is None:
+                self.completed += 1
+                self._wait_seconds += time.monotonic() - started
+
+    def queue_depth(self) -> int:
+        """Calls waiting for a free worker"""
+        return max(self.in_flight - self.size, 0)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "size": self.size,
+                "in_flight": self.in_flight,
+                "queue_depth": max(self.in_flight - self.size, 0),
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_latency_ms": round(self._wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            }
+
+
+# Global pool instance (one per worker)
+password_pool = PasswordHashPool()
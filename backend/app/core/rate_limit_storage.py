@@ -0,0 +1,222 @@
+"""
+Shared rate-limit storage with local token leases.
+Registered with the limits library as ``batched+redis://`` (and
+``batched+rediss://``) for slowapi's sliding-window-counter strategy.
+Instead of one Redis round trip per request, a worker leases a slice of a
+limit's remaining budget from Redis and spends it locally; a new lease is
+taken when the slice runs out or the window rolls over, and unused tokens
+are handed back then (leases of keys that go quiet are swept and handed
+back every RATE_LIMIT_LEASE_SWEEP_SECONDS). Small limits (login, register) get one-token leases,
+so they stay exact across workers.
+"""
+import os
+import time
+import logging
+import threading
+from math import floor
+from typing import Optional
+
+from limits.storage import MemoryStorage
+from limits.storage.base import Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# A lease is at most limit // RATE_LIMIT_LEASE_DIVISOR tokens (at least 1)
+LEASE_DIVISOR = int(os.getenv("RATE_LIMIT_LEASE_DIVISOR", "10"))
+KEY_PREFIX = os.getenv("RATE_LIMIT_KEY_PREFIX", "ratelimit:")
+LEASE_SWEEP_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SWEEP_SECONDS", "60"))
+# After a Redis error, serve limits per worker for this long before retrying
+RETRY_AFTER_ERROR_SECONDS = 5.0
+
+
+class _Lease:
+    __slots__ = ("window_key", "remaining", "ends_at")
+
+    def __init__(self, window_key: str, remaining: int, ends_at: float):
+        self.window_key = window_key
+        self.remaining = remaining
+        self.ends_at = ends_at  # when the lease's window rolls over
+
+
+class BatchedRedisStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """
+    Sliding-window-counter storage backed by Redis with per-worker leases.
+
+    Tokens leased but not yet spent count as used in Redis, so limits are
+    never exceeded across workers; at worst each worker holds back one lease
+    per key. While Redis is unreachable the limits are enforced per worker.
+    """
+
+    STORAGE_SCHEME = ["batched+redis", "batched+rediss"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, redis_client=None, **options):
+        self.redis_url = uri.replace("batched+", "", 1) if uri else None
+        self._client = redis_client
+        self._leases = {}  # limit key -> _Lease for its current window
+        self._lock = threading.Lock()
+        self._fallback = MemoryStorage()
+        self._failed_at = 0.0
+        self._swept_at = time.time()
+        self.local_hits = 0
+        self.round_trips = 0
+        self.fallback_hits = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return redis.RedisError if REDIS_AVAILABLE else Exception
+
+    @property
+    def redis(self):
+        if self._client is None:
+            self._client = redis.from_url(self.redis_url, socket_connect_timeout=2, socket_timeout=2)
+        return self._client
+
+    # ------------------------------------------------------------------
+    # Sliding window counter
+    # ------------------------------------------------------------------
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        if now - self._swept_at >= LEASE_SWEEP_SECONDS:
+            self._sweep(now)
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease.window_key == current_key and lease.remaining >= amount:
+                lease.remaining -= amount
+                self.local_hits += 1
+                return True
+            self._leases.pop(key, None)
+        if now - self._failed_at < RETRY_AFTER_ERROR_SECONDS:
+            self.fallback_hits += 1
+            return self._fallback.acquire_sliding_window_entry(key, limit, expiry, amount)
+        try:
+            return self._lease(key, previous_key, current_key, limit, expiry, amount, now, lease)
+        except Exception as e:
+            logger.error(f"Rate limit storage unreachable, enforcing limits per worker: {e}")
+            self._failed_at = now
+            self.fallback_hits += 1
+            return self._fallback.acquire_sliding_window_entry(key, limit, expiry, amount)
+
+    def _lease(self, key, previous_key, current_key, limit, expiry, amount, now, stale: Optional[_Lease]) -> bool:
+        """Reserve a slice of the remaining budget in Redis and spend amount of it"""
+        size = max(amount, limit // LEASE_DIVISOR, 1)
+        pipe = self.redis.pipeline()
+        if stale is not None and stale.remaining:
+            # Hand back what the previous lease did not use
+            pipe.decrby(KEY_PREFIX + stale.window_key, stale.remaining)
+        pipe.get(KEY_PREFIX + previous_key)
+        pipe.incrby(KEY_PREFIX + current_key, size)
+        pipe.expire(KEY_PREFIX + current_key, 2 * expiry)
+        results = pipe.execute()
+        self.round_trips += 1
+        previous_count, current_count = int(results[-3] or 0), int(results[-2])
+
+        weight = 1 - (((now - expiry) / expiry) % 1)
+        available = limit - floor(previous_count * weight) - (current_count - size)
+        granted = min(size, available)
+        if granted < amount:
+            self.redis.decrby(KEY_PREFIX + current_key, size)
+            return False
+        if granted < size:
+            self.redis.decrby(KEY_PREFIX + current_key, size - granted)
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease.window_key == current_key:
+                lease.remaining += granted - amount
+            else:
+                self._leases[key] = _Lease(current_key, granted - amount, (int(now / expiry) + 1) * expiry)
+        return True
+
+    def _sweep(self, now: float) -> None:
+        """Drop leases whose window has rolled over and hand back their unused tokens"""
+        with self._lock:
+            self._swept_at = now
+            expired = [key for key, lease in self._leases.items() if lease.ends_at <= now]
+            leases = [self._leases.pop(key) for key in expired]
+        unused = [lease for lease in leases if lease.remaining]
+        if not unused or now - self._failed_at < RETRY_AFTER_ERROR_SECONDS:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for lease in unused:
+                pipe.decrby(KEY_PREFIX + lease.window_key, lease.remaining)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not hand back {len(unused)} expired rate limit leases: {e}")
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple:
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        try:
+            previous_count, current_count = self.redis.mget(KEY_PREFIX + previous_key, KEY_PREFIX + current_key)
+        except Exception:
+            return self._fallback.get_sliding_window(key, expiry)
+        previous_count, current_count = int(previous_count or 0), int(current_count or 0)
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        with self._lock:
+            self._leases.pop(key, None)
+        self._fallback.clear_sliding_window(key, expiry)
+        self.redis.delete(KEY_PREFIX + previous_key, KEY_PREFIX + current_key)
+
+    # ------------------------------------------------------------------
+    # Fixed window (not batched)
+    # ------------------------------------------------------------------
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        value = int(self.redis.incrby(KEY_PREFIX + key, amount))
+        if value == amount:
+            self.redis.expire(KEY_PREFIX + key, expiry)
+        return value
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        return int(self.redis.decrby(KEY_PREFIX + key, amount))
+
+    def get(self, key: str) -> int:
+        return int(self.redis.get(KEY_PREFIX + key) or 0)
+
+    def get_expiry(self, key: str) -> float:
+        return time.time() + max(self.redis.ttl(KEY_PREFIX + key), 0)
+
+    def check(self) -> bool:
+        try:
+            return bool(self.redis.ping())
+        except Exception:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            self._leases.clear()
+        self._fallback.reset()
+        keys = list(self.redis.scan_iter(match=KEY_PREFIX + "*", count=500))
+        if keys:
+            self.redis.delete(*keys)
+        return len(keys)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._leases.pop(key, None)
+        self._fallback.clear(key)
+        self.redis.delete(KEY_PREFIX + key)
+
+    def stats(self) -> dict:
+        return {
+            "leases": len(self._leases),
+            "local_hits": self.local_hits,
+            "round_trips": self.round_trips,
+            "fallback_hits": self.fallback_hits,
+        }
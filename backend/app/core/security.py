@@ -9,31 +9,57 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import Request
 import os
-import bcrypt
+import time
 import uuid
 import re
+import hashlib
 from dotenv import load_dotenv
 
+from app.core.memory_cache import MemoryCache
+from app.core import rate_limit_storage  # noqa: F401 (registers batched+redis://)
+from app.core.password_pool import password_pool
+from app.core.password_hasher import password_policy, hash_with, verify_any
+
 load_dotenv()
 
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Refresh tokens live as long as their session and are signed with a
+# separate key, so they can never be used as access tokens
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REFRESH_SECRET_KEY = os.getenv("REFRESH_SECRET_KEY", SECRET_KEY + ":refresh")
+REFRESH_TOKEN_TYPE = "refresh"
+
+# Verified-token cache: payloads of tokens that passed signature and expiry
+# checks, keyed by a hash of the token and kept no longer than the token's
+# own exp. Per process, so each token is verified once per worker.
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))
+_verified_tokens = MemoryCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, max_bytes=16 * 1024 * 1024)
 
 
 # Password Hashing Functions
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a bcrypt hash"""
-    try:
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-    except Exception:
+    """
+    Verify a password against a stored hash of any registered algorithm
+    (on the password hash pool).
+    Raises PasswordPoolOverloaded if the pool is saturated.
+    """
+    if not plain_password or not hashed_password:
         return False
+    return password_pool.run(verify_any, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """Hash a password with the current password policy (on the password hash pool)"""
+    return password_pool.run(hash_with, password_policy.algorithm, password_policy.cost, password)
+
+
+def password_needs_rehash(hashed_password: Optional[str]) -> bool:
+    """True if the stored hash does not match the current algorithm and cost"""
+    return password_policy.needs_rehash(hashed_password)
 
 
 # JWT Token Functions
@@ -71,6 +97,38 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, j
     return encoded_jwt, jti
 
 
+def create_refresh_token(user_id: str, jti: str, generation: int = 0, expires_at: Optional[datetime] = None) -> str:
+    """
+    Create a refresh token for the session identified by jti.
+    ``generation`` must match UserSession.refresh_generation when the token
+    is redeemed; each refresh issues the next generation (rotation).
+    """
+    if expires_at is None:
+        expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    payload = {
+        "sub": str(user_id),
+        "jti": jti,
+        "gen": generation,
+        "type": REFRESH_TOKEN_TYPE,
+        "exp": expires_at,
+        "iat": datetime.now(timezone.utc),
+    }
+    return jwt.encode(payload, REFRESH_SECRET_KEY, algorithm=ALGORITHM)
+
+
+def verify_refresh_token(token: str) -> Optional[dict]:
+    """Decode a refresh token; None if invalid, expired or not a refresh token"""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, REFRESH_SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != REFRESH_TOKEN_TYPE or not payload.get("jti") or not isinstance(payload.get("gen"), int):
+        return None
+    return payload
+
+
 def get_device_info(request: Request) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """
     Extract device information from request.
@@ -99,23 +157,52 @@ def get_device_info(request: Request) -> Tuple[Optional[str], Optional[str], Opt
 
 
 def verify_token(token: str) -> Optional[dict]:
-    """Verify and decode JWT token"""
+    """
+    Verify and decode JWT token.
+    Verified payloads are cached per process until the token expires (at
+    most TOKEN_CACHE_MAX_TTL seconds), so repeat calls skip the HMAC check.
+    """
+    if not token:
+        return None
+    cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    payload = _verified_tokens.get(cache_key)
+    if payload is not None:
+        return dict(payload)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    exp = payload.get("exp")
+    ttl = TOKEN_CACHE_MAX_TTL if exp is None else min(exp - time.time(), TOKEN_CACHE_MAX_TTL)
+    if ttl > 0:
+        _verified_tokens.set(cache_key, payload, ttl=ttl)
+    return dict(payload)
+
+
+def clear_token_cache() -> None:
+    """Forget all verified tokens (e.g. after rotating SECRET_KEY)"""
+    _verified_tokens.clear()
 
 
 # Rate Limiting Configuration
 # Check if we're in test mode
 TESTING = os.getenv("TESTING", "false").lower() == "true" or os.getenv("ENVIRONMENT", "").lower() == "test"
 
+# Rate limit storage: "memory://" (per worker), "redis://..." (a Redis round
+# trip per request) or "batched+redis://..." (shared limits with per-worker
+# leases, see app.core.rate_limit_storage)
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+RATE_LIMIT_STRATEGY = os.getenv(
+    "RATE_LIMIT_STRATEGY",
+    "sliding-window-counter" if RATE_LIMIT_STORAGE_URI.startswith("batched+") else "fixed-window"
+)
+
 # Initialize rate limiter
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200/hour"],  # General API rate limit
-    storage_uri=os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")  # Can be "redis://localhost:6379" for Redis
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY
 )
 
 # Rate limit configurations for authentication endpoints
@@ -124,6 +211,7 @@ AUTH_RATE_LIMITS = {
     "register": "3/minute",  # 3 registration attempts per minute per IP
     "password_reset": "3/hour",  # 3 password reset requests per hour per IP
     "guest_login": "10/minute",  # 10 guest login attempts per minute per IP
+    "refresh": "30/minute",  # 30 token refreshes per minute per IP
 }
 
 
@@ -1,3 +1,3 @@
-from app.database.connection import Base, engine, SessionLocal, get_db, create_tables_safely
+from app.database.connection import Base, engine, SessionLocal, get_db, create_tables_safely, replica_pool
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db", "create_tables_safely"]
+__all__ = ["Base", "engine", "SessionLocal", "get_db", "create_tables_safely", "replica_pool"]
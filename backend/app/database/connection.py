@@ -5,10 +5,14 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import QueuePool, NullPool
 from sqlalchemy.exc import OperationalError
+from fastapi import Request
 import os
 import logging
 from dotenv import load_dotenv
 
+from app.database.replicas import ReplicaPool, RoutingSession, replica_urls
+from app.database import sqlite
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -25,7 +29,10 @@ engine_kwargs = {
     "echo": False,  # Set to True for SQL logging in development
 }
 
-if DATABASE_URL.startswith("sqlite"):
+if sqlite.SQLITE_TUNING_ENABLED and sqlite.is_file_database(DATABASE_URL):
+    # Pooled WAL connections with tuned pragmas (see app/database/sqlite.py)
+    engine_kwargs.update(sqlite.engine_kwargs())
+elif DATABASE_URL.startswith("sqlite"):
     engine_kwargs["connect_args"] = {"check_same_thread": False}
     engine_kwargs["poolclass"] = NullPool  # SQLite doesn't benefit from pooling
 else:
@@ -39,6 +46,9 @@ else:
 # Create engine with optimized settings
 engine = create_engine(DATABASE_URL, **engine_kwargs)
 
+if sqlite.SQLITE_TUNING_ENABLED and sqlite.is_file_database(DATABASE_URL):
+    sqlite.configure(engine)
+
 # Add event listeners for PostgreSQL optimization
 if DATABASE_URL.startswith("postgresql"):
     @event.listens_for(engine, "connect")
@@ -51,7 +61,11 @@ if DATABASE_URL.startswith("postgresql"):
         cursor.execute("SET work_mem = '16MB'")
         cursor.close()
 
+# Read replicas (DATABASE_REPLICA_URLS) serve the reads of GET requests
+replica_pool = ReplicaPool([create_engine(url, **engine_kwargs) for url in replica_urls()])
+
 SessionLocal = sessionmaker(
+    class_=RoutingSession,
     autocommit=False,
     autoflush=False,
     bind=engine,
@@ -60,12 +74,15 @@ SessionLocal = sessionmaker(
 
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request):
     """
     Dependency for getting database sessions.
     Automatically handles connection lifecycle.
+    GET requests read from a replica (when configured) until they write.
     """
     db = SessionLocal()
+    if request.method == "GET":
+        db.info["replica"] = replica_pool.choose()
     try:
         yield db
     finally:
@@ -0,0 +1,41 @@
+"""
+Migration script to add refresh token rotation to user sessions.
+Run this once on existing databases (new ones get the column from the model).
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import inspect, text
+import logging
+from app.database import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def column_exists(table_name: str, column_name: str) -> bool:
+    """Check if a column exists in a table"""
+    inspector = inspect(engine)
+    return column_name in [col['name'] for col in inspector.get_columns(table_name)]
+
+
+def migrate():
+    """Run migration to add user_sessions.refresh_generation"""
+    logger.info("Starting refresh token migration...")
+    
+    if not column_exists('user_sessions', 'refresh_generation'):
+        logger.info("Adding refresh_generation to user_sessions table...")
+        with engine.begin() as connection:
+            connection.execute(text(
+                "ALTER TABLE user_sessions ADD COLUMN refresh_generation INTEGER NOT NULL DEFAULT 0"
+            ))
+        logger.info("✓ refresh_generation added")
+    else:
+        logger.info("✓ refresh_generation already exists")
+    
+    logger.info("Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,172 @@
+"""
+Read-replica routing.
+DATABASE_REPLICA_URLS (comma-separated) adds read replicas next to the
+primary. Sessions opened for GET requests send their SELECTs to one replica,
+picked round-robin among the healthy ones, until the session writes
+anything; from then on (and in every other session) all statements go to
+the primary, so a request always reads its own writes. A background thread
+pings each replica and measures its replication lag; unreachable replicas
+and replicas lagging more than REPLICA_MAX_LAG_SECONDS are ejected until
+they recover.
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from itertools import count
+from typing import Optional, List
+
+from sqlalchemy import text, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = int(os.getenv("REPLICA_CHECK_INTERVAL", "10"))
+
+# Seconds since the last replayed transaction (0 when fully caught up)
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def replica_urls() -> List[str]:
+    return [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+
+class _Replica:
+    __slots__ = ("engine", "healthy", "lag", "error", "checked_at")
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.healthy = True  # until the first check says otherwise
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+
+
+class ReplicaPool:
+    """Round-robin over the healthy replica engines, with periodic health and lag checks"""
+
+    def __init__(self, engines: List[Engine], max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 interval: int = REPLICA_CHECK_INTERVAL):
+        self._replicas = [_Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+        self.interval = interval
+        self._counter = count()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._replicas)
+
+    def choose(self) -> Optional[Engine]:
+        """Next healthy replica, or None to use the primary"""
+        healthy = [replica for replica in self._replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)].engine
+
+    def _measure_lag(self, engine: Engine) -> float:
+        with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                return float(conn.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+            conn.execute(text("SELECT 1"))
+            return 0.0
+
+    def check(self) -> None:
+        """Ping every replica and eject the unreachable or lagging ones"""
+        for replica in self._replicas:
+            try:
+                replica.lag = self._measure_lag(replica.engine)
+                replica.error = None
+            except Exception as e:
+                replica.lag = None
+                replica.error = str(e)
+            replica.checked_at = time.time()
+            healthy = replica.error is None and replica.lag <= self.max_lag
+            if healthy != replica.healthy:
+                reason = replica.error or f"lag {replica.lag:.1f}s"
+                logger.warning(
+                    f"Read replica {replica.engine.url.render_as_string(hide_password=True)} "
+                    f"{'back in rotation' if healthy else f'ejected ({reason})'}"
+                )
+            replica.healthy = healthy
+
+    def start(self) -> None:
+        if self._replicas and self._thread is None and self.interval > 0:
+            self._stopped.clear()
+            self.check()
+            self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> list:
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+                "error": replica.error,
+            }
+            for replica in self._replicas
+        ]
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from ``info["replica"]`` (an engine) when one is set,
+    until the first write. Everything else uses the session's bind (the
+    primary).
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if (replica is not None and not self._flushing and getattr(clause, "is_select", False)
+                and getattr(clause, "_for_update_arg", None) is None):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+def _stick_to_primary(session: Session) -> None:
+    session.info.pop("replica", None)
+    session.info["wrote"] = True
+
+
+@contextmanager
+def primary_reads(session):
+    """
+    Send the block's reads to the primary. For reads whose result outlives
+    the request (cache entries, the revocation mirror): a lagging replica
+    would otherwise put already-invalidated rows back for a whole TTL.
+    """
+    info = getattr(session, "info", None)
+    replica = info.pop("replica", None) if info is not None else None
+    try:
+        yield session
+    finally:
+        if replica is not None and not info.get("wrote"):
+            info["replica"] = replica
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _route_writes(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _stick_to_primary(orm_execute_state.session)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _route_flushes(session, flush_context, instances):
+    _stick_to_primary(session)
@@ -0,0 +1,117 @@
+"""
+SQLite profile for file databases.
+Small branch deployments run on a single SQLite file. Instead of opening a
+new connection per session (NullPool) with the default rollback journal,
+connections are pooled and opened in WAL mode, so readers never block the
+writer, with synchronous=NORMAL (durable at checkpoints, no fsync per
+commit), a busy timeout instead of immediate "database is locked" errors,
+memory-mapped reads and a larger page cache (sized so all pooled
+connections together stay within SQLITE_CACHE_BUDGET_KB). PRAGMA optimize
+runs periodically to keep the query planner's statistics current.
+Set SQLITE_TUNING_ENABLED=false for the old behaviour.
+"""
+import os
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+SQLITE_TUNING_ENABLED = os.getenv("SQLITE_TUNING_ENABLED", "true").lower() == "true"
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "10"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "30"))  # FastAPI's threadpool has 40 threads
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+SQLITE_CACHE_BUDGET_KB = int(os.getenv("SQLITE_CACHE_BUDGET_KB", str(256 * 1024)))  # all connections together
+SQLITE_CACHE_SIZE_KB = int(os.getenv(  # per connection
+    "SQLITE_CACHE_SIZE_KB", str(max(SQLITE_CACHE_BUDGET_KB // (SQLITE_POOL_SIZE + SQLITE_MAX_OVERFLOW), 2048))
+))
+SQLITE_OPTIMIZE_INTERVAL = int(os.getenv("SQLITE_OPTIMIZE_INTERVAL", "3600"))
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", SQLITE_BUSY_TIMEOUT_MS),
+    ("mmap_size", SQLITE_MMAP_SIZE),
+    ("cache_size", -SQLITE_CACHE_SIZE_KB),  # negative: KiB rather than pages
+    ("temp_store", "MEMORY"),
+)
+
+
+def is_file_database(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and url.rstrip("/") not in ("sqlite:", "sqlite+pysqlite:")
+
+
+def engine_kwargs() -> dict:
+    """create_engine options for a file database under this profile"""
+    return {
+        "connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        "poolclass": QueuePool,
+        "pool_size": SQLITE_POOL_SIZE,
+        "max_overflow": SQLITE_MAX_OVERFLOW,
+    }
+
+
+def apply_pragmas(dbapi_conn) -> None:
+    cursor = dbapi_conn.cursor()
+    try:
+        for name, value in PRAGMAS:
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def configure(engine: Engine) -> None:
+    """Apply the pragmas to every connection the engine opens"""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_conn, connection_record):
+        apply_pragmas(dbapi_conn)
+
+
+def optimize(engine: Engine) -> None:
+    """Refresh planner statistics for tables whose shape changed"""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+
+
+class SqliteOptimizer:
+    """Runs PRAGMA optimize every SQLITE_OPTIMIZE_INTERVAL seconds on a daemon thread"""
+
+    def __init__(self, interval: int = SQLITE_OPTIMIZE_INTERVAL):
+        self.interval = interval
+        self._engine = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, engine: Engine) -> None:
+        if self._thread is None and self.interval > 0:
+            self._engine = engine
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="sqlite-optimize", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                optimize(self._engine)
+            except Exception as e:
+                logger.warning(f"PRAGMA optimize failed: {e}")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._engine is not None:
+            try:
+                optimize(self._engine)  # recommended before closing connections
+            except Exception as e:
+                logger.warning(f"PRAGMA optimize failed: {e}")
+            self._engine = None
+
+
+# Global optimizer (started by the app when the database is a SQLite file)
+sqlite_optimizer = SqliteOptimizer()
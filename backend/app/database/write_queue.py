@@ -0,0 +1,224 @@
+"""
+Single-writer queue with group commit.
+On a SQLite file every commit takes the database's one write lock, so
+concurrent request threads writing chat messages, session activity and
+appointments either wait on each other (each paying its own sync) or fail
+with "database is locked". With WRITE_QUEUE_ENABLED=true those writes are
+handed to one writer thread as jobs instead: the writer takes whatever jobs
+are queued (up to WRITE_QUEUE_MAX_BATCH, waiting WRITE_QUEUE_MAX_WAIT_MS
+for more), runs each in its own SAVEPOINT and commits them all at once.
+Callers get a Future with their job's result or exception; a failing job
+only rolls back its own savepoint (and is logged, so fire-and-forget
+failures are not lost).
+
+A job is ``fn(db, *args, **kwargs)``: it may flush but must not commit,
+and objects it returns are detached once the batch commits (refresh them
+in the job, or reload them in the caller's session).
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Callable, Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+WRITE_QUEUE_MAX_WAIT_MS = int(os.getenv("WRITE_QUEUE_MAX_WAIT_MS", "2"))
+WRITE_QUEUE_TIMEOUT = float(os.getenv("WRITE_QUEUE_TIMEOUT", "30"))
+
+
+def create_writer_engine(url: str):
+    """
+    Engine for the writer thread. On SQLite the driver's own transaction
+    handling is turned off (it breaks SAVEPOINT) and every transaction
+    starts with BEGIN IMMEDIATE, taking the write lock up front.
+    """
+    from app.database import sqlite
+
+    engine = create_engine(url, connect_args=sqlite.engine_kwargs()["connect_args"], pool_size=1, max_overflow=0)
+    sqlite.configure(engine)
+
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_conn, connection_record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+def _default_sessionmaker():
+    from app.database import connection
+    if connection.sqlite.is_file_database(connection.DATABASE_URL):
+        return sessionmaker(bind=create_writer_engine(connection.DATABASE_URL), expire_on_commit=False)
+    return connection.SessionLocal
+
+
+def _name(fn: Callable) -> str:
+    return getattr(fn, "__name__", repr(fn))
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class WriteQueue:
+    """
+    Funnels write jobs through one writer thread and commits them in groups.
+
+    Disabled by default (WRITE_QUEUE_ENABLED=false) and under TESTING;
+    repositories then keep committing on the request's session.
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None, enabled: Optional[bool] = None,
+                 max_batch: int = WRITE_QUEUE_MAX_BATCH, max_wait_ms: int = WRITE_QUEUE_MAX_WAIT_MS):
+        if enabled is None:
+            enabled = (
+                os.getenv("WRITE_QUEUE_ENABLED", "false").lower() == "true"
+                and not os.environ.get("TESTING")
+            )
+        self.enabled = enabled
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.commits = 0
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(db, *args, **kwargs) for the writer; returns its Future"""
+        job = _Job(fn, args, kwargs)
+        self._ensure_thread()
+        self._queue.put(job)
+        return job.future
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        submit() and wait for the job's result (or exception). After
+        WRITE_QUEUE_TIMEOUT a job still waiting in the queue is cancelled and
+        never runs; one the writer has already started may still commit.
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=WRITE_QUEUE_TIMEOUT)
+        except FutureTimeoutError:
+            if not future.cancel():
+                logger.warning(f"Write job {_name(fn)} timed out while running; it may still commit")
+            raise
+
+    # ------------------------------------------------------------------
+    # Writer
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    if self._session_factory is None:
+                        self._session_factory = _default_sessionmaker()
+                    self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+            # Skip jobs whose caller gave up (run() timed out) before they started
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: list) -> None:
+        """Run a batch in one transaction, one savepoint per job"""
+        outcomes = []
+        try:
+            db = self._session_factory()
+        except Exception as e:
+            logger.error(f"Write queue could not open a session: {e}")
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        try:
+            for job in batch:
+                try:
+                    with db.begin_nested():
+                        outcomes.append((job, job.fn(db, *job.args, **job.kwargs), None))
+                except Exception as e:
+                    outcomes.append((job, None, e))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if len(batch) > 1:
+                # Commit failed as a whole: retry the jobs one by one
+                logger.warning(f"Group commit of {len(batch)} writes failed, retrying individually: {e}")
+                for job in batch:
+                    self._commit([job])
+                return
+            outcomes = [(batch[0], None, e)]
+        finally:
+            db.close()
+        self.commits += 1
+        for job, result, error in outcomes:
+            self.jobs += 1
+            if error is not None:
+                self.failed_jobs += 1
+                logger.error(f"Write job {_name(job.fn)} failed: {error}")
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+    def close(self) -> None:
+        """Finish queued jobs and stop the writer"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "jobs": self.jobs,
+            "failed_jobs": self.failed_jobs,
+            "commits": self.commits,
+        }
+
+
+# Global writer (one per worker process)
+write_queue = WriteQueue()
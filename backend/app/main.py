@@ -17,9 +17,16 @@ import os
 import logging
 from dotenv import load_dotenv
 
-from app.database import get_db, engine, Base, create_tables_safely
+from app.database import get_db, engine, Base, create_tables_safely, replica_pool, sqlite
 from app.core.security import get_rate_limit_handler
 from app.core.logger import setup_logging
+from app.core.async_cache import async_cache
+from app.services.barcode_filter import barcode_filter
+from app.services.write_behind import write_behind
+from app.database.write_queue import write_queue
+from app.services.retention import retention_scheduler
+from app.core.password_pool import password_pool
+from app.core.password_hasher import calibrate_from_env
 from app.api.v1.routes import chat, admin, appointments, auth, users, system, enterprise, branch_manager, technicians
 
 load_dotenv()
@@ -95,6 +102,83 @@ app.include_router(branch_manager.router, prefix="/api/branch-manager", tags=["B
 # Technicians endpoints
 app.include_router(technicians.router, prefix="/api/technicians", tags=["Technicians"])
 
+
+@app.on_event("startup")
+async def build_barcode_filter():
+    """Load valid barcodes into the guest-login Bloom filter (off the event loop)"""
+    if not os.environ.get("TESTING"):
+        barcode_filter.build_in_background()
+
+
+@app.on_event("startup")
+def calibrate_password_hashing():
+    """Pick the password hash cost for PASSWORD_HASH_TARGET_MS on this machine"""
+    calibrate_from_env()
+
+
+@app.on_event("startup")
+def start_retention_scheduler():
+    """Purge expired sessions, reset tokens and old login history periodically"""
+    if not os.environ.get("TESTING") and os.getenv("RETENTION_ENABLED", "true").lower() == "true":
+        retention_scheduler.start()
+
+
+@app.on_event("startup")
+def start_replica_health_checks():
+    """Track read replica health and lag (no-op without DATABASE_REPLICA_URLS)"""
+    if not os.environ.get("TESTING"):
+        replica_pool.start()
+
+
+@app.on_event("startup")
+def start_sqlite_optimizer():
+    """Run PRAGMA optimize periodically on a tuned SQLite file database"""
+    if not os.environ.get("TESTING") and sqlite.SQLITE_TUNING_ENABLED and sqlite.is_file_database(str(engine.url)):
+        sqlite.sqlite_optimizer.start(engine)
+
+
+@app.on_event("shutdown")
+async def shutdown_cache():
+    """Release the async Redis connection pool"""
+    await async_cache.close()
+
+
+@app.on_event("shutdown")
+def flush_write_behind():
+    """Write out buffered session activity and login history"""
+    write_behind.close()
+
+
+@app.on_event("shutdown")
+def close_write_queue():
+    """Commit the writes still queued for the writer thread"""
+    write_queue.close()
+
+
+@app.on_event("shutdown")
+def stop_retention_scheduler():
+    """Stop the retention thread"""
+    retention_scheduler.stop()
+
+
+@app.on_event("shutdown")
+def stop_replica_health_checks():
+    """Stop the replica health thread"""
+    replica_pool.stop()
+
+
+@app.on_event("shutdown")
+def stop_sqlite_optimizer():
+    """Stop the optimizer thread (running PRAGMA optimize once more)"""
+    sqlite.sqlite_optimizer.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    """Stop the password hashing workers"""
+    password_pool.shutdown()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
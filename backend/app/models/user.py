@@ -221,6 +221,7 @@ class UserSession(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    refresh_generation = Column(Integer, default=0, server_default="0", nullable=False)  # current refresh token generation
     
     # Relationship
     user = relationship("User", backref="sessions")
@@ -7,6 +7,7 @@ from app.schemas.auth_schema import (
     UserResponse,
     TokenResponse,
     RegisterResponse,
+    RefreshTokenRequest,
     ErrorResponse,
     SessionResponse,
     SessionsListResponse,
@@ -74,6 +75,7 @@ __all__ = [
     "UserResponse",
     "TokenResponse",
     "RegisterResponse",
+    "RefreshTokenRequest",
     "ErrorResponse",
     "SessionResponse",
     "SessionsListResponse",
@@ -82,6 +82,7 @@ class UserResponse(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
     role: Optional[str] = None
     enterprise_id: Optional[str] = None
     enterprise_role: Optional[str] = None
@@ -91,6 +92,11 @@ class RegisterResponse(BaseModel):
     user: UserResponse
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 
 class ErrorResponse(BaseModel):
@@ -88,9 +88,7 @@ class AppointmentService:
             status=status,
         )
 
-        self.repo.db.add(appointment)
-        self.repo.db.commit()
-        self.repo.db.refresh(appointment)
+        appointment = self.repo.add(appointment)
         
         logger.info(f"User {creator.id} ({creator.role}) created new appointment {appointment.id} for customer {customer_id} with status {status.value}")
         return appointment
@@ -10,9 +10,14 @@ import logging
 
 from app import models
 from app import schemas
-from app.core.security import get_password_hash, create_access_token, verify_password, get_device_info
+from app.core.security import (
+    get_password_hash, create_access_token, verify_password, get_device_info, password_needs_rehash,
+    create_refresh_token, verify_refresh_token
+)
 from app.services.repositories import UserRepository, ProductRepository, PasswordResetTokenRepository, SessionRepository, LoginHistoryRepository
-from app.core.cache import cache
+from app.services import entity_cache, login_throttle, guest_sessions, authz
+from app.services.entity_cache import UserSnapshot, ProductSnapshot
+from app.services.write_behind import write_behind
 from fastapi import Request
 
 logger = logging.getLogger(__name__)
@@ -77,7 +82,7 @@ class AuthService:
         user = self.user_repo.create(db_user)
         
         # Create access token with JWT ID
-        access_token, jti = create_access_token(data={"sub": str(user.id)})
+        access_token, jti = create_access_token(data={"sub": str(user.id), **authz.token_claims(user)})
         
         # Create session if request is provided
         if request:
@@ -101,6 +106,21 @@ class AuthService:
         else:
             device_name, user_agent, ip_address = None, None, None
         
+        # Reject clients with too many recent failures before any lookup
+        try:
+            login_throttle.check_ip(ip_address)
+        except login_throttle.LoginThrottled:
+            self._log_login_attempt(
+                email=email_or_username,
+                user_id=None,
+                success=False,
+                failure_reason="Too many failures from IP",
+                ip_address=ip_address,
+                user_agent=user_agent,
+                device_name=device_name
+            )
+            raise
+        
         # Try to get user by email first, then by username
         user = self.user_repo.get_by_email(email_or_username)
         if not user:
@@ -114,7 +134,11 @@ class AuthService:
         
         # Check if account is locked
         if user and user.locked_until:
-            if user.locked_until > datetime.now(timezone.utc):
+            locked_until = user.locked_until
+            if locked_until.tzinfo is None:
+                # SQLite drops the offset; stored values are UTC
+                locked_until = locked_until.replace(tzinfo=timezone.utc)
+            if locked_until > datetime.now(timezone.utc):
                 # Account is still locked
                 self._log_login_attempt(
                     email=email,
@@ -134,6 +158,7 @@ class AuthService:
         
         # Validate user
         if not user or not user.hashed_password:
+            login_throttle.record_failure(email, ip_address)
             self._log_login_attempt(
                 email=email,
                 user_id=None,
@@ -160,15 +185,15 @@ class AuthService:
         
         # Verify password
         if not verify_password(password, user.hashed_password):
-            # Increment failed login attempts
-            user.failed_login_attempts = (user.failed_login_attempts or 0) + 1
-            
-            # Lock account if max attempts reached
-            if user.failed_login_attempts >= self.MAX_FAILED_ATTEMPTS:
+            # Count the failure in the cache; the user row is only written
+            # when the lock starts
+            failures = login_throttle.record_failure(user.email, ip_address)
+            if failures >= self.MAX_FAILED_ATTEMPTS:
+                user.failed_login_attempts = failures
                 user.locked_until = datetime.now(timezone.utc) + timedelta(minutes=self.LOCKOUT_DURATION_MINUTES)
-                logger.warning(f"Account locked for user {user.email} due to {user.failed_login_attempts} failed attempts")
-            
-            self.user_repo.update(user)
+                self.user_repo.update(user)
+                login_throttle.clear_failures(user.email)
+                logger.warning(f"Account locked for user {user.email} due to {failures} failed attempts")
             
             # Log failed attempt
             self._log_login_attempt(
@@ -184,13 +209,26 @@ class AuthService:
             raise ValueError("Geçersiz e-posta veya şifre")
         
         # Successful login - reset failed attempts
+        login_throttle.clear_failures(user.email)
+        needs_update = False
         if user.failed_login_attempts > 0 or user.locked_until:
             user.failed_login_attempts = 0
             user.locked_until = None
+            needs_update = True
+        
+        # Upgrade (or downgrade) the stored hash to the current password policy
+        if password_needs_rehash(user.hashed_password):
+            try:
+                user.hashed_password = get_password_hash(password)
+                needs_update = True
+            except Exception as e:
+                logger.warning(f"Password rehash skipped for user {user.email}: {e}")
+        
+        if needs_update:
             self.user_repo.update(user)
         
         # Create access token with JWT ID
-        access_token, jti = create_access_token(data={"sub": str(user.id)})
+        access_token, jti = create_access_token(data={"sub": str(user.id), **authz.token_claims(user)})
         
         # Create session if request is provided
         if request:
@@ -214,12 +252,24 @@ class AuthService:
         """
         Create or login guest user with product barcode.
         Returns (User, access_token, jti)
+        
+        With ephemeral guest sessions (the default with Redis) the guest lives
+        only in the cache and the returned user is a snapshot; see guest_sessions.
         """
         # Check if product exists
-        product = self.product_repo.get_by_barcode(barcode)
+        product = entity_cache.get_product_snapshot(self.db, barcode)
         if not product:
             raise ValueError("Geçersiz barkod")
         
+        if guest_sessions.ephemeral_enabled():
+            guest = guest_sessions.create_guest(barcode)
+            access_token, jti = create_access_token(
+                data={"sub": str(guest.id), "guest": True},
+                expires_delta=timedelta(seconds=guest_sessions.GUEST_SESSION_TTL)
+            )
+            logger.info(f"Guest logged in with barcode: {barcode}")
+            return guest, access_token, jti
+        
         # Get or create guest user
         guest_email = f"guest_{barcode}@vfix.local"
         guest_user = self.user_repo.get_by_email(guest_email)
@@ -243,21 +293,9 @@ class AuthService:
         logger.info(f"Guest logged in with barcode: {barcode}")
         return guest_user, access_token, jti
     
-    def get_user_by_id(self, user_id: str) -> Optional[models.User]:
-        """Get user by ID with caching"""
-        cache_key = f"user:id:{user_id}"
-        
-        # Try cache first
-        cached_user = cache.get(cache_key)
-        if cached_user:
-            return self.user_repo.get_by_id(user_id)
-        
-        # Get from database
-        user = self.user_repo.get_by_id(user_id)
-        if user:
-            self._cache_user(user)
-        
-        return user
+    def get_user_by_id(self, user_id: str) -> Optional[UserSnapshot]:
+        """Get a read-only user snapshot by ID (no database query on a cache hit)"""
+        return entity_cache.get_user_snapshot(self.db, user_id)
     
     def create_password_reset_token(self, email: str) -> Optional[models.PasswordResetToken]:
         """
@@ -320,21 +358,12 @@ class AuthService:
         return True
     
     def _cache_user(self, user: models.User) -> None:
-        """Cache user data"""
-        user_data = {
-            "id": str(user.id),
-            "email": user.email,
-            "username": user.username,
-            "role": user.role,
-            "is_active": user.is_active
-        }
-        cache.set(f"user:id:{user.id}", user_data, ttl=600)  # 10 minutes
-        cache.set(f"user:email:{user.email}", user_data, ttl=600)
+        """Cache a user snapshot"""
+        entity_cache.prime_user(user)
     
     def _invalidate_user_cache(self, user: models.User) -> None:
         """Invalidate all cache entries for a user"""
-        cache.delete(f"user:id:{user.id}")
-        cache.delete(f"user:email:{user.email}")
+        entity_cache.invalidate_user(user.id)
     
     def _create_session(self, user_id: str, jti: str, request: Request) -> models.UserSession:
         """Create a new user session"""
@@ -355,6 +384,36 @@ class AuthService:
         
         return self.session_repo.create(session)
     
+    def issue_refresh_token(self, user_id, jti: str) -> str:
+        """First-generation refresh token for the session created at login"""
+        return create_refresh_token(str(user_id), jti, generation=0)
+    
+    def refresh_access_token(self, refresh_token: str) -> tuple[UserSnapshot, str, str]:
+        """
+        Exchange a refresh token for a new access token and the next refresh
+        token, without password hashing. The happy path is one indexed UPDATE
+        on user_sessions. Presenting an already-rotated refresh token means it
+        was copied, so the whole session is revoked.
+        Returns (User, access_token, refresh_token)
+        """
+        payload = verify_refresh_token(refresh_token)
+        if payload is None:
+            raise ValueError("Geçersiz yenileme belirteci")
+        jti, generation, user_id = payload["jti"], payload["gen"], payload["sub"]
+        
+        if not self.session_repo.rotate_refresh_generation(jti, generation):
+            session = self.session_repo.get_by_token_id(jti)
+            if session is not None and session.refresh_generation > generation:
+                logger.warning(f"Refresh token reuse detected for session {session.id}, revoking it")
+                self.session_repo.revoke_session(str(session.id), str(session.user_id))
+            raise ValueError("Oturum süresi dolmuş veya iptal edilmiş")
+        
+        user = self.get_user_by_id(user_id)
+        if user is None or not user.is_active:
+            raise ValueError("Hesap aktif değil")
+        access_token, _ = create_access_token(data={"sub": str(user.id), **authz.token_claims(user)}, jti=jti)
+        return user, access_token, create_refresh_token(str(user.id), jti, generation=generation + 1)
+    
     def get_user_sessions(self, user_id: str) -> List[models.UserSession]:
         """Get all active sessions for a user"""
         return self.session_repo.get_active_sessions(user_id)
@@ -383,7 +442,18 @@ class AuthService:
         user_agent: Optional[str],
         device_name: Optional[str]
     ) -> None:
-        """Log a login attempt to history"""
+        """Log a login attempt to history (batched when write-behind is enabled)"""
+        if write_behind.enabled:
+            write_behind.record_login(
+                user_id=user_id,
+                email=email,
+                success=success,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                device_name=device_name,
+                failure_reason=failure_reason
+            )
+            return
         history_entry = models.LoginHistory(
             user_id=user_id,
             email=email,
@@ -407,27 +477,9 @@ class ProductService:
         self.db = db
         self.product_repo = ProductRepository(db)
     
-    def get_product_by_barcode(self, barcode: str) -> Optional[models.Product]:
-        """Get product by barcode with caching"""
-        cache_key = f"product:barcode:{barcode}"
-        
-        # Try cache first
-        cached_product = cache.get(cache_key)
-        if cached_product:
-            return self.product_repo.get_by_barcode(barcode)
-        
-        # Get from database
-        product = self.product_repo.get_by_barcode(barcode)
-        if product:
-            product_data = {
-                "id": str(product.id),
-                "barcode": product.barcode,
-                "brand": product.brand,
-                "model": product.model
-            }
-            cache.set(cache_key, product_data, ttl=1800)  # 30 minutes
-        
-        return product
+    def get_product_by_barcode(self, barcode: str) -> Optional[ProductSnapshot]:
+        """Get a read-only product snapshot by barcode (no database query on a cache hit)"""
+        return entity_cache.get_product_snapshot(self.db, barcode)
     
     def create_product(self, barcode: str, brand: str = None, model: str = None) -> models.Product:
         """Create new product"""
@@ -0,0 +1,112 @@
+"""
+Authorization claims carried in access tokens.
+Tokens embed the user's role, enterprise, branch and enterprise role plus
+the user's "authz version" at issue time. The version lives in the cache
+and is bumped whenever one of those fields (or is_active) changes, so a
+token whose version still matches can be authorized from its own claims
+without loading the user; any other token falls back to the user lookup.
+Claims are only trusted with a shared (Redis) cache: with per-worker memory
+caches a bump would only reach the worker that made it.
+"""
+import os
+import time
+import logging
+from typing import Optional
+from uuid import UUID
+
+from app.core.cache import cache
+from app.core.security import ACCESS_TOKEN_EXPIRE_MINUTES
+
+logger = logging.getLogger(__name__)
+
+# Never longer than an access token lives (a lapsed version only means the slow path)
+AUTHZ_VERSION_TTL = min(
+    int(os.getenv("AUTHZ_VERSION_TTL", str(ACCESS_TOKEN_EXPIRE_MINUTES * 60))), ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+# User columns the claims mirror; changing any of them bumps the version
+AUTHZ_FIELDS = ("role", "enterprise_id", "branch_id", "enterprise_role", "is_active")
+
+
+def claims_trusted() -> bool:
+    """Version bumps are visible to every worker only through Redis"""
+    return bool(cache.use_redis and cache.redis_client)
+
+
+def authz_version_key(user_id) -> str:
+    return f"authz:version:{user_id}"
+
+
+def current_version(user_id) -> Optional[int]:
+    """The user's authz version, or None if the cache does not know it"""
+    return cache.get(authz_version_key(user_id))
+
+
+def issue_version(user_id) -> int:
+    """The version to embed in a new token (starting one if there is none)"""
+    version = current_version(user_id)
+    if version is None:
+        # Time-based so a restarted version never matches older tokens
+        version = time.time_ns() // 1000
+        cache.set(authz_version_key(user_id), version, ttl=AUTHZ_VERSION_TTL)
+    return version
+
+
+def bump_version(user_id) -> None:
+    """Invalidate the claims in every token issued to the user so far"""
+    cache.delete(authz_version_key(user_id))
+
+
+class AuthClaims:
+    """
+    What RBAC checks need to know about the caller: a read-only stand-in
+    for the user exposing id, role, enterprise_id, branch_id,
+    enterprise_role and is_active.
+    """
+    __slots__ = ("id", "role", "enterprise_id", "branch_id", "enterprise_role", "is_active")
+
+    def __init__(self, id, role, enterprise_id=None, branch_id=None, enterprise_role=None, is_active=True):
+        self.id = id
+        self.role = role
+        self.enterprise_id = enterprise_id
+        self.branch_id = branch_id
+        self.enterprise_role = enterprise_role
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user) -> "AuthClaims":
+        return cls(user.id, user.role, user.enterprise_id, user.branch_id, user.enterprise_role, user.is_active)
+
+    def __repr__(self):
+        return f"<AuthClaims(id={self.id}, role={self.role}, enterprise_role={self.enterprise_role})>"
+
+
+def _uuid(value) -> Optional[UUID]:
+    return UUID(value) if value else None
+
+
+def token_claims(user) -> dict:
+    """Claims to add to an access token issued to ``user``"""
+    return {
+        "authz": {
+            "role": user.role,
+            "ent": str(user.enterprise_id) if user.enterprise_id else None,
+            "br": str(user.branch_id) if user.branch_id else None,
+            "erole": user.enterprise_role,
+            "v": issue_version(user.id),
+        }
+    }
+
+
+def claims_from_payload(payload: dict) -> Optional[AuthClaims]:
+    """The token's claims if they are still current, else None"""
+    if not claims_trusted():
+        return None
+    authz = payload.get("authz")
+    if not authz or authz.get("v") is None:
+        return None
+    user_id = payload.get("sub")
+    if current_version(user_id) != authz["v"]:
+        return None
+    return AuthClaims(
+        _uuid(user_id), authz.get("role"), _uuid(authz.get("ent")), _uuid(authz.get("br")), authz.get("erole")
+    )
@@ -0,0 +1,125 @@
+"""
+Bloom filter of valid product barcodes.
+Lets guest logins with unknown barcodes (scanner noise, bots) be rejected
+without a cache or database lookup. Each worker builds its own filter at
+startup and rebuilds it periodically so deletions and products created on
+other workers are picked up.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+BLOOM_ERROR_RATE = float(os.getenv("BARCODE_BLOOM_ERROR_RATE", "0.001"))
+BLOOM_MIN_CAPACITY = int(os.getenv("BARCODE_BLOOM_MIN_CAPACITY", "10000"))
+BLOOM_REBUILD_INTERVAL = int(os.getenv("BARCODE_BLOOM_REBUILD_INTERVAL", "600"))  # seconds
+# How long after a build this worker's filter is trusted on its own
+BLOOM_FRESH_SECONDS = int(os.getenv("BARCODE_BLOOM_FRESH_SECONDS", "30"))
+BUILD_BATCH_SIZE = 5000
+
+
+class BarcodeFilter:
+    """
+    Holds the current barcode Bloom filter.
+
+    Until the first build finishes (or if it fails) the filter is not ready
+    and every barcode is reported as possibly valid, so lookups fall back to
+    the cache and database.
+    """
+
+    def __init__(self):
+        self._filter: Optional[BloomFilter] = None
+        self._built_at = 0.0
+        self._swapped_at = 0.0
+        self._building = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = None  # barcodes added while a rebuild is running
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def is_fresh(self, max_age: float = BLOOM_FRESH_SECONDS) -> bool:
+        """Whether the current filter was built less than max_age seconds ago"""
+        return self._filter is not None and time.monotonic() - self._swapped_at < max_age
+
+    def build(self, db: Session) -> None:
+        """Load every barcode into a fresh filter and swap it in"""
+        if not self._building.acquire(blocking=False):
+            return
+        try:
+            started = time.monotonic()
+            with self._pending_lock:
+                self._pending = []
+            total = db.query(models.Product.id).count()
+            bloom = BloomFilter(max(total * 2, BLOOM_MIN_CAPACITY), BLOOM_ERROR_RATE)
+            query = db.query(models.Product.barcode).execution_options(yield_per=BUILD_BATCH_SIZE)
+            for (barcode,) in query:
+                bloom.add(barcode)
+            with self._pending_lock:
+                # Swap under the lock so an add() lands in either the pending
+                # list or the new filter, never only in the old one
+                for barcode in self._pending:
+                    bloom.add(barcode)
+                self._pending = None
+                self._filter = bloom
+            self._built_at = self._swapped_at = time.monotonic()
+            logger.info(
+                f"Barcode filter built with {len(bloom)} barcodes in {self._built_at - started:.2f}s"
+            )
+        except Exception as e:
+            logger.error(f"Barcode filter build failed: {e}")
+            with self._pending_lock:
+                self._pending = None
+        finally:
+            self._building.release()
+
+    def build_in_background(self) -> None:
+        """Build (or rebuild) on a daemon thread with its own session"""
+        def run():
+            from app.database import SessionLocal
+            db = SessionLocal()
+            try:
+                self.build(db)
+            finally:
+                db.close()
+
+        threading.Thread(target=run, name="barcode-filter-build", daemon=True).start()
+
+    def add(self, barcode: str) -> None:
+        """Record a newly created product"""
+        with self._pending_lock:
+            if self._pending is not None:
+                self._pending.append(barcode)
+            if self._filter is not None:
+                self._filter.add(barcode)
+
+    def might_contain(self, barcode: str) -> bool:
+        """False only if the barcode is definitely not a product in this worker's view"""
+        bloom = self._filter
+        if bloom is None:
+            return True
+        if BLOOM_REBUILD_INTERVAL and time.monotonic() - self._built_at > BLOOM_REBUILD_INTERVAL:
+            self._built_at = time.monotonic()
+            self.build_in_background()
+        return barcode in bloom
+
+    def reset(self) -> None:
+        """Drop the filter (lookups fall back to the database)"""
+        self._filter = None
+
+    def stats(self) -> dict:
+        bloom = self._filter
+        return {"ready": bloom is not None, **(bloom.stats() if bloom is not None else {})}
+
+
+# Global filter instance (one per worker)
+barcode_filter = BarcodeFilter()
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, List
 from uuid import UUID
 from app import models
+from app.core.cache import cached
 
 
 class EnterpriseRepository:
@@ -125,6 +126,12 @@ class BranchRepository:
             return True
         return False
     
+    @cached(
+        "branch:employees",
+        ttl=60,
+        key=lambda branch_id: str(branch_id),
+        tags=lambda branch_id: [f"branch:{branch_id}"],
+    )
     def get_employee_count(self, branch_id: UUID) -> int:
         """Get count of employees in a branch"""
         return self.db.query(models.User).filter(
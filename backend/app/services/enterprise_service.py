@@ -8,6 +8,7 @@ from fastapi import Request
 from app import models, schemas
 from app.services.enterprise_repository import EnterpriseRepository, BranchRepository
 from app.services.repositories import UserRepository
+from app.services import authz
 from app.core.security import get_password_hash, create_access_token
 
 
@@ -102,7 +103,7 @@ class EnterpriseService:
             self.db.refresh(user)
         
         # Generate JWT token
-        access_token, jti = create_access_token(data={"sub": str(user.id)})
+        access_token, jti = create_access_token(data={"sub": str(user.id), **authz.token_claims(user)})
         
         # Create session (from existing auth service pattern)
         from app.core.security import get_device_info
@@ -0,0 +1,224 @@
+"""
+Read-through entity cache for hot lookups.
+A hit returns a detached, read-only snapshot of the row's columns without
+touching the database; writes through the repositories invalidate it.
+Unknown barcodes are answered by the barcode Bloom filter or a short-lived
+negative entry instead of a query.
+"""
+import os
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Any
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.cache import cache, key_part, LOAD_MARKER
+from app.core.encryption import decrypt_field
+from app.database.replicas import primary_reads
+from app.services.barcode_filter import barcode_filter
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = int(os.getenv("CACHE_USER_TTL", "600"))  # 10 minutes
+PRODUCT_CACHE_TTL = int(os.getenv("CACHE_PRODUCT_TTL", "1800"))  # 30 minutes
+NEGATIVE_CACHE_TTL = int(os.getenv("CACHE_NEGATIVE_TTL", "300"))  # 5 minutes
+SESSION_CACHE_TTL = int(os.getenv("CACHE_SESSION_TTL", "60"))  # 1 minute
+
+
+class EntitySnapshot:
+    """
+    Read-only copy of an ORM row's column values.
+
+    Attribute access mirrors the model (``snapshot.id``, ``snapshot.role``),
+    so code that only reads an entity can take either. Relationships are not
+    loaded and assignment raises; load the model to modify it.
+    """
+    __model__ = None
+    __excluded__ = ()
+    __slots__ = ("_values",)
+
+    def __init__(self, values: dict):
+        object.__setattr__(self, "_values", dict(values))
+
+    @classmethod
+    def columns(cls) -> list:
+        return [
+            attr.key for attr in sa_inspect(cls.__model__).column_attrs
+            if attr.key not in cls.__excluded__
+        ]
+
+    @classmethod
+    def from_model(cls, obj) -> "EntitySnapshot":
+        return cls({key: getattr(obj, key) for key in cls.columns()})
+
+    def to_dict(self) -> dict:
+        return dict(self._values)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(f"{type(self).__name__} has no attribute {name!r}") from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        return f"<{type(self).__name__}(id={self._values.get('id')})>"
+
+
+class UserSnapshot(EntitySnapshot):
+    """Cached view of a User (the password hash is never cached)"""
+    __model__ = models.User
+    __excluded__ = ("hashed_password",)
+    __slots__ = ()
+
+    @property
+    def address(self):
+        return decrypt_field(self._address) if self._address else None
+
+    @property
+    def phone(self):
+        return decrypt_field(self._phone) if self._phone else None
+
+
+class ProductSnapshot(EntitySnapshot):
+    """Cached view of a Product"""
+    __model__ = models.Product
+    __slots__ = ()
+
+
+def user_cache_key(user_id) -> str:
+    return f"user:id:{user_id}"
+
+
+def product_cache_key(barcode: str) -> str:
+    return f"product:barcode:{key_part(barcode)}"
+
+
+def missing_product_cache_key(barcode: str) -> str:
+    return f"product:missing:{key_part(barcode)}"
+
+
+def _peek(key: str) -> Optional[Any]:
+    """Value of a get_or_load entry, without loading on a miss"""
+    entry = cache.get(key)
+    if isinstance(entry, dict) and LOAD_MARKER in entry:
+        return entry["v"]
+    return None
+
+
+def _load_user(db: Session, user_id) -> Optional[dict]:
+    with primary_reads(db):
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+    return UserSnapshot.from_model(user).to_dict() if user else None
+
+
+def _load_product(db: Session, barcode: str) -> Optional[dict]:
+    with primary_reads(db):
+        product = db.query(models.Product).filter(models.Product.barcode == barcode).first()
+    return ProductSnapshot.from_model(product).to_dict() if product else None
+
+
+def get_user_snapshot(db: Session, user_id) -> Optional[UserSnapshot]:
+    """User by id from the cache, loading it from the database on a miss"""
+    values = cache.get_or_load(
+        user_cache_key(user_id), lambda: _load_user(db, user_id), ttl=USER_CACHE_TTL, stale_ttl=0
+    )
+    return UserSnapshot(values) if values else None
+
+
+def get_product_snapshot(db: Session, barcode: str) -> Optional[ProductSnapshot]:
+    """
+    Product by barcode from the cache, loading it from the database on a miss.
+    Barcodes the Bloom filter rules out are only checked against the cache
+    when the cache is shared (products created on other workers since the
+    last rebuild are primed there) or the filter was just built; otherwise
+    the negative cache and database still decide. Known-missing barcodes are
+    remembered for NEGATIVE_CACHE_TTL.
+    """
+    if not barcode_filter.might_contain(barcode) and (
+        (cache.use_redis and cache.redis_client) or barcode_filter.is_fresh()
+    ):
+        values = _peek(product_cache_key(barcode))
+        return ProductSnapshot(values) if values else None
+
+    if cache.get(missing_product_cache_key(barcode)):
+        return None
+    values = cache.get_or_load(
+        product_cache_key(barcode), lambda: _load_product(db, barcode), ttl=PRODUCT_CACHE_TTL
+    )
+    if not values:
+        cache.set(missing_product_cache_key(barcode), True, ttl=NEGATIVE_CACHE_TTL)
+        return None
+    return ProductSnapshot(values)
+
+
+def prime_user(user: models.User) -> None:
+    """Cache a snapshot of a user that is already loaded (no-op if cached)"""
+    cache.get_or_load(
+        user_cache_key(user.id), lambda: UserSnapshot.from_model(user).to_dict(),
+        ttl=USER_CACHE_TTL, stale_ttl=0
+    )
+
+
+def invalidate_user(user_id) -> None:
+    cache.delete(user_cache_key(user_id))
+
+
+def product_created(product: models.Product) -> None:
+    """Make a new product visible to every worker's lookups"""
+    barcode_filter.add(product.barcode)
+    cache.delete(missing_product_cache_key(product.barcode))
+    cache.delete(product_cache_key(product.barcode))
+    cache.get_or_load(
+        product_cache_key(product.barcode), lambda: ProductSnapshot.from_model(product).to_dict(),
+        ttl=PRODUCT_CACHE_TTL
+    )
+
+
+def invalidate_product(barcode: str) -> None:
+    cache.delete(product_cache_key(barcode))
+
+
+# ----------------------------------------------------------------------
+# Session validation state (keyed by JWT jti)
+# ----------------------------------------------------------------------
+
+def session_cache_key(jti: str) -> str:
+    return f"session:jti:{jti}"
+
+
+def session_state(session: Optional[models.UserSession]) -> dict:
+    """What get_current_user needs from a session row (missing rows are inactive)"""
+    if session is None:
+        return {"user_id": None, "is_active": False, "expires_at": None}
+    expires_at = session.expires_at
+    if expires_at is not None and expires_at.tzinfo is None:
+        # SQLite drops the offset; stored values are UTC
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return {"user_id": session.user_id, "is_active": bool(session.is_active), "expires_at": expires_at}
+
+
+def get_cached_session_state(jti: str) -> Optional[dict]:
+    return cache.get(session_cache_key(jti))
+
+
+def cache_session_state(jti: str, state: dict) -> None:
+    ttl = SESSION_CACHE_TTL
+    if state["is_active"] and state["expires_at"] is not None:
+        remaining = int((state["expires_at"] - datetime.now(timezone.utc)).total_seconds())
+        ttl = max(min(ttl, remaining), 1)
+    cache.set(session_cache_key(jti), state, ttl=ttl)
+
+
+def invalidate_session(jti: str) -> None:
+    cache.delete(session_cache_key(jti))
+
+
+def invalidate_sessions(jtis) -> None:
+    """Drop the cached state of each session (no per-user tag: those would never expire)"""
+    for jti in jtis:
+        invalidate_session(jti)
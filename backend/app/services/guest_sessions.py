@@ -0,0 +1,91 @@
+"""
+Ephemeral guest sessions.
+A guest login keeps the guest's identity in the cache (keyed by a fresh
+guest id, expiring with the access token) instead of inserting a users row
+and a user_sessions row per scan. get_current_user answers guest tokens
+from that entry without SQL; the guest is written to the users table only
+when it first creates persistent data (see materialize()).
+"""
+import os
+import uuid
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.cache import cache
+from app.core.security import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.services.entity_cache import UserSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Unset: ephemeral only with Redis (a per-worker memory cache would not know
+# a guest created on another worker)
+_ephemeral_env = os.getenv("GUEST_SESSIONS_EPHEMERAL")
+GUEST_SESSIONS_EPHEMERAL = None if _ephemeral_env is None else _ephemeral_env.lower() == "true"
+GUEST_SESSION_TTL = int(os.getenv("GUEST_SESSION_TTL", str(ACCESS_TOKEN_EXPIRE_MINUTES * 60)))
+
+
+def ephemeral_enabled() -> bool:
+    """Whether guest logins stay in the cache instead of the users table"""
+    if GUEST_SESSIONS_EPHEMERAL is not None:
+        return GUEST_SESSIONS_EPHEMERAL
+    return bool(cache.use_redis and cache.redis_client)
+
+
+def guest_cache_key(guest_id) -> str:
+    return f"guest:id:{guest_id}"
+
+
+def create_guest(barcode: str) -> UserSnapshot:
+    """Start a guest session for a scanned product; nothing is written to the database"""
+    guest_id = uuid.uuid4()
+    values = {column: None for column in UserSnapshot.columns()}
+    values.update(
+        id=guest_id,
+        email=f"guest_{guest_id.hex}@vfix.local",
+        username=f"guest_{guest_id.hex}",
+        role="guest",
+        skill_level=1,
+        available_tools=[],
+        owned_products=[],
+        gdpr_consent=False,
+        age_verified=False,
+        is_active=True,
+        failed_login_attempts=0,
+        created_at=datetime.now(timezone.utc),
+    )
+    # Not user columns: the scanned product and whether a users row exists yet
+    values.update(barcode=barcode, materialized=False)
+    cache.set(guest_cache_key(guest_id), values, ttl=GUEST_SESSION_TTL)
+    return UserSnapshot(values)
+
+
+def get_guest(guest_id) -> Optional[UserSnapshot]:
+    """The guest behind a guest token, or None once its session has ended"""
+    values = cache.get(guest_cache_key(guest_id))
+    return UserSnapshot(values) if values else None
+
+
+def end_guest(guest_id) -> None:
+    cache.delete(guest_cache_key(guest_id))
+
+
+def materialize(db: Session, guest: UserSnapshot) -> None:
+    """
+    Make sure the guest has a users row (needed before anything that
+    references it by foreign key is stored). Idempotent; only the first
+    call per guest touches the database.
+    """
+    if guest.role != "guest" or guest.to_dict().get("materialized", True):
+        return
+    if db.query(models.User.id).filter(models.User.id == guest.id).first() is None:
+        values = {column: value for column, value in guest.to_dict().items() if column in UserSnapshot.columns()}
+        db.add(models.User(**values))
+        db.commit()
+        logger.info(f"Guest {guest.id} materialized (barcode {guest.barcode})")
+    values = guest.to_dict()
+    values["materialized"] = True
+    cache.set(guest_cache_key(guest.id), values, ttl=GUEST_SESSION_TTL)
@@ -2,14 +2,21 @@
 Repository pattern for data access with caching support.
 Abstracts database operations for better testing and scalability.
 """
-from typing import Optional, List
+from typing import Optional, List, Any
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_
+from sqlalchemy import or_, func, inspect as sa_inspect
 from app import models
 from app.models import User, Product, PasswordResetToken, UserSession, LoginHistory, ChatFeedback, ChatSession, ChatMessage, Appointment
 from datetime import datetime, timezone
 import logging
 
+from app.core.cache import cache
+from app.services import entity_cache, authz
+from app.services.write_behind import write_behind
+from app.database.write_queue import write_queue
+from app.services.revocation import revocation_registry
+from app.services.retention import purge, POLICIES
+
 logger = logging.getLogger(__name__)
 
 
@@ -97,13 +104,20 @@ class UserRepository:
         self.db.add(user)
         self.db.commit()
         self.db.refresh(user)
+        self._invalidate_branch(user.branch_id)
         logger.info(f"Created user: {user.email}")
         return user
     
     def update(self, user: models.User) -> models.User:
         """Update existing user"""
+        state = sa_inspect(user)
+        authz_changed = any(state.attrs[field].history.has_changes() for field in authz.AUTHZ_FIELDS)
         self.db.commit()
         self.db.refresh(user)
+        entity_cache.invalidate_user(user.id)
+        if authz_changed:
+            authz.bump_version(user.id)
+        self._invalidate_branch(user.branch_id)
         logger.info(f"Updated user: {user.email}")
         return user
     
@@ -111,13 +125,37 @@ class UserRepository:
         """Soft delete user"""
         user.is_active = False
         self.db.commit()
+        entity_cache.invalidate_user(user.id)
+        authz.bump_version(user.id)
+        self._invalidate_branch(user.branch_id)
         logger.info(f"Deactivated user: {user.email}")
     
     def hard_delete(self, user: models.User) -> None:
         """Hard delete user (use with caution)"""
+        user_id, branch_id = user.id, user.branch_id
         self.db.delete(user)
         self.db.commit()
+        entity_cache.invalidate_user(user_id)
+        authz.bump_version(user_id)
+        self._invalidate_branch(branch_id)
         logger.warning(f"Hard deleted user: {user.email}")
+    
+    @staticmethod
+    def _invalidate_branch(branch_id) -> None:
+        """Branch-level cached values (employee count, statistics) depend on users"""
+        if branch_id:
+            cache.invalidate_tags(f"branch:{branch_id}")
+
+
+def invalidate_user_branches(db: Session, *user_ids) -> None:
+    """Branch statistics count the appointments and feedback of the branch's users"""
+    branch_ids = set()
+    for user_id in user_ids:
+        user = entity_cache.get_user_snapshot(db, user_id) if user_id else None
+        if user is not None and user.branch_id:
+            branch_ids.add(user.branch_id)
+    for branch_id in branch_ids:
+        UserRepository._invalidate_branch(branch_id)
 
 
 class ProductRepository:
@@ -155,6 +193,7 @@ class ProductRepository:
         self.db.add(product)
         self.db.commit()
         self.db.refresh(product)
+        entity_cache.product_created(product)
         logger.info(f"Created product: {product.barcode}")
         return product
     
@@ -162,6 +201,7 @@ class ProductRepository:
         """Delete product"""
         self.db.delete(product)
         self.db.commit()
+        entity_cache.invalidate_product(product.barcode)
         logger.info(f"Deleted product: {product.barcode}")
 
 
@@ -203,11 +243,8 @@ class PasswordResetTokenRepository:
         return reset_token
     
     def cleanup_expired(self) -> int:
-        """Delete expired reset tokens (uses composite index)"""
-        result = self.db.query(models.PasswordResetToken).filter(
-            models.PasswordResetToken.expires_at < datetime.now(timezone.utc)
-        ).delete()
-        self.db.commit()
+        """Delete expired reset tokens in chunks (see app.services.retention)"""
+        result = purge(self.db, POLICIES[models.PasswordResetToken.__tablename__])["deleted"]
         logger.info(f"Cleaned up {result} expired reset tokens")
         return result
 
@@ -250,12 +287,48 @@ class SessionRepository:
         return session
     
     def update_last_used(self, session: models.UserSession) -> models.UserSession:
-        """Update session last used timestamp"""
+        """Update session last used timestamp (buffered when write-behind is enabled)"""
+        if write_behind.enabled:
+            write_behind.touch_session(session.id)
+            return session
+        if write_queue.enabled:
+            write_queue.submit(_touch_session, models.UserSession.id == session.id, datetime.now(timezone.utc))
+            return session
         session.last_used_at = datetime.now(timezone.utc)
         self.db.commit()
         self.db.refresh(session)
         return session
     
+    def update_last_used_by_token(self, token_id: str) -> None:
+        """Update last used timestamp for the session of a jti without loading it"""
+        if write_behind.enabled:
+            write_behind.touch_session_token(token_id)
+            return
+        if write_queue.enabled:
+            write_queue.submit(_touch_session, models.UserSession.token_id == token_id, datetime.now(timezone.utc))
+            return
+        _touch_session(self.db, models.UserSession.token_id == token_id, datetime.now(timezone.utc))
+        self.db.commit()
+    
+    def rotate_refresh_generation(self, token_id: str, generation: int) -> bool:
+        """
+        Advance an active, unexpired session from refresh ``generation`` to
+        the next one in a single conditional UPDATE; False if the session is
+        gone, revoked, expired or already past that generation.
+        """
+        now = datetime.now(timezone.utc)
+        updated = self.db.query(models.UserSession).filter(
+            models.UserSession.token_id == token_id,
+            models.UserSession.refresh_generation == generation,
+            models.UserSession.is_active == True,
+            models.UserSession.expires_at > now
+        ).update(
+            {"refresh_generation": generation + 1, "last_used_at": now},
+            synchronize_session=False
+        )
+        self.db.commit()
+        return updated == 1
+    
     def revoke_session(self, session_id: str, user_id: str) -> bool:
         """Revoke a specific session (soft delete)"""
         session = self.db.query(models.UserSession).filter(
@@ -265,6 +338,8 @@ class SessionRepository:
         if session:
             session.is_active = False
             self.db.commit()
+            entity_cache.invalidate_session(session.token_id)
+            revocation_registry.revoke(session.token_id, session.expires_at)
             logger.info(f"Revoked session {session_id} for user {user_id}")
             return True
         return False
@@ -278,17 +353,19 @@ class SessionRepository:
         if exclude_token_id:
             query = query.filter(models.UserSession.token_id != exclude_token_id)
         
-        count = query.update({"is_active": False})
+        revoked = query.with_entities(models.UserSession.token_id, models.UserSession.expires_at).all()
+        count = query.update({"is_active": False}, synchronize_session=False)
         self.db.commit()
+        entity_cache.invalidate_sessions(token_id for token_id, _ in revoked)
+        revocation_registry.revoke_many(revoked)
+        if not exclude_token_id:
+            revocation_registry.revoke_user(user_id)
         logger.info(f"Revoked {count} sessions for user {user_id}")
         return count
     
     def cleanup_expired(self) -> int:
-        """Delete expired sessions"""
-        result = self.db.query(models.UserSession).filter(
-            models.UserSession.expires_at < datetime.now(timezone.utc)
-        ).delete()
-        self.db.commit()
+        """Delete expired sessions in chunks (see app.services.retention)"""
+        result = purge(self.db, POLICIES[models.UserSession.__tablename__])["deleted"]
         logger.info(f"Cleaned up {result} expired sessions")
         return result
 
@@ -388,6 +465,50 @@ class ChatFeedbackRepository:
         self.db.refresh(feedback)
         return feedback
 
+def _insert_row(db: Session, row) -> Any:
+    """Write job: insert a new row and return its primary key"""
+    db.add(row)
+    db.flush()
+    return row.id
+
+
+def _update_row(db: Session, model, row_id, values: dict) -> None:
+    """Write job: set the model's attributes present in values on one row"""
+    row = db.get(model, row_id)
+    for key, value in values.items():
+        if hasattr(row, key):
+            setattr(row, key, value)
+    db.flush()
+
+
+def _touch_session(db: Session, criterion, used_at: datetime) -> None:
+    """Write job: set last_used_at on the session matching criterion"""
+    db.query(models.UserSession).filter(criterion).update({"last_used_at": used_at}, synchronize_session=False)
+
+
+def _increment_message_count(db: Session, session_id: str) -> None:
+    """Write job: atomic message_count + 1"""
+    db.query(models.ChatSession).filter(models.ChatSession.id == session_id).update(
+        {"message_count": func.coalesce(models.ChatSession.message_count, 0) + 1}, synchronize_session=False
+    )
+
+
+def _insert_message(db: Session, session_id: str, role: str, content: Optional[str], images: Optional[List[str]]) -> models.ChatMessage:
+    """Write job: insert a chat message (refreshed, so it is usable once detached)"""
+    message = models.ChatMessage(
+        session_id=session_id,
+        role=role,
+    )
+    if content:
+        message.content = content
+    if images:
+        message.images = images
+    db.add(message)
+    db.flush()
+    db.refresh(message)
+    return message
+
+
 class ChatSessionRepository:
     """Repository for chat session persistence"""
 
@@ -449,6 +570,9 @@ class ChatSessionRepository:
 
     def increment_message_count(self, session_id: str) -> None:
         """Increment message count for a session"""
+        if write_queue.enabled:
+            write_queue.submit(_increment_message_count, session_id)
+            return
         session = self.db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
         if session:
             session.message_count = (session.message_count or 0) + 1
@@ -469,18 +593,10 @@ class ChatMessageRepository:
         images: Optional[List[str]] = None,
     ) -> models.ChatMessage:
         """Create a new chat message with encrypted content and images"""
-        message = models.ChatMessage(
-            session_id=session_id,
-            role=role,
-        )
-        if content:
-            message.content = content
-        if images:
-            message.images = images
-        
-        self.db.add(message)
+        if write_queue.enabled:
+            return write_queue.run(_insert_message, session_id, role, content, images)
+        message = _insert_message(self.db, session_id, role, content, images)
         self.db.commit()
-        self.db.refresh(message)
         return message
 
     def get_by_session(self, session_id: str) -> List[models.ChatMessage]:
@@ -602,19 +718,27 @@ class AppointmentRepository:
         if getattr(technician, "enterprise_role", "user") != "technician" and getattr(technician, "enterprise_role", "user") != "senior_technician":
             raise ValueError(f"User {technician_id} is not a technician.")
 
-        appointment = self.model(
+        appointment = self.add(self.model(
             customer_id=customer_id,
             technician_id=technician_id,
             scheduled_for=scheduled_for,
             notes=notes,
             status=status,
-        )
-        self.db.add(appointment)
-        self.db.commit()
-        self.db.refresh(appointment)
+        ))
         logger.info(f"Created appointment {appointment.id} for customer {customer_id}")
         return appointment
 
+    def add(self, appointment: models.Appointment) -> models.Appointment:
+        """Insert a new appointment (through the write queue when it is enabled)"""
+        if write_queue.enabled:
+            appointment = self.get_by_id(write_queue.run(_insert_row, appointment))
+        else:
+            self.db.add(appointment)
+            self.db.commit()
+            self.db.refresh(appointment)
+        invalidate_user_branches(self.db, appointment.technician_id)
+        return appointment
+
     def update_by_id(self, appointment_id: int, update_data: dict) -> Optional[models.Appointment]:
         """
         Update an existing appointment by ID, with validation for user fields.
@@ -638,12 +762,15 @@ class AppointmentRepository:
             if getattr(technician, "enterprise_role", "user") != "technician" and getattr(technician, "enterprise_role", "user") != "senior_technician":
                 raise ValueError(f"User {update_data['technician_id']} is not a technician.")
 
-        for key, value in update_data.items():
-            if hasattr(db_appointment, key):
-                setattr(db_appointment, key, value)
-
-        self.db.commit()
-        self.db.refresh(db_appointment)
+        previous_technician_id = db_appointment.technician_id
+        if write_queue.enabled:
+            write_queue.run(_update_row, self.model, appointment_id, update_data)
+            self.db.expire(db_appointment)
+        else:
+            _update_row(self.db, self.model, appointment_id, update_data)
+            self.db.commit()
+            self.db.refresh(db_appointment)
+        invalidate_user_branches(self.db, previous_technician_id, db_appointment.technician_id)
         logger.info(f"Updated appointment {db_appointment.id}")
         return db_appointment
 
@@ -652,8 +779,10 @@ class AppointmentRepository:
         safe_update_data = {k: v for k, v in update_data.items() if k not in ["id", "customer_id"]}
         if not safe_update_data:
             return 0
+        technician_ids = self._technician_ids(self.model.customer_id == customer_id)
         updated_count = self.db.query(self.model).filter(self.model.customer_id == customer_id).update(safe_update_data, synchronize_session=False)
         self.db.commit()
+        invalidate_user_branches(self.db, *technician_ids)
         logger.info(f"Updated {updated_count} appointments for customer {customer_id}")
         return updated_count
 
@@ -664,6 +793,7 @@ class AppointmentRepository:
             return 0
         updated_count = self.db.query(self.model).filter(self.model.technician_id == technician_id).update(safe_update_data, synchronize_session=False)
         self.db.commit()
+        invalidate_user_branches(self.db, technician_id)
         logger.info(f"Updated {updated_count} appointments for technician {technician_id}")
         return updated_count
 
@@ -673,14 +803,17 @@ class AppointmentRepository:
         if db_appointment:
             self.db.delete(db_appointment)
             self.db.commit()
+            invalidate_user_branches(self.db, db_appointment.technician_id)
             logger.warning(f"Deleted appointment: {appointment_id}")
             return True
         return False
 
     def delete_by_customer_id(self, customer_id: str) -> int:
         """Bulk delete appointments for a customer. Returns the number of deleted rows."""
+        technician_ids = self._technician_ids(self.model.customer_id == customer_id)
         deleted_count = self.db.query(self.model).filter(self.model.customer_id == customer_id).delete(synchronize_session=False)
         self.db.commit()
+        invalidate_user_branches(self.db, *technician_ids)
         logger.warning(f"Deleted {deleted_count} appointments for customer {customer_id}")
         return deleted_count
 
@@ -688,8 +821,14 @@ class AppointmentRepository:
         """Bulk delete appointments for a technician. Returns the number of deleted rows."""
         deleted_count = self.db.query(self.model).filter(self.model.technician_id == technician_id).delete(synchronize_session=False)
         self.db.commit()
+        invalidate_user_branches(self.db, technician_id)
         logger.warning(f"Deleted {deleted_count} appointments for technician {technician_id}")
         return deleted_count
+
+    def _technician_ids(self, criterion) -> List:
+        """Technicians of the appointments a bulk write is about to touch"""
+        rows = self.db.query(self.model.technician_id).filter(criterion, self.model.technician_id.isnot(None)).distinct()
+        return [technician_id for (technician_id,) in rows]
         
         
 class VacationRepository:
@@ -0,0 +1,202 @@
+"""
+Retention engine for auth bookkeeping tables.
+Deletes expired sessions, expired reset tokens and old login history in
+small primary-key-ordered chunks, committing and pausing between chunks so
+no run holds locks for long. Runs hourly on a daemon thread inside the app
+(one worker per interval when Redis is shared) or from the command line:
+
+    python -m app.services.retention [--table login_history] [--dry-run]
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Callable, List
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "500"))
+RETENTION_PAUSE_MS = int(os.getenv("RETENTION_PAUSE_MS", "50"))
+# Rows are kept this many days past the cutoff column
+SESSION_RETENTION_DAYS = int(os.getenv("RETENTION_SESSIONS_DAYS", "0"))  # after expires_at
+RESET_TOKEN_RETENTION_DAYS = int(os.getenv("RETENTION_RESET_TOKENS_DAYS", "0"))  # after expires_at
+LOGIN_HISTORY_RETENTION_DAYS = int(os.getenv("RETENTION_LOGIN_HISTORY_DAYS", "90"))  # after created_at
+
+
+def _default_session_factory():
+    from app.database import SessionLocal
+    return SessionLocal()
+
+
+class RetentionPolicy:
+    """Rows of ``model`` whose ``column`` is older than ``days`` ago are deleted"""
+
+    def __init__(self, model, column, days: int):
+        self.model = model
+        self.column = column
+        self.days = days
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+    def cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=self.days)
+
+
+POLICIES = {
+    policy.table: policy for policy in (
+        RetentionPolicy(models.UserSession, models.UserSession.expires_at, SESSION_RETENTION_DAYS),
+        RetentionPolicy(models.PasswordResetToken, models.PasswordResetToken.expires_at, RESET_TOKEN_RETENTION_DAYS),
+        RetentionPolicy(models.LoginHistory, models.LoginHistory.created_at, LOGIN_HISTORY_RETENTION_DAYS),
+    )
+}
+
+
+def purge(
+    db: Session,
+    policy: RetentionPolicy,
+    chunk_size: int = RETENTION_CHUNK_SIZE,
+    pause_ms: int = RETENTION_PAUSE_MS,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Delete the policy's expired rows chunk by chunk (keyset-paginated on
+    the primary key); returns rows deleted, chunks and seconds taken.
+    """
+    started = time.monotonic()
+    primary_key = policy.model.id
+    cutoff = policy.cutoff()
+    deleted = 0
+    chunks = 0
+    last_id = None
+    while True:
+        query = db.query(primary_key).filter(policy.column < cutoff)
+        if last_id is not None:
+            query = query.filter(primary_key > last_id)
+        ids = [row[0] for row in query.order_by(primary_key).limit(chunk_size).all()]
+        if not ids:
+            break
+        last_id = ids[-1]
+        if not dry_run:
+            deleted += db.query(policy.model).filter(primary_key.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+        else:
+            deleted += len(ids)
+        chunks += 1
+        if len(ids) < chunk_size:
+            break
+        if pause_ms:
+            time.sleep(pause_ms / 1000)
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Retention {'(dry run) ' if dry_run else ''}{policy.table}: deleted {deleted} rows "
+        f"older than {cutoff.isoformat()} in {chunks} chunks, {elapsed:.2f}s"
+    )
+    return {"table": policy.table, "deleted": deleted, "chunks": chunks, "seconds": round(elapsed, 3)}
+
+
+def run_retention(db: Session, tables: Optional[List[str]] = None, dry_run: bool = False) -> List[dict]:
+    """Apply every policy (or only ``tables``); returns one report per table"""
+    reports = []
+    for table in tables or list(POLICIES):
+        try:
+            reports.append(purge(db, POLICIES[table], dry_run=dry_run))
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Retention failed for {table}: {e}")
+            reports.append({"table": table, "error": str(e)})
+    return reports
+
+
+class RetentionScheduler:
+    """
+    Runs run_retention every RETENTION_INTERVAL_SECONDS on a daemon thread.
+    With a shared Redis cache only the first worker to claim an interval
+    runs it.
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None, interval: int = RETENTION_INTERVAL_SECONDS):
+        self.session_factory = session_factory or _default_session_factory
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.last_reports = []
+
+    def start(self) -> None:
+        if self._thread is None and self.interval > 0:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+            logger.info(f"Retention scheduler started (every {self.interval}s)")
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+
+    def run_once(self) -> List[dict]:
+        claim = f"retention:run:{int(time.time() // self.interval)}"
+        if cache.incr(claim, ttl=self.interval) > 1:
+            return []
+        db = self.session_factory()
+        try:
+            self.last_reports = run_retention(db)
+            self.last_run = datetime.now(timezone.utc)
+            return self.last_reports
+        except Exception as e:
+            logger.error(f"Retention run error: {e}")
+            return []
+        finally:
+            db.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_reports": self.last_reports,
+        }
+
+
+# Global scheduler instance (one per worker)
+retention_scheduler = RetentionScheduler()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Delete expired sessions, reset tokens and old login history")
+    parser.add_argument("--table", action="append", choices=sorted(POLICIES), help="only this table (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="count rows without deleting them")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    db = _default_session_factory()
+    try:
+        reports = run_retention(db, tables=args.table, dry_run=args.dry_run)
+    finally:
+        db.close()
+    for report in reports:
+        if "error" in report:
+            print(f"{report['table']}: error: {report['error']}")
+        else:
+            print(f"{report['table']}: {report['deleted']} rows in {report['chunks']} chunks, {report['seconds']}s")
+    return 1 if any("error" in report for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Token revocation registry.
+Holds the jtis of revoked sessions and per-user "revoked before" times so
+get_current_user can accept a signed token without reading user_sessions.
+Each worker keeps an in-memory mirror fronted by a Bloom filter; with Redis
+the mirror is kept in step through a shared revocation log, and it is
+periodically reloaded from user_sessions, which stays the source of truth.
+Without a shared log a revocation would only reach the worker that made it,
+so by default the registry is only used with Redis
+(REVOCATION_REGISTRY_ENABLED=true forces it on, e.g. for a single worker).
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Iterable, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.bloom import BloomFilter
+from app.core.cache import cache
+from app.database.replicas import primary_reads
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "1"))
+REVOCATION_DB_RESYNC_SECONDS = float(os.getenv("REVOCATION_DB_RESYNC_SECONDS", "60"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+REVOCATION_LOG_KEY = "revocation:log"
+# Entries outlive the longest session (30 days) before they are trimmed
+REVOCATION_LOG_RETENTION_SECONDS = 31 * 24 * 3600
+# Re-read this much of the log on each sync to absorb clock skew between workers
+REVOCATION_CLOCK_SKEW_SECONDS = 5.0
+
+REVOKED = "revoked"
+ACTIVE = "active"
+UNKNOWN = "unknown"
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return time.time() + REVOCATION_LOG_RETENTION_SECONDS
+    if value.tzinfo is None:
+        # SQLite drops the offset; stored values are UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RevocationRegistry:
+    """
+    Revoked jtis (until their session would have expired) and per-user
+    revoked-before timestamps.
+
+    ``check`` answers UNKNOWN whenever the mirror cannot be trusted (disabled,
+    or the shared log is unreachable); callers then validate against the
+    database as before.
+    """
+
+    def __init__(self, redis_client=None, enabled: Optional[bool] = None):
+        if enabled is None and os.getenv("REVOCATION_REGISTRY_ENABLED") is not None:
+            enabled = os.getenv("REVOCATION_REGISTRY_ENABLED").lower() == "true"
+        self.enabled = enabled  # None: only with a shared log
+        self._redis_client = redis_client
+        self._lock = threading.Lock()
+        self._syncing = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._jtis = {}  # jti -> expiry timestamp
+        self._users = {}  # user id -> revoked-before timestamp
+        self._bloom = BloomFilter(REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE)
+        self._loaded = False
+        self._healthy = True
+        self._log_cursor = 0.0
+        self._synced_at = 0.0
+        self._db_synced_at = 0.0
+        self.hits = 0
+        self.rejections = 0
+
+    @property
+    def active(self) -> bool:
+        if self.enabled is not None:
+            return self.enabled
+        return self.redis is not None
+
+    @property
+    def redis(self):
+        if self._redis_client is not None:
+            return self._redis_client
+        return cache.redis_client if cache.use_redis else None
+
+    # ------------------------------------------------------------------
+    # Recording revocations
+    # ------------------------------------------------------------------
+
+    def revoke(self, jti: str, expires_at: Optional[datetime] = None) -> None:
+        """Record a revoked session token"""
+        self.revoke_many([(jti, expires_at)])
+
+    def revoke_many(self, sessions: Iterable[Tuple[str, Optional[datetime]]]) -> None:
+        entries = [{"jti": jti, "exp": _timestamp(expires_at)} for jti, expires_at in sessions if jti]
+        for entry in entries:
+            self._apply(entry)
+        self._append_to_log(entries)
+
+    def revoke_user(self, user_id, before: Optional[datetime] = None) -> None:
+        """Reject every token of user_id issued before ``before`` (default: now)"""
+        before = before or datetime.now(timezone.utc)
+        entry = {"user": str(user_id), "before": int(before.timestamp()), "exp": _timestamp(None)}
+        self._apply(entry)
+        self._append_to_log([entry])
+
+    def _apply(self, entry: dict) -> None:
+        if entry["exp"] <= time.time():
+            return
+        with self._lock:
+            if "jti" in entry:
+                if entry["jti"] not in self._jtis:
+                    self._bloom.add(entry["jti"])
+                self._jtis[entry["jti"]] = entry["exp"]
+            elif "user" in entry:
+                self._users[entry["user"]] = max(entry["before"], self._users.get(entry["user"], 0))
+
+    def _append_to_log(self, entries: list) -> None:
+        redis_client = self.redis
+        if redis_client is None or not entries:
+            return
+        now = time.time()
+        try:
+            pipe = redis_client.pipeline()
+            for entry in entries:
+                pipe.zadd(REVOCATION_LOG_KEY, {json.dumps(entry): now})
+            pipe.zremrangebyscore(REVOCATION_LOG_KEY, "-inf", now - REVOCATION_LOG_RETENTION_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            # Other workers pick it up on their next database resync
+            logger.error(f"Revocation log write failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Synchronisation
+    # ------------------------------------------------------------------
+
+    def _sync_log(self) -> None:
+        redis_client = self.redis
+        if redis_client is None:
+            self._healthy = True
+            return
+        started = time.time()
+        try:
+            raw_entries = redis_client.zrangebyscore(
+                REVOCATION_LOG_KEY, self._log_cursor - REVOCATION_CLOCK_SKEW_SECONDS, "+inf"
+            )
+        except Exception as e:
+            if self._healthy:
+                logger.error(f"Revocation log unreachable, validating sessions in the database: {e}")
+            self._healthy = False
+            return
+        for raw in raw_entries:
+            try:
+                self._apply(json.loads(raw))
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"Ignoring malformed revocation entry: {raw!r}")
+        self._log_cursor = started
+        self._healthy = True
+
+    def load_from_db(self, db: Session) -> int:
+        """Add every revoked, unexpired session from user_sessions"""
+        with primary_reads(db):
+            rows = db.query(models.UserSession.token_id, models.UserSession.expires_at).filter(
+                models.UserSession.is_active == False,
+                models.UserSession.expires_at > datetime.now(timezone.utc)
+            ).all()
+        for token_id, expires_at in rows:
+            self._apply({"jti": token_id, "exp": _timestamp(expires_at)})
+        self._prune()
+        self._db_synced_at = time.monotonic()
+        return len(rows)
+
+    def sync(self, db: Optional[Session] = None) -> None:
+        """
+        Pull new entries from the shared log and, when due, reload from the
+        database. Single-flight: while one thread syncs, the others return
+        at once and answer from the current mirror.
+        """
+        if not self._syncing.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if db is not None and (not self._loaded or now - self._db_synced_at > REVOCATION_DB_RESYNC_SECONDS):
+                try:
+                    self.load_from_db(db)
+                    self._loaded = True
+                except Exception as e:
+                    logger.error(f"Revocation registry load failed: {e}")
+            self._sync_log()
+            self._synced_at = now
+        finally:
+            self._syncing.release()
+
+    def _prune(self) -> None:
+        """Drop expired entries and rebuild the Bloom filter from what is left"""
+        now = time.time()
+        with self._lock:
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            self._users = {
+                user_id: before for user_id, before in self._users.items()
+                if before > now - REVOCATION_LOG_RETENTION_SECONDS
+            }
+            bloom = BloomFilter(max(REVOCATION_BLOOM_CAPACITY, len(self._jtis) * 2), REVOCATION_BLOOM_ERROR_RATE)
+            for jti in self._jtis:
+                bloom.add(jti)
+            self._bloom = bloom
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def check(self, jti: str, user_id, issued_at: Optional[float], db: Optional[Session] = None) -> str:
+        """REVOKED, ACTIVE, or UNKNOWN when the caller must ask the database"""
+        if not self.active:
+            return UNKNOWN
+        if not self._loaded or time.monotonic() - self._synced_at > REVOCATION_SYNC_SECONDS:
+            self.sync(db)
+        if not self._loaded or not self._healthy:
+            return UNKNOWN
+        self.hits += 1
+        if jti in self._bloom and jti in self._jtis:
+            self.rejections += 1
+            return REVOKED
+        revoked_before = self._users.get(str(user_id))
+        if revoked_before is not None and (issued_at is None or issued_at < revoked_before):
+            self.rejections += 1
+            return REVOKED
+        return ACTIVE
+
+    def reset(self) -> None:
+        """Forget everything (the next check reloads from the database)"""
+        with self._lock:
+            self._reset_state()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.active,
+            "loaded": self._loaded,
+            "healthy": self._healthy,
+            "revoked_tokens": len(self._jtis),
+            "revoked_users": len(self._users),
+            "checks": self.hits,
+            "rejections": self.rejections,
+            "bloom": self._bloom.stats(),
+        }
+
+
+# Global registry instance (one per worker)
+revocation_registry = RevocationRegistry()
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from app import models
 from app.schemas.technician_schema import TechnicianFeedbackCreate
+from app.services.repositories import invalidate_user_branches
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +50,7 @@ class TechnicianService:
         self.db.add(feedback)
         self.db.commit()
         self.db.refresh(feedback)
+        invalidate_user_branches(self.db, technician_id)
         
         logger.info(
             "Technician feedback saved: technician_id=%s, rating=%d, diagnosis_correct=%s",
@@ -0,0 +1,227 @@
+"""
+Write-behind buffer for high-volume bookkeeping writes.
+Session last_used_at touches are coalesced per session (latest timestamp
+wins) and login history rows are batched; both are flushed every
+WRITE_BEHIND_FLUSH_MS milliseconds or WRITE_BEHIND_MAX_ITEMS items as one
+bulk UPDATE and one multi-row INSERT, instead of a commit per request.
+"""
+import os
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Callable
+
+from sqlalchemy import update, insert, bindparam
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "1000"))
+FLUSH_MAX_ITEMS = int(os.getenv("WRITE_BEHIND_MAX_ITEMS", "500"))
+# Hard cap on buffered items; callers flush inline past it (backpressure)
+MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+
+
+def _default_session_factory():
+    from app.database import SessionLocal
+    return SessionLocal()
+
+
+class WriteBehindBuffer:
+    """
+    Buffers session activity and login history writes.
+
+    When disabled (WRITE_BEHIND_ENABLED=false, or under TESTING) callers
+    keep writing synchronously. A daemon thread flushes on the interval;
+    flush() is also called on shutdown.
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = (
+                os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+                and not os.environ.get("TESTING")
+            )
+        self.enabled = enabled
+        self.session_factory = session_factory or _default_session_factory
+        self._last_used = {}  # session id -> latest last_used_at
+        self._last_used_by_token = {}  # session token_id (jti) -> latest last_used_at
+        self._history = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.flushed_updates = 0
+        self.flushed_inserts = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def touch_session(self, session_id, used_at: Optional[datetime] = None) -> None:
+        """Record session activity (only the latest timestamp is written)"""
+        used_at = used_at or datetime.now(timezone.utc)
+        with self._lock:
+            previous = self._last_used.get(session_id)
+            if previous is None or used_at > previous:
+                self._last_used[session_id] = used_at
+            pending = self._pending_locked()
+        self._after_enqueue(pending)
+
+    def touch_session_token(self, token_id: str, used_at: Optional[datetime] = None) -> None:
+        """Same as touch_session, for callers that only know the session's jti"""
+        used_at = used_at or datetime.now(timezone.utc)
+        with self._lock:
+            previous = self._last_used_by_token.get(token_id)
+            if previous is None or used_at > previous:
+                self._last_used_by_token[token_id] = used_at
+            pending = self._pending_locked()
+        self._after_enqueue(pending)
+
+    def record_login(self, **values) -> None:
+        """Queue a LoginHistory row (column name -> value)"""
+        values.setdefault("created_at", datetime.now(timezone.utc))
+        with self._lock:
+            self._history.append(values)
+            pending = self._pending_locked()
+        self._after_enqueue(pending)
+
+    def _after_enqueue(self, pending: int) -> None:
+        self._ensure_thread()
+        if pending >= MAX_PENDING:
+            self.flush()
+        elif pending >= FLUSH_MAX_ITEMS:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None and not self._stopped.is_set():
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="write-behind-flush", daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(FLUSH_INTERVAL_MS / 1000)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush error: {e}")
+
+    def _pending_locked(self) -> int:
+        return len(self._last_used) + len(self._last_used_by_token) + len(self._history)
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending_locked()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                last_used, self._last_used = self._last_used, {}
+                by_token, self._last_used_by_token = self._last_used_by_token, {}
+                history, self._history = self._history, []
+            if not last_used and not by_token and not history:
+                return 0
+
+            db = self.session_factory()
+            try:
+                written = 0
+                if last_used:
+                    table = models.UserSession.__table__
+                    statement = (
+                        update(table)
+                        .where(table.c.id == bindparam("b_id"))
+                        .values(last_used_at=bindparam("b_used_at"))
+                    )
+                    db.execute(statement, [
+                        {"b_id": session_id, "b_used_at": used_at}
+                        for session_id, used_at in last_used.items()
+                    ])
+                    written += len(last_used)
+                if by_token:
+                    table = models.UserSession.__table__
+                    statement = (
+                        update(table)
+                        .where(table.c.token_id == bindparam("b_token_id"))
+                        .values(last_used_at=bindparam("b_used_at"))
+                    )
+                    db.execute(statement, [
+                        {"b_token_id": token_id, "b_used_at": used_at}
+                        for token_id, used_at in by_token.items()
+                    ])
+                    written += len(by_token)
+                if history:
+                    db.execute(insert(models.LoginHistory), history)
+                    written += len(history)
+                db.commit()
+                self.flushed_updates += len(last_used) + len(by_token)
+                self.flushed_inserts += len(history)
+                return written
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Write-behind batch failed, retrying row by row: {e}")
+                return self._flush_rows(db, last_used, by_token, history)
+            finally:
+                db.close()
+
+    def _flush_rows(self, db, last_used: dict, by_token: dict, history: list) -> int:
+        """Slow path after a failed batch: write what can be written, drop the rest"""
+        written = 0
+        touches = [(models.UserSession.id, key, used_at) for key, used_at in last_used.items()]
+        touches += [(models.UserSession.token_id, key, used_at) for key, used_at in by_token.items()]
+        for column, session_id, used_at in touches:
+            try:
+                db.query(models.UserSession).filter(column == session_id).update(
+                    {"last_used_at": used_at}, synchronize_session=False
+                )
+                db.commit()
+                written += 1
+                self.flushed_updates += 1
+            except Exception as e:
+                db.rollback()
+                self.dropped += 1
+                logger.warning(f"Dropping last_used_at update for session {session_id}: {e}")
+        for row in history:
+            try:
+                db.execute(insert(models.LoginHistory), [row])
+                db.commit()
+                written += 1
+                self.flushed_inserts += 1
+            except Exception as e:
+                db.rollback()
+                self.dropped += 1
+                logger.warning(f"Dropping login history row for {row.get('email')}: {e}")
+        return written
+
+    def close(self) -> None:
+        """Stop the flush thread and write out everything pending"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self.pending(),
+            "flushed_updates": self.flushed_updates,
+            "flushed_inserts": self.flushed_inserts,
+            "dropped": self.dropped,
+        }
+
+
+# Global buffer instance (one per worker)
+write_behind = WriteBehindBuffer()
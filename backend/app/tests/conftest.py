@@ -18,6 +18,7 @@ from app.main import app  # noqa: E402
 from app.database import Base, get_db  # noqa: E402
 from app import models  # noqa: E402
 from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.core.cache import cache  # noqa: E402
 
 # Create an in-memory test database (unique per session)
 test_engine = create_engine(
@@ -86,7 +87,10 @@ def clean_db():
     
     # Create fresh tables
     Base.metadata.create_all(bind=test_engine)
-    
+
+    # Cached entries must not leak between tests
+    cache.clear()
+
     # Override the get_db dependency
     app.dependency_overrides[get_db] = override_get_db
     
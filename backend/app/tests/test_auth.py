@@ -407,6 +407,377 @@ class TestRevokeAllSessionsEndpoint:
         assert response.status_code in [401, 403]
 
 
+class TestSessionValidationCache:
+    """Tests for the jti-keyed session validation cache in get_current_user"""
+
+    def _queries(self, client, headers):
+        from sqlalchemy import event
+        from app.tests.conftest import test_engine
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", record)
+        try:
+            response = client.get("/api/users/me", headers=headers)
+        finally:
+            event.remove(test_engine, "before_cursor_execute", record)
+        assert response.status_code == 200
+        return statements
+
+    def _second_session(self, db_session, user):
+        from app import models
+        from app.core.security import create_access_token
+
+        token, jti = create_access_token(data={"sub": str(user.id)})
+        session = models.UserSession(
+            user_id=user.id,
+            token_id=jti,
+            is_active=True,
+            expires_at=datetime.utcnow() + timedelta(days=1),
+        )
+        db_session.add(session)
+        db_session.commit()
+        return session, {"Authorization": f"Bearer {token}"}
+
+    def test_cached_request_skips_session_and_user_tables(self, client: TestClient, auth_header):
+        """A repeated authenticated GET should not touch user_sessions or users"""
+        self._queries(client, auth_header)
+
+        statements = self._queries(client, auth_header)
+
+        assert not [s for s in statements if "user_sessions" in s or "FROM users" in s]
+
+    def test_revoked_session_is_rejected_immediately(self, client: TestClient, test_user, auth_header, db_session: Session):
+        """Revoking a session invalidates its cached validation state"""
+        user, _ = test_user
+        session, other_header = self._second_session(db_session, user)
+        assert client.get("/api/users/me", headers=other_header).status_code == 200
+
+        client.delete(f"/api/auth/sessions/{session.id}", headers=auth_header)
+
+        assert client.get("/api/users/me", headers=other_header).status_code == 401
+
+    def test_revoke_all_rejects_other_sessions_immediately(self, client: TestClient, test_user, auth_header, db_session: Session):
+        """Revoke-all invalidates every other cached session of the user"""
+        user, _ = test_user
+        _, other_header = self._second_session(db_session, user)
+        assert client.get("/api/users/me", headers=other_header).status_code == 200
+
+        client.post("/api/auth/sessions/revoke-all", headers=auth_header)
+
+        assert client.get("/api/users/me", headers=other_header).status_code == 401
+        assert client.get("/api/users/me", headers=auth_header).status_code == 200
+
+    def test_cached_sessions_create_no_tag_counters(self, client: TestClient, auth_header):
+        """Session entries are dropped by jti, so no per-user tag counter piles up"""
+        from app.core.cache import _memory_tag_versions
+
+        client.get("/api/users/me", headers=auth_header)
+
+        session_tags = {tag for tag in _memory_tag_versions.keys() if tag.startswith("session")}
+        assert session_tags <= {"session", "session:jti"}
+
+
+class TestVerifiedTokenCache:
+    """Tests for the per-process verified JWT cache"""
+
+    def test_token_is_verified_once(self, monkeypatch):
+        """Repeat verification of the same token skips jwt.decode"""
+        from app.core import security
+
+        token, _ = security.create_access_token(data={"sub": "1"})
+        calls = []
+        real_decode = security.jwt.decode
+        monkeypatch.setattr(security.jwt, "decode", lambda *a, **k: calls.append(1) or real_decode(*a, **k))
+
+        assert security.verify_token(token)["sub"] == "1"
+        assert security.verify_token(token)["sub"] == "1"
+        assert len(calls) == 1
+
+    def test_expired_and_invalid_tokens_are_rejected(self):
+        """Expired or tampered tokens are never served from the cache"""
+        from app.core import security
+
+        expired, _ = security.create_access_token(data={"sub": "1"}, expires_delta=timedelta(seconds=-1))
+        valid, _ = security.create_access_token(data={"sub": "1"})
+
+        assert security.verify_token(expired) is None
+        assert security.verify_token(valid) is not None
+        assert security.verify_token(valid[:-2] + "xx") is None
+
+
+class TestPasswordHashPool:
+    """Tests for the bounded password hashing executor"""
+
+    def test_runs_on_pool_and_records_metrics(self):
+        """Hashing runs on the pool and is counted"""
+        from app.core.password_pool import PasswordHashPool
+
+        pool = PasswordHashPool(size=1, max_queue=1)
+        try:
+            assert pool.run(pow, 2, 10) == 1024
+            assert pool.stats()["completed"] == 1
+        finally:
+            pool.shutdown()
+
+    def test_fails_fast_when_saturated(self):
+        """Calls beyond workers + queue are rejected immediately"""
+        import threading
+        from app.core.password_pool import PasswordHashPool, PasswordPoolOverloaded
+
+        pool = PasswordHashPool(size=1, max_queue=0)
+        release = threading.Event()
+        worker = threading.Thread(target=pool.run, args=(release.wait,))
+        worker.start()
+        try:
+            while pool.stats()["in_flight"] == 0:
+                pass
+            with pytest.raises(PasswordPoolOverloaded):
+                pool.run(pow, 2, 2)
+            assert pool.stats()["rejected"] == 1
+        finally:
+            release.set()
+            worker.join()
+            pool.shutdown()
+
+    def test_timed_out_call_holds_its_slot_until_done(self):
+        """A timeout does not free the slot while the call still runs, nor count as completed"""
+        import threading
+        from app.core.password_pool import PasswordHashPool, PasswordPoolOverloaded
+
+        pool = PasswordHashPool(size=1, max_queue=0, timeout=0.01)
+        release = threading.Event()
+        try:
+            with pytest.raises(PasswordPoolOverloaded):
+                pool.run(release.wait)
+            assert pool.stats()["in_flight"] == 1
+            with pytest.raises(PasswordPoolOverloaded):
+                pool.run(pow, 2, 2)
+
+            release.set()
+            pool.shutdown()
+            assert pool.stats()["in_flight"] == 0
+            assert pool.stats()["completed"] == 1
+        finally:
+            release.set()
+            pool.shutdown()
+
+    def test_failed_calls_are_not_counted_as_completed(self):
+        from app.core.password_pool import PasswordHashPool
+
+        pool = PasswordHashPool(size=1, max_queue=1)
+        try:
+            with pytest.raises(ZeroDivisionError):
+                pool.run(divmod, 1, 0)
+            assert pool.stats()["completed"] == 0
+            assert pool.stats()["in_flight"] == 0
+        finally:
+            pool.shutdown()
+
+    def test_login_returns_503_when_saturated(self, client: TestClient, test_user, monkeypatch):
+        """A saturated pool turns logins into 503 with Retry-After"""
+        from app.core import password_pool as pool_module
+
+        def overloaded(*args):
+            raise pool_module.PasswordPoolOverloaded("busy")
+
+        monkeypatch.setattr(pool_module.password_pool, "run", overloaded)
+        user, _ = test_user
+        response = client.post("/api/auth/login", json={"email": user.email, "password": "password123"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+class TestPasswordPolicy:
+    """Tests for pluggable hashers, calibration and rehash on login"""
+
+    @pytest.fixture
+    def pbkdf2_policy(self, monkeypatch):
+        from app.core.password_hasher import password_policy, get_hasher
+
+        monkeypatch.setattr(password_policy, "hasher", get_hasher("pbkdf2_sha256", 100000))
+        return password_policy
+
+    def test_hashes_of_every_algorithm_verify(self, pbkdf2_policy):
+        """Old bcrypt hashes keep verifying after switching algorithm"""
+        from app.core.security import verify_password, get_password_hash
+        from app.core.password_hasher import hash_with
+
+        bcrypt_hash = hash_with("bcrypt", 10, "secret-pass")
+        pbkdf2_hash = get_password_hash("secret-pass")
+
+        assert pbkdf2_hash.startswith("pbkdf2_sha256$100000$")
+        assert verify_password("secret-pass", bcrypt_hash)
+        assert verify_password("secret-pass", pbkdf2_hash)
+        assert not verify_password("wrong-pass", pbkdf2_hash)
+        assert not verify_password("secret-pass", "not-a-known-hash")
+
+    def test_needs_rehash_on_algorithm_change_or_lower_cost(self):
+        """Hashes are rehashed when the algorithm or a fixed cost changes"""
+        from app.core.password_hasher import PasswordPolicy, hash_with
+
+        policy = PasswordPolicy("bcrypt", 11)
+        assert not policy.needs_rehash(hash_with("bcrypt", 11, "pw"))
+        assert policy.needs_rehash(hash_with("bcrypt", 10, "pw"))
+        assert policy.needs_rehash(hash_with("bcrypt", 12, "pw"))
+        assert policy.needs_rehash(hash_with("pbkdf2_sha256", 100000, "pw"))
+
+    def test_locally_calibrated_cost_only_rehashes_upward(self):
+        """Without Redis workers may calibrate differently, so stronger hashes stay"""
+        from app.core.password_hasher import PasswordPolicy, hash_with
+
+        policy = PasswordPolicy("bcrypt")
+        policy.calibrate(1)
+        assert not policy.needs_rehash(hash_with("bcrypt", 11, "pw"))
+        assert policy.needs_rehash(hash_with("pbkdf2_sha256", 100000, "pw"))
+
+    def test_calibration_respects_bounds(self):
+        """A tiny budget yields the algorithm's minimum cost"""
+        from app.core.password_hasher import PasswordPolicy, BcryptHasher
+
+        policy = PasswordPolicy("bcrypt")
+        assert policy.calibrate(1) == BcryptHasher.min_cost
+        assert policy.stats()["calibrated_ms"] == 1
+
+    def test_calibration_is_shared_through_the_cache(self, monkeypatch):
+        """Workers starting after the first reuse its calibrated cost"""
+        from app.core import password_hasher
+
+        monkeypatch.setattr(password_hasher, "HASH_TARGET_MS", 1.0)
+        monkeypatch.setattr(password_hasher, "HASH_COST", None)
+        first, second = password_hasher.PasswordPolicy("bcrypt"), password_hasher.PasswordPolicy("bcrypt")
+        monkeypatch.setattr(first, "calibrate", lambda target_ms: 13)
+        monkeypatch.setattr(second, "calibrate", lambda target_ms: pytest.fail("calibrated again"))
+
+        for policy in (first, second):
+            monkeypatch.setattr(password_hasher, "password_policy", policy)
+            password_hasher.calibrate_from_env()
+
+        assert second.cost == 13
+
+    def test_login_rehashes_to_current_policy(self, client: TestClient, test_user, db_session, pbkdf2_policy):
+        """A successful login migrates the stored hash transparently"""
+        user, _ = test_user
+        assert user.hashed_password.startswith("$2")
+
+        response = client.post("/api/auth/login", json={"email": user.email, "password": "password123"})
+        assert response.status_code == 200
+
+        db_session.refresh(user)
+        assert user.hashed_password.startswith("pbkdf2_sha256$100000$")
+        response = client.post("/api/auth/login", json={"email": user.email, "password": "password123"})
+        assert response.status_code == 200
+
+
+class TestLoginFailureCounters:
+    """Lockout and credential-stuffing protection driven by cache counters"""
+
+    def _login(self, client, email, password):
+        return client.post("/api/auth/login", json={"email": email, "password": password})
+
+    def test_lockout_writes_user_row_once(self, client: TestClient, test_user, db_session: Session):
+        """Failures are counted in the cache; only the lock itself is persisted"""
+        from sqlalchemy import event
+        from app.tests.conftest import test_engine
+
+        user, _ = test_user
+        updates = []
+
+        def record(conn, cursor, statement, *args):
+            if statement.startswith("UPDATE users"):
+                updates.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", record)
+        try:
+            for _ in range(5):
+                assert self._login(client, user.email, "wrong-password").status_code == 401
+        finally:
+            event.remove(test_engine, "before_cursor_execute", record)
+
+        assert len(updates) == 1
+        response = self._login(client, user.email, "password123")
+        assert response.status_code == 401
+        assert "kilitlendi" in response.json()["detail"]
+        db_session.refresh(user)
+        assert user.failed_login_attempts == 5
+        assert user.locked_until is not None
+
+    def test_successful_login_resets_failures(self, client: TestClient, test_user):
+        user, _ = test_user
+        for _ in range(4):
+            self._login(client, user.email, "wrong-password")
+        assert self._login(client, user.email, "password123").status_code == 200
+
+        for _ in range(4):
+            self._login(client, user.email, "wrong-password")
+
+        assert self._login(client, user.email, "password123").status_code == 200
+
+    def test_failures_across_accounts_block_the_ip(self, client: TestClient, monkeypatch):
+        """Spreading guesses over many accounts from one IP is throttled"""
+        from app.services import login_throttle
+
+        monkeypatch.setattr(login_throttle, "IP_MAX_FAILURES", 3)
+        for i in range(3):
+            assert self._login(client, f"victim{i}@example.com", "guess").status_code == 401
+
+        response = self._login(client, "victim9@example.com", "guess")
+
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+
+
+class TestRefreshTokenEndpoint:
+    """Tests for POST /api/auth/refresh"""
+
+    def _login(self, client, test_user):
+        user, _ = test_user
+        response = client.post("/api/auth/login", json={"email": user.email, "password": "password123"})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_refresh_issues_new_tokens_without_hashing(self, client: TestClient, test_user, monkeypatch):
+        from app.core import password_pool as pool_module
+
+        tokens = self._login(client, test_user)
+
+        def no_hashing(*args):
+            raise AssertionError("refresh must not hash passwords")
+
+        monkeypatch.setattr(pool_module.password_pool, "run", no_hashing)
+        response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["refresh_token"] != tokens["refresh_token"]
+        me = client.get("/api/users/me", headers={"Authorization": f"Bearer {data['access_token']}"})
+        assert me.status_code == 200
+
+    def test_reused_refresh_token_revokes_session(self, client: TestClient, test_user):
+        tokens = self._login(client, test_user)
+        rotated = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+        reuse = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+        assert reuse.status_code == 401
+        assert client.post("/api/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+        me = client.get("/api/users/me", headers={"Authorization": f"Bearer {rotated['access_token']}"})
+        assert me.status_code == 401
+
+    def test_token_types_are_not_interchangeable(self, client: TestClient, test_user):
+        tokens = self._login(client, test_user)
+
+        as_access = client.get("/api/users/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+        as_refresh = client.post("/api/auth/refresh", json={"refresh_token": tokens["access_token"]})
+
+        assert as_access.status_code == 401
+        assert as_refresh.status_code == 401
+
+
 class TestLoginHistoryEndpoint:
     """Tests for GET /api/auth/login-history"""
     
@@ -626,6 +997,23 @@ class TestRouteModularity:
         metrics_response = client.get("/metrics")
         assert metrics_response.status_code == 200
 
+    def test_async_routes_do_not_take_a_db_session(self):
+        """Session queries block; handlers using one must be sync (threadpool) or offload them"""
+        import inspect
+        from fastapi.routing import APIRoute
+        from app.main import app
+
+        offloaded = {"register", "login", "register_enterprise", "health_check"}  # run_in_threadpool
+        blocking = [
+            route.endpoint.__name__ for route in app.routes
+            if isinstance(route, APIRoute)
+            and inspect.iscoroutinefunction(route.endpoint)
+            and route.endpoint.__name__ not in offloaded
+            and any(param.annotation is Session for param in inspect.signature(route.endpoint).parameters.values())
+        ]
+
+        assert blocking == []
+
 
 class TestErrorHandling:
     """Test error handling across routes"""
@@ -0,0 +1,91 @@
+"""
+Tests for authorization claims in access tokens
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.security import verify_token
+from app.services import authz
+from app.services.repositories import UserRepository
+from app.tests.conftest import test_engine, _create_user_with_session
+
+
+def _login_admin(client: TestClient, db_session):
+    user, _ = _create_user_with_session(db_session, email="admin@example.com", role="admin")
+    response = client.post("/api/auth/login", json={"email": "admin@example.com", "password": "password123"})
+    assert response.status_code == 200
+    return user, response.json()["access_token"]
+
+
+def _user_queries(client, headers):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/admin/improvement-data", headers=headers)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+    return response, [s for s in statements if s.startswith("SELECT") and "FROM users" in s]
+
+
+class TestAuthzClaims:
+    """RBAC checks run from token claims while the authz version is current"""
+
+    @pytest.fixture(autouse=True)
+    def shared_cache(self, monkeypatch):
+        """Claims are only trusted with a cache shared by all workers"""
+        monkeypatch.setattr(authz, "claims_trusted", lambda: True)
+
+    def test_login_token_carries_claims(self, client: TestClient, db_session):
+        user, token = _login_admin(client, db_session)
+
+        claims = verify_token(token)["authz"]
+
+        assert claims["role"] == "admin"
+        assert claims["v"] == authz.current_version(user.id)
+
+    def test_rbac_check_skips_user_lookup(self, client: TestClient, db_session):
+        _, token = _login_admin(client, db_session)
+
+        response, queries = _user_queries(client, {"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        assert queries == []
+
+    def test_role_change_invalidates_claims(self, client: TestClient, db_session):
+        user, token = _login_admin(client, db_session)
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/api/admin/improvement-data", headers=headers).status_code == 200
+
+        user.role = "user"
+        UserRepository(db_session).update(user)
+
+        assert authz.claims_from_payload(verify_token(token)) is None
+        assert client.get("/api/admin/improvement-data", headers=headers).status_code == 403
+
+    def test_tokens_without_claims_fall_back_to_user(self, client: TestClient, db_session):
+        _, token = _create_user_with_session(db_session, email="legacy@example.com", role="admin")
+
+        response, queries = _user_queries(client, {"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        assert queries
+
+
+class TestAuthzClaimsWithoutSharedCache:
+    """Per-worker caches cannot propagate version bumps"""
+
+    def test_memory_cache_falls_back_to_user(self, client: TestClient, db_session):
+        user, token = _login_admin(client, db_session)
+        headers = {"Authorization": f"Bearer {token}"}
+        assert authz.claims_from_payload(verify_token(token)) is None
+        assert client.get("/api/admin/improvement-data", headers=headers).status_code == 200
+
+        user.role = "user"
+        UserRepository(db_session).update(user)
+
+        assert client.get("/api/admin/improvement-data", headers=headers).status_code == 403
@@ -0,0 +1,733 @@
+"""
+Tests for the caching layer (in-process engine and CacheService)
+"""
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+from fakeredis import aioredis as fake_aioredis
+
+from app.core import cache_codec
+from app.core.bloom import BloomFilter
+from app.core.memory_cache import MemoryCache
+from app.core.cache import (
+    CacheService, cache, cached, cached_stats, invalidate_cache, key_part, TAG_KEY_PREFIX, TAG_TTL_SECONDS
+)
+from app.core.async_cache import AsyncCacheService
+from app import models
+from app.models.appointment import AppointmentStatus
+from app.schemas.admin_schema import GeneralStatistics
+from app.services import entity_cache
+from app.services.barcode_filter import barcode_filter
+from app.services.repositories import UserRepository, ProductRepository, AppointmentRepository
+
+
+class TestMemoryCache:
+    """Tests for the bounded LRU+TTL in-process engine"""
+
+    def test_set_and_get(self):
+        """Stored values should be returned until deleted"""
+        store = MemoryCache()
+        store.set("a", "1")
+
+        assert store.get("a") == "1"
+        assert store.exists("a")
+        assert store.delete("a") is True
+        assert store.get("a") is None
+
+    def test_ttl_expires_lazily(self):
+        """Entries past their TTL should be treated as missing"""
+        store = MemoryCache()
+        store.set("a", "1", ttl=0.01)
+        time.sleep(0.02)
+
+        assert store.get("a") is None
+        assert store.stats()["expirations"] == 1
+        assert len(store) == 0
+
+    def test_periodic_sweep_removes_expired(self):
+        """Writes should trigger a sweep of expired entries once the interval elapsed"""
+        store = MemoryCache(sweep_interval=0)
+        store.set("a", "1", ttl=0.01)
+        store.set("b", "2", ttl=0.01)
+        time.sleep(0.02)
+        store.set("c", "3")
+
+        assert store.keys() == ["c"]
+
+    def test_lru_eviction_by_entry_count(self):
+        """Least recently used entries should be evicted first"""
+        store = MemoryCache(max_entries=2)
+        store.set("a", "1")
+        store.set("b", "2")
+        store.get("a")  # "b" is now least recently used
+        store.set("c", "3")
+
+        assert store.get("b") is None
+        assert store.get("a") == "1"
+        assert store.get("c") == "3"
+        assert store.stats()["evictions"] == 1
+
+    def test_eviction_by_total_bytes(self):
+        """Total stored bytes should never exceed the budget"""
+        store = MemoryCache(max_bytes=10)
+        store.set("a", "x" * 6)
+        store.set("b", "y" * 6)
+
+        stats = store.stats()
+        assert stats["bytes"] <= 10
+        assert stats["entries"] == 1
+        assert store.get("b") == "y" * 6
+
+    def test_oversized_value_is_rejected(self):
+        """A single value larger than the byte budget should not be cached"""
+        store = MemoryCache(max_bytes=4)
+
+        assert store.set("a", "x" * 5) is False
+        assert store.get("a") is None
+
+
+class TestCacheServiceMemoryBackend:
+    """Tests for CacheService with the in-memory backend"""
+
+    def test_round_trip_json(self):
+        """Values should be deserialized on read"""
+        service = CacheService()
+        service.set("user:id:1", {"id": "1", "role": "user"}, ttl=60)
+
+        assert service.get("user:id:1") == {"id": "1", "role": "user"}
+        assert service.exists("user:id:1")
+
+    def test_ttl_is_honoured(self):
+        """The ttl argument should expire entries in memory mode"""
+        service = CacheService()
+        service.set("product:barcode:1", {"barcode": "1"}, ttl=0.01)
+        time.sleep(0.02)
+
+        assert service.get("product:barcode:1") is None
+
+    def test_stats_expose_counters(self):
+        """Stats should report backend size and eviction counters"""
+        service = CacheService()
+        stats = service.stats()
+
+        assert stats["backend"] == "memory"
+        assert "entries" in stats
+        assert "evictions" in stats
+
+
+def _wait_for(predicate, timeout=3.0):
+    """Poll until predicate() is truthy (pub/sub delivery is asynchronous)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def layered_pair():
+    """Two layered cache services (two 'workers') sharing one fake Redis"""
+    server = fakeredis.FakeServer()
+    workers = [
+        CacheService(redis_client=fakeredis.FakeRedis(server=server))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.enable_l1(ttl=60)
+    yield workers
+    for worker in workers:
+        worker.close()
+
+
+class TestLayeredCache:
+    """Tests for the L1 (per-worker) + Redis (L2) mode"""
+
+    def test_reads_are_served_from_l1(self, layered_pair):
+        """A second read should not need Redis"""
+        worker, _ = layered_pair
+        worker.set("user:id:1", {"id": "1"}, ttl=60)
+        worker.redis_client.delete("user:id:1")  # bypass invalidation
+
+        assert worker.get("user:id:1") == {"id": "1"}
+        assert worker.stats()["l1"]["hits"] == 1
+
+    def test_write_invalidates_other_workers(self, layered_pair):
+        """A write on one worker should drop stale L1 copies on the others"""
+        writer, reader = layered_pair
+        writer.set("user:id:1", {"role": "user"}, ttl=60)
+        assert reader.get("user:id:1") == {"role": "user"}
+
+        writer.set("user:id:1", {"role": "admin"}, ttl=60)
+
+        assert _wait_for(lambda: reader.get("user:id:1") == {"role": "admin"})
+
+    def test_delete_pattern_invalidates_other_workers(self, layered_pair):
+        """Pattern deletes should be broadcast as well"""
+        writer, reader = layered_pair
+        writer.set("product:barcode:1", {"barcode": "1"}, ttl=60)
+        assert reader.get("product:barcode:1") is not None
+
+        writer.delete_pattern("product:*")
+
+        assert _wait_for(lambda: reader.get("product:barcode:1") is None)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def any_backend(request):
+    """CacheService on each backend"""
+    if request.param == "memory":
+        return CacheService()
+    return CacheService(redis_client=fakeredis.FakeRedis())
+
+
+class TestTagInvalidation:
+    """Tests for generation-counter (tag) invalidation"""
+
+    def test_namespace_prefixes_are_implicit_tags(self, any_backend):
+        """Invalidating a namespace should expire every key under it"""
+        any_backend.set("user:id:1", {"id": "1"})
+        any_backend.set("user:email:a@b.c", {"id": "1"})
+        any_backend.set("product:barcode:1", {"barcode": "1"})
+
+        any_backend.invalidate_tags("user")
+
+        assert any_backend.get("user:id:1") is None
+        assert any_backend.get("user:email:a@b.c") is None
+        assert any_backend.get("product:barcode:1") == {"barcode": "1"}
+
+    def test_explicit_tags(self, any_backend):
+        """A key can belong to several tags; any of them invalidates it"""
+        any_backend.set("stats:branch:1", {"total": 3}, tags=["branch:1", "appointments"])
+        any_backend.set("stats:branch:2", {"total": 4}, tags=["branch:2", "appointments"])
+
+        any_backend.invalidate_tags("branch:1")
+        assert any_backend.get("stats:branch:1") is None
+        assert any_backend.get("stats:branch:2") == {"total": 4}
+
+        any_backend.invalidate_tags("appointments")
+        assert any_backend.get("stats:branch:2") is None
+
+    def test_only_namespace_segments_become_tags(self, any_backend):
+        """Caller-controlled key segments never create tag counters"""
+        for i in range(100):
+            any_backend.set(f"product:missing:{i}:x", True)
+
+        assert CacheService._implicit_tags("product:missing:7:x") == ["product", "product:missing"]
+        assert any_backend.get("product:missing:7:x") is True
+        any_backend.invalidate_tags("product:missing")
+        assert any_backend.get("product:missing:7:x") is None
+
+    def test_redis_tag_counters_expire(self):
+        service = CacheService(redis_client=fakeredis.FakeRedis())
+        service.set("user:id:1", {"id": "1"}, tags=["branch:1"])
+        service.invalidate_tags("branch:1")
+
+        for tag in ("user", "user:id", "branch:1"):
+            assert 0 < service.redis_client.ttl(TAG_KEY_PREFIX + tag) <= TAG_TTL_SECONDS
+
+    def test_user_input_is_hashed_in_keys(self):
+        assert key_part("8690000000001") == "8690000000001"
+        assert key_part("x:1") != key_part("x:2")
+        assert ":" not in key_part("x:1") and len(key_part("a" * 1000)) == 33
+
+    def test_rewrite_after_invalidation_is_visible(self, any_backend):
+        """Entries written after an invalidation carry the new generation"""
+        any_backend.set("user:id:1", {"v": 1})
+        any_backend.invalidate_tags("user")
+        any_backend.set("user:id:1", {"v": 2})
+
+        assert any_backend.get("user:id:1") == {"v": 2}
+
+    def test_invalidate_cache_sweeps_legacy_keys(self, monkeypatch):
+        """Keys written without an envelope are removed by the SCAN fallback"""
+        service = CacheService(redis_client=fakeredis.FakeRedis())
+        monkeypatch.setattr(sys.modules["app.core.cache"], "cache", service)
+        service.redis_client.set("user:id:legacy", '{"id": "legacy"}')
+        assert service.get("user:id:legacy") == {"id": "legacy"}
+
+        invalidate_cache("user", include_legacy=True)
+
+        assert service.get("user:id:legacy") is None
+
+    def test_delete_pattern_uses_glob_matching(self, any_backend):
+        """Pattern deletes should match globs rather than substrings"""
+        any_backend.set("user:id:1", 1)
+        any_backend.set("superuser:id:1", 2)
+
+        assert any_backend.delete_pattern("user:*") == 1
+        assert any_backend.get("superuser:id:1") == 2
+
+
+class TestCounters:
+    """Tests for atomic counters"""
+
+    def test_incr_and_read_back(self, any_backend):
+        assert any_backend.incr("counter:a") == 1
+        assert any_backend.incr("counter:a", 2) == 3
+
+        assert any_backend.get_counters(["counter:a", "counter:missing"]) == [3, 0]
+
+        any_backend.delete_counters(["counter:a"])
+        assert any_backend.get_counters(["counter:a"]) == [0]
+
+    def test_redis_failure_counts_in_memory(self):
+        server = fakeredis.FakeServer()
+        service = CacheService(redis_client=fakeredis.FakeRedis(server=server))
+        server.connected = False
+
+        assert service.incr("counter:fallback") == 1
+        assert service.incr("counter:fallback") == 2
+        assert service.get_counters(["counter:fallback"]) == [2]
+
+
+class TestAsyncCache:
+    """Tests for the asyncio cache client"""
+
+    def test_shares_entries_with_blocking_client(self):
+        """Async and blocking clients should see each other's writes and invalidations"""
+        server = fakeredis.FakeServer()
+        sync_client = CacheService(redis_client=fakeredis.FakeRedis(server=server))
+        async_client = AsyncCacheService(
+            sync_client, redis_client=fake_aioredis.FakeRedis(server=server)
+        )
+
+        async def scenario():
+            await async_client.set("user:id:1", {"id": "1"}, ttl=60)
+            assert sync_client.get("user:id:1") == {"id": "1"}
+
+            sync_client.invalidate_tags("user")
+            assert await async_client.get("user:id:1") is None
+
+            sync_client.set("user:id:2", {"id": "2"})
+            assert await async_client.get("user:id:2") == {"id": "2"}
+            await async_client.delete("user:id:2")
+            assert sync_client.get("user:id:2") is None
+            await async_client.close()
+
+        asyncio.run(scenario())
+
+    def test_tag_counters_expire(self):
+        """Counters written by the async client carry the same TTL as the blocking ones"""
+        server = fakeredis.FakeServer()
+        sync_redis = fakeredis.FakeRedis(server=server)
+        async_client = AsyncCacheService(
+            CacheService(redis_client=sync_redis), redis_client=fake_aioredis.FakeRedis(server=server)
+        )
+
+        async def scenario():
+            await async_client.set("user:id:1", {"id": "1"}, tags=["branch:1"])
+            await async_client.invalidate_tags("user")
+            await async_client.close()
+
+        asyncio.run(scenario())
+        for tag in ("user", "user:id", "branch:1"):
+            assert 0 < sync_redis.ttl(f"{TAG_KEY_PREFIX}{tag}") <= TAG_TTL_SECONDS
+
+    def test_memory_mode_uses_shared_store(self):
+        """Without Redis the async client should serve from the in-process store"""
+        sync_client = CacheService()
+        async_client = AsyncCacheService(sync_client)
+
+        async def scenario():
+            await async_client.set("product:barcode:1", {"barcode": "1"})
+            assert sync_client.get("product:barcode:1") == {"barcode": "1"}
+            assert await async_client.exists("product:barcode:1")
+
+        asyncio.run(scenario())
+
+
+class TestGetOrLoad:
+    """Tests for stampede protection (single-flight, early refresh, stale serving)"""
+
+    def test_miss_loads_and_caches(self, any_backend):
+        """The loader should run once and its result be served afterwards"""
+        calls = []
+        loader = lambda: calls.append(1) or {"total": 1}
+
+        assert any_backend.get_or_load("stats:x", loader, ttl=60) == {"total": 1}
+        assert any_backend.get_or_load("stats:x", loader, ttl=60) == {"total": 1}
+        assert len(calls) == 1
+
+    def test_concurrent_misses_share_one_load(self):
+        """Concurrent callers in one worker should wait for a single loader call"""
+        service = CacheService()
+        calls = []
+
+        def slow_loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"total": 42}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: service.get_or_load("stats:slow", slow_loader, ttl=60), range(8)))
+
+        assert results == [{"total": 42}] * 8
+        assert len(calls) == 1
+
+    def test_expired_entry_is_served_stale_while_refreshing(self):
+        """Callers arriving during a refresh should get the previous value"""
+        service = CacheService()
+        service.get_or_load("stats:stale", lambda: {"v": 1}, ttl=0, stale_ttl=60)
+        refresh_started = threading.Event()
+        release = threading.Event()
+
+        def blocking_loader():
+            refresh_started.set()
+            release.wait(2)
+            return {"v": 2}
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            refresher = pool.submit(service.get_or_load, "stats:stale", blocking_loader, 60, None, 1.0, 60)
+            refresh_started.wait(2)
+            assert service.get_or_load("stats:stale", lambda: {"v": 3}, ttl=60) == {"v": 1}
+            release.set()
+            assert refresher.result() == {"v": 2}
+
+        assert service.get_or_load("stats:stale", lambda: {"v": 4}, ttl=60) == {"v": 2}
+
+    def test_failed_refresh_serves_stale(self):
+        """A loader error during refresh should fall back to the stale value"""
+        service = CacheService()
+        service.get_or_load("stats:err", lambda: {"v": 1}, ttl=0, stale_ttl=60)
+
+        def failing_loader():
+            raise RuntimeError("database down")
+
+        assert service.get_or_load("stats:err", failing_loader, ttl=60) == {"v": 1}
+
+    def test_early_refresh_before_expiry(self):
+        """With a large beta a slow-to-compute value is refreshed before its TTL ends"""
+        service = CacheService()
+
+        def slow_loader():
+            time.sleep(0.05)
+            return {"v": 1}
+
+        service.get_or_load("stats:early", slow_loader, ttl=1)
+
+        assert service.get_or_load("stats:early", lambda: {"v": 2}, ttl=1, beta=1e6) == {"v": 2}
+
+    def test_waits_for_loader_in_other_worker(self):
+        """A cold miss should wait for the worker holding the Redis load lock"""
+        server = fakeredis.FakeServer()
+        holder = CacheService(redis_client=fakeredis.FakeRedis(server=server))
+        waiter = CacheService(redis_client=fakeredis.FakeRedis(server=server))
+        assert holder._acquire_load_lock("stats:shared")
+
+        def finish_in_holder():
+            time.sleep(0.2)
+            holder._load_and_store("stats:shared", lambda: {"v": "holder"}, 60, None, 60)
+            holder._release_load_lock("stats:shared")
+
+        threading.Thread(target=finish_in_holder).start()
+
+        assert waiter.get_or_load("stats:shared", lambda: {"v": "waiter"}, ttl=60) == {"v": "holder"}
+
+
+@pytest.fixture(params=["json", "orjson", "msgpack"])
+def codec(request):
+    """Each codec (skipped when its package is not installed)"""
+    codec = cache_codec.get_codec(request.param)
+    if codec.name != request.param:
+        pytest.skip(f"{request.param} not installed")
+    return codec
+
+
+class TestCacheCodec:
+    """Tests for cached value serialization"""
+
+    def test_round_trips_native_types(self, codec):
+        """UUIDs, aware datetimes and enums should come back with their types"""
+        value = {
+            "id": uuid.uuid4(),
+            "at": datetime.now(timezone.utc),
+            "status": AppointmentStatus.PENDING,
+            "items": [1, 2.5, None, "x"],
+        }
+
+        decoded = cache_codec.decode(cache_codec.encode(value, codec))
+
+        assert decoded == value
+        assert decoded["status"] is AppointmentStatus.PENDING
+
+    def test_large_payloads_are_compressed(self, codec):
+        """Values above the threshold should be stored compressed"""
+        value = {"text": "x" * (cache_codec.COMPRESS_THRESHOLD * 4)}
+
+        encoded = cache_codec.encode(value, codec)
+
+        assert encoded[3] & cache_codec.FLAG_COMPRESSED
+        assert len(encoded) < cache_codec.COMPRESS_THRESHOLD
+        assert cache_codec.decode(encoded) == value
+
+    def test_entries_from_other_codecs_are_readable(self):
+        """Switching CACHE_CODEC must not require flushing existing entries"""
+        value = {"id": uuid.uuid4()}
+        written = cache_codec.encode(value, cache_codec.get_codec("json"))
+
+        assert cache_codec.decode(written) == value
+        assert cache_codec.decode('{"id": "legacy"}') == {"id": "legacy"}
+
+    def test_cache_service_round_trips_native_types(self, any_backend):
+        """Values read back through CacheService keep their types"""
+        user_id = uuid.uuid4()
+        any_backend.set("user:id:1", {"id": user_id, "status": AppointmentStatus.PENDING})
+
+        assert any_backend.get("user:id:1") == {"id": user_id, "status": AppointmentStatus.PENDING}
+
+
+@pytest.fixture
+def isolated_cache(monkeypatch):
+    """Point the module-level cache used by @cached at a fresh service"""
+    service = CacheService()
+    monkeypatch.setattr(sys.modules["app.core.cache"], "cache", service)
+    return service
+
+
+class TestCachedDecorator:
+    """Tests for the @cached decorator"""
+
+    def test_caches_by_arguments(self, isolated_cache):
+        """Repeated calls with the same arguments hit the cache"""
+        calls = []
+
+        @cached("test:square", ttl=60)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        assert [square(2), square(2), square(3)] == [4, 4, 9]
+        assert calls == [2, 3]
+        assert cached_stats()["test:square"]["hits"] >= 1
+
+    def test_methods_skip_self_and_ignored_arguments(self, isolated_cache):
+        """Keys do not depend on the instance or the db session"""
+        class Repository:
+            def __init__(self, db):
+                self.db = db
+                self.calls = 0
+
+            @cached("test:repo", ttl=60, key=lambda item_id: item_id)
+            def count(self, item_id):
+                self.calls += 1
+                return 7
+
+        first, second = Repository(db=object()), Repository(db=object())
+
+        assert first.count("a") == 7
+        assert second.count("a") == 7
+        assert second.calls == 0
+        assert Repository.count.key_for("a") == "test:repo:a"
+
+    def test_pydantic_results_round_trip(self, isolated_cache):
+        """Returned DTOs are stored as dicts and rebuilt from the annotation"""
+        @cached("test:dto", ttl=60, key=lambda db: "all")
+        def statistics(db) -> GeneralStatistics:
+            return GeneralStatistics(
+                total_chats=1, average_user_rating=4.5, problems_solved_percent=50.0,
+                technician_dispatch_percent=10.0, diagnosis_accuracy_percent=90.0,
+                parts_accuracy_percent=80.0, average_technician_rating=4.0,
+                total_users=3, total_technicians=1, total_feedback_count=2,
+            )
+
+        statistics(None)
+        assert isinstance(isolated_cache.get("test:dto:all")["v"], dict)
+        assert isinstance(statistics(None), GeneralStatistics)
+
+    def test_invalidation_hooks(self, isolated_cache):
+        """invalidate drops one entry; invalidate_all and tags drop many"""
+        counter = {"n": 0}
+
+        @cached("test:inv", ttl=60, key=lambda item_id: item_id, tags=lambda item_id: [f"item:{item_id}"])
+        def load(item_id):
+            counter["n"] += 1
+            return counter["n"]
+
+        assert load("a") == 1
+        load.invalidate("a")
+        assert load("a") == 2
+        load.invalidate_all()
+        assert load("a") == 3
+        isolated_cache.invalidate_tags("item:a")
+        assert load("a") == 4
+        assert load("a") == 4
+
+
+class TestEntityCache:
+    """Tests for the read-through user/product snapshot cache"""
+
+    def _user(self, db_session):
+        user = models.User(email="snap@example.com", username="snap", role="user", is_active=True)
+        user.phone = "+905551112233"
+        return UserRepository(db_session).create(user)
+
+    def test_user_hit_skips_database(self, db_session, monkeypatch):
+        """A cached user is returned without querying"""
+        user = self._user(db_session)
+        assert entity_cache.get_user_snapshot(db_session, user.id).email == "snap@example.com"
+
+        monkeypatch.setattr(db_session, "query", lambda *a, **k: pytest.fail("queried the database"))
+        snapshot = entity_cache.get_user_snapshot(db_session, str(user.id))
+
+        assert snapshot.id == user.id
+        assert snapshot.phone == "+905551112233"
+
+    def test_snapshot_is_read_only_and_has_no_password(self, db_session):
+        """Snapshots cannot be modified and never carry the password hash"""
+        snapshot = entity_cache.get_user_snapshot(db_session, self._user(db_session).id)
+
+        with pytest.raises(AttributeError):
+            snapshot.role = "admin"
+        with pytest.raises(AttributeError):
+            snapshot.hashed_password
+
+    def test_user_writes_invalidate(self, db_session):
+        """Updates and deletes through the repository drop the snapshot"""
+        repo = UserRepository(db_session)
+        user = self._user(db_session)
+        entity_cache.get_user_snapshot(db_session, user.id)
+
+        user.role = "admin"
+        repo.update(user)
+        assert entity_cache.get_user_snapshot(db_session, user.id).role == "admin"
+
+        repo.delete(user)
+        assert entity_cache.get_user_snapshot(db_session, user.id).is_active is False
+
+        repo.hard_delete(user)
+        assert entity_cache.get_user_snapshot(db_session, user.id) is None
+
+    def test_product_writes_invalidate(self, db_session):
+        """Deleting a product through the repository drops its snapshot"""
+        repo = ProductRepository(db_session)
+        product = repo.create(models.Product(barcode="8690000000001", brand="Arcelik"))
+        assert entity_cache.get_product_snapshot(db_session, "8690000000001").brand == "Arcelik"
+
+        repo.delete(product)
+
+        assert entity_cache.get_product_snapshot(db_session, "8690000000001") is None
+
+
+class TestBranchInvalidation:
+    """Writes that feed branch statistics drop the branch's cached values"""
+
+    def _technician(self, db_session):
+        enterprise = models.Enterprise(name="Servis A.Ş.", contact_email="info@servis.example")
+        db_session.add(enterprise)
+        db_session.flush()
+        branch = models.Branch(enterprise_id=enterprise.id, name="Kadıköy")
+        db_session.add(branch)
+        db_session.flush()
+        technician = models.User(
+            email="tech@servis.example", username="tech", role="user", is_active=True,
+            enterprise_id=enterprise.id, branch_id=branch.id, enterprise_role="technician"
+        )
+        customer = models.User(email="customer@example.com", username="customer", role="user", is_active=True)
+        db_session.add_all([technician, customer])
+        db_session.commit()
+        return technician, customer
+
+    def test_appointment_writes_invalidate_branch(self, db_session):
+        technician, customer = self._technician(db_session)
+        tag = f"branch:{technician.branch_id}"
+        repo = AppointmentRepository(db_session)
+        cache.set("stats:branch", {"total": 0}, tags=[tag])
+
+        appointment = repo.add(models.Appointment(
+            customer_id=customer.id, technician_id=technician.id, product_brand="Arcelik",
+            product_model="A1", product_issue="Su akıtıyor", location="Kadıköy",
+            scheduled_for=datetime.now(timezone.utc)
+        ))
+        assert cache.get("stats:branch") is None
+
+        cache.set("stats:branch", {"total": 1}, tags=[tag])
+        repo.update_by_id(appointment.id, {"status": AppointmentStatus.COMPLETED})
+        assert cache.get("stats:branch") is None
+
+
+class TestBloomFilter:
+    """Tests for the in-memory Bloom filter"""
+
+    def test_no_false_negatives(self):
+        """Every added item is reported as present"""
+        bloom = BloomFilter(1000, 0.01)
+        items = [f"869{i:010d}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+
+        assert all(item in bloom for item in items)
+        assert len(bloom) == 1000
+
+    def test_false_positive_rate_is_bounded(self):
+        """Unknown items are rarely reported as present at capacity"""
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"known-{i}")
+
+        false_positives = sum(f"unknown-{i}" in bloom for i in range(10000))
+
+        assert false_positives < 300
+
+
+@pytest.fixture
+def built_barcode_filter(db_session):
+    """Barcode filter built from the test database, dropped afterwards"""
+    def build():
+        barcode_filter.build(db_session)
+        return barcode_filter
+    yield build
+    barcode_filter.reset()
+
+
+class TestBarcodeLookup:
+    """Tests for negative caching and Bloom filtering of barcode lookups"""
+
+    def test_unknown_barcode_is_cached_as_missing(self, db_session, monkeypatch):
+        """A second lookup of a missing barcode does not query"""
+        assert entity_cache.get_product_snapshot(db_session, "0000000000000") is None
+
+        monkeypatch.setattr(db_session, "query", lambda *a, **k: pytest.fail("queried the database"))
+        assert entity_cache.get_product_snapshot(db_session, "0000000000000") is None
+
+    def test_filter_rejects_without_querying(self, db_session, built_barcode_filter, monkeypatch):
+        """Barcodes outside the filter never reach the database"""
+        ProductRepository(db_session).create(models.Product(barcode="8690000000002"))
+        built_barcode_filter()
+        entity_cache.invalidate_product("8690000000002")
+
+        monkeypatch.setattr(db_session, "query", lambda *a, **k: pytest.fail("queried the database"))
+        assert entity_cache.get_product_snapshot(db_session, "garbage-123") is None
+
+    def test_created_products_are_found(self, db_session, built_barcode_filter):
+        """Products created after the build (or its negative entry) are visible"""
+        built_barcode_filter()
+        assert entity_cache.get_product_snapshot(db_session, "8690000000003") is None
+
+        ProductRepository(db_session).create(models.Product(barcode="8690000000003", brand="Vestel"))
+
+        assert entity_cache.get_product_snapshot(db_session, "8690000000003").brand == "Vestel"
+
+    def test_products_created_on_other_workers_are_found(self, db_session, built_barcode_filter):
+        """A barcode missing from this worker's filter is still found via the shared cache"""
+        built_barcode_filter()
+        product = ProductRepository(db_session).create(models.Product(barcode="8690000000004"))
+        barcode_filter._filter = BloomFilter(10)  # this worker's view predates the product
+
+        assert entity_cache.get_product_snapshot(db_session, "8690000000004").id == product.id
+
+    def test_stale_filter_negative_is_checked_against_database(self, db_session, built_barcode_filter, monkeypatch):
+        """Without a shared cache an old filter's negative does not hide new products"""
+        built_barcode_filter()
+        db_session.add(models.Product(barcode="8690000000005", brand="Beko"))  # created on another worker
+        db_session.commit()
+        monkeypatch.setattr(barcode_filter, "_swapped_at", 0.0)
+
+        assert entity_cache.get_product_snapshot(db_session, "8690000000005").brand == "Beko"
@@ -0,0 +1,75 @@
+"""
+Tests for ephemeral guest sessions
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import models
+from app.services import guest_sessions
+from app.tests.conftest import test_engine
+
+
+@pytest.fixture
+def guest_headers(client: TestClient, db_session, monkeypatch):
+    monkeypatch.setattr(guest_sessions, "GUEST_SESSIONS_EPHEMERAL", True)
+    db_session.add(models.Product(barcode="GUEST123456", brand="Test Brand", model="Test Model"))
+    db_session.commit()
+    response = client.post("/api/auth/guest", json={"barcode": "GUEST123456"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestEphemeralGuestSessions:
+    """Guests live in the cache until they store something"""
+
+    def test_guest_login_writes_no_rows(self, guest_headers, db_session):
+        assert db_session.query(models.User).count() == 0
+        assert db_session.query(models.UserSession).count() == 0
+
+    def test_guest_is_resolved_without_sql(self, client: TestClient, guest_headers):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", record)
+        try:
+            response = client.get("/api/users/me", headers=guest_headers)
+        finally:
+            event.remove(test_engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert response.json()["role"] == "guest"
+        assert statements == []
+
+    def test_chat_session_materializes_guest_once(self, client: TestClient, guest_headers, db_session):
+        me = client.get("/api/users/me", headers=guest_headers).json()
+
+        first = client.post("/api/chat/sessions", json={"title": "Bulaşık makinesi"}, headers=guest_headers)
+        second = client.post("/api/chat/sessions", json={"title": "Tekrar"}, headers=guest_headers)
+
+        assert first.status_code == 201 and second.status_code == 201
+        users = db_session.query(models.User).all()
+        assert [str(user.id) for user in users] == [me["id"]]
+        assert users[0].role == "guest"
+        assert client.get("/api/chat/sessions", headers=guest_headers).json()["total"] == 2
+
+    def test_logout_ends_guest_session(self, client: TestClient, guest_headers):
+        assert client.post("/api/auth/logout", headers=guest_headers).status_code == 200
+
+        assert client.get("/api/users/me", headers=guest_headers).status_code == 401
+
+
+class TestGuestSessionsWithoutSharedCache:
+    """A per-worker memory cache keeps the row-per-guest login"""
+
+    def test_memory_cache_defaults_to_guest_rows(self, client: TestClient, db_session, monkeypatch):
+        monkeypatch.setattr(guest_sessions, "GUEST_SESSIONS_EPHEMERAL", None)
+        db_session.add(models.Product(barcode="GUEST654321", brand="Test Brand", model="Test Model"))
+        db_session.commit()
+
+        response = client.post("/api/auth/guest", json={"barcode": "GUEST654321"})
+
+        assert response.status_code == 200
+        assert db_session.query(models.User).filter(models.User.role == "guest").count() == 1
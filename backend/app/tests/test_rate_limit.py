@@ -0,0 +1,75 @@
+"""
+Tests for the batched Redis rate-limit storage
+"""
+import fakeredis
+import pytest
+from limits import RateLimitItemPerHour
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+from app.core.rate_limit_storage import BatchedRedisStorage, KEY_PREFIX
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _worker(server):
+    storage = BatchedRedisStorage("batched+redis://localhost:6379/0", redis_client=fakeredis.FakeRedis(server=server))
+    return storage, SlidingWindowCounterRateLimiter(storage)
+
+
+class TestBatchedRedisStorage:
+    """Limits are shared across workers without a round trip per request"""
+
+    def test_registered_as_storage_scheme(self):
+        assert isinstance(storage_from_string("batched+redis://localhost:6379/0"), BatchedRedisStorage)
+
+    def test_small_limit_is_exact_across_workers(self, server):
+        limit = RateLimitItemPerHour(5)
+        workers = [_worker(server)[1], _worker(server)[1]]
+
+        allowed = [workers[i % 2].hit(limit, "login", "10.0.0.1") for i in range(8)]
+
+        assert allowed == [True] * 5 + [False] * 3
+
+    def test_large_limit_spends_leases_locally(self, server):
+        storage, limiter = _worker(server)
+        limit = RateLimitItemPerHour(100)
+
+        assert all(limiter.hit(limit, "users_me", "10.0.0.1") for _ in range(10))
+
+        assert storage.stats()["round_trips"] == 1
+        assert storage.stats()["local_hits"] == 9
+
+    def test_leases_never_exceed_the_shared_limit(self, server):
+        limit = RateLimitItemPerHour(100)
+        workers = [_worker(server)[1] for _ in range(3)]
+
+        allowed = sum(workers[i % 3].hit(limit, "users_me", "10.0.0.1") for i in range(150))
+
+        assert allowed <= 100
+        assert allowed >= 100 - 3 * 10  # at most one unspent lease per worker
+
+    def test_expired_leases_are_swept_and_handed_back(self, server):
+        storage, limiter = _worker(server)
+        limit = RateLimitItemPerHour(100)
+        limiter.hit(limit, "users_me", "10.0.0.1")
+        (lease,) = storage._leases.values()
+        counter = storage.redis.get(KEY_PREFIX + lease.window_key)
+
+        storage._sweep(lease.ends_at)
+
+        assert storage.stats()["leases"] == 0
+        assert int(storage.redis.get(KEY_PREFIX + lease.window_key)) == int(counter) - lease.remaining
+
+    def test_falls_back_to_per_worker_limits_without_redis(self, server):
+        storage, limiter = _worker(server)
+        server.connected = False
+        limit = RateLimitItemPerHour(2)
+
+        allowed = [limiter.hit(limit, "login", "10.0.0.1") for _ in range(3)]
+
+        assert allowed == [True, True, False]
+        assert storage.stats()["fallback_hits"] == 3
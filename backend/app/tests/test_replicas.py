@@ -0,0 +1,113 @@
+"""
+Tests for read-replica routing
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app import models
+from app.database import Base, get_db
+from app.database import connection
+from app.database.replicas import ReplicaPool, RoutingSession, primary_reads
+from app.services import entity_cache
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.sqlite'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.sqlite'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(bind=engine)
+    with replica.begin() as conn:
+        conn.execute(models.Product.__table__.insert().values(barcode="REPLICA1", brand="Brand", model="Model"))
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def _session(primary, replica):
+    session = sessionmaker(class_=RoutingSession, bind=primary)()
+    session.info["replica"] = replica
+    return session
+
+
+class TestRoutingSession:
+    """Reads go to the replica until the session writes"""
+
+    def test_reads_use_the_replica(self, engines):
+        session = _session(*engines)
+
+        assert session.query(models.Product).filter_by(barcode="REPLICA1").count() == 1
+
+    def test_reads_after_a_write_use_the_primary(self, engines):
+        session = _session(*engines)
+        session.add(models.Product(barcode="PRIMARY1", brand="Brand", model="Model"))
+        session.flush()
+
+        barcodes = [product.barcode for product in session.query(models.Product)]
+
+        assert barcodes == ["PRIMARY1"]
+        session.rollback()
+
+    def test_cache_loads_read_from_the_primary(self, engines):
+        """A lagging replica must not put invalidated rows back into the cache"""
+        session = _session(*engines)
+
+        assert entity_cache.get_product_snapshot(session, "REPLICA1") is None
+        assert session.info["replica"] is engines[1]
+
+    def test_primary_reads_keep_a_write_on_the_primary(self, engines):
+        session = _session(*engines)
+        with primary_reads(session):
+            session.add(models.Product(barcode="PRIMARY1", brand="Brand", model="Model"))
+            session.flush()
+
+        assert "replica" not in session.info
+        assert session.query(models.Product).filter_by(barcode="PRIMARY1").count() == 1
+        session.rollback()
+
+    def test_get_requests_are_routed_to_a_replica(self, engines, monkeypatch):
+        _, replica = engines
+        monkeypatch.setattr(connection, "replica_pool", ReplicaPool([replica]))
+
+        get_session = next(get_db(Request({"type": "http", "method": "GET", "headers": []})))
+        post_session = next(get_db(Request({"type": "http", "method": "POST", "headers": []})))
+
+        assert get_session.info["replica"] is replica
+        assert "replica" not in post_session.info
+        get_session.close()
+        post_session.close()
+
+
+class TestReplicaPool:
+    """Round-robin over healthy replicas"""
+
+    def test_round_robin(self, engines):
+        primary, replica = engines
+        pool = ReplicaPool([primary, replica])
+
+        assert [pool.choose() for _ in range(4)] == [primary, replica, primary, replica]
+
+    def test_unreachable_replica_is_ejected(self, engines, tmp_path):
+        _, replica = engines
+        broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.sqlite'}")
+        pool = ReplicaPool([broken, replica])
+
+        pool.check()
+
+        assert [pool.choose() for _ in range(2)] == [replica, replica]
+        assert [entry["healthy"] for entry in pool.stats()] == [False, True]
+
+    def test_lagging_replica_is_ejected_until_it_catches_up(self, engines, monkeypatch):
+        _, replica = engines
+        pool = ReplicaPool([replica], max_lag=5)
+        monkeypatch.setattr(pool, "_measure_lag", lambda engine: 30.0)
+        pool.check()
+        assert pool.choose() is None
+        assert pool.stats()[0]["lag_seconds"] == 30.0
+
+        monkeypatch.setattr(pool, "_measure_lag", lambda engine: 0.5)
+        pool.check()
+
+        assert pool.choose() is replica
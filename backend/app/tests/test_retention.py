@@ -0,0 +1,77 @@
+"""
+Tests for the retention engine
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from app import models
+from app.services import retention
+from app.services.retention import POLICIES, purge, run_retention, RetentionScheduler
+from app.tests.conftest import TestSessionLocal, _create_user_with_session
+
+
+def _add_history(db, count, age_days):
+    created_at = datetime.utcnow() - timedelta(days=age_days)
+    for i in range(count):
+        db.add(models.LoginHistory(email=f"user{i}@example.com", success=False, created_at=created_at))
+    db.commit()
+
+
+def _add_sessions(db, user, count, expired):
+    offset = timedelta(days=-1) if expired else timedelta(days=1)
+    for _ in range(count):
+        db.add(models.UserSession(
+            user_id=user.id, token_id=str(uuid.uuid4()), is_active=True,
+            expires_at=datetime.utcnow() + offset,
+        ))
+    db.commit()
+
+
+class TestRetention:
+    """Tests for chunked deletion and reporting"""
+
+    def test_deletes_only_rows_past_retention_in_chunks(self, db_session):
+        _add_history(db_session, 7, age_days=120)
+        _add_history(db_session, 3, age_days=1)
+
+        report = purge(db_session, POLICIES["login_history"], chunk_size=3, pause_ms=0)
+
+        assert report["deleted"] == 7
+        assert report["chunks"] == 3
+        assert report["seconds"] >= 0
+        assert db_session.query(models.LoginHistory).count() == 3
+
+    def test_dry_run_counts_without_deleting(self, db_session):
+        _add_history(db_session, 4, age_days=120)
+
+        report = purge(db_session, POLICIES["login_history"], chunk_size=2, pause_ms=0, dry_run=True)
+
+        assert report["deleted"] == 4
+        assert db_session.query(models.LoginHistory).count() == 4
+
+    def test_expired_sessions_are_removed(self, db_session):
+        user, _ = _create_user_with_session(db_session)
+        _add_sessions(db_session, user, 5, expired=True)
+
+        reports = run_retention(db_session, tables=["user_sessions"])
+
+        assert reports[0]["deleted"] == 5
+        assert db_session.query(models.UserSession).count() == 1
+
+    def test_scheduler_runs_once_per_interval(self, db_session):
+        _add_history(db_session, 2, age_days=120)
+        scheduler = RetentionScheduler(session_factory=TestSessionLocal, interval=3600)
+
+        first = scheduler.run_once()
+        second = scheduler.run_once()
+
+        assert {r["table"]: r["deleted"] for r in first}["login_history"] == 2
+        assert second == []
+        assert scheduler.stats()["last_reports"] == first
+
+    def test_cli_reports_each_table(self, monkeypatch, capsys):
+        monkeypatch.setattr(retention, "_default_session_factory", TestSessionLocal)
+
+        assert retention.main(["--table", "password_reset_tokens", "--dry-run"]) == 0
+
+        assert "password_reset_tokens: 0 rows" in capsys.readouterr().out
@@ -0,0 +1,140 @@
+"""
+Tests for the token revocation registry
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import models
+from app.services.revocation import RevocationRegistry, revocation_registry, REVOKED, ACTIVE, UNKNOWN
+from app.tests.conftest import test_engine, _create_user_with_session
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    """The global registry reloads from the test database"""
+    revocation_registry.reset()
+    yield
+    revocation_registry.reset()
+
+
+def _expiry():
+    return datetime.now(timezone.utc) + timedelta(days=1)
+
+
+class TestRevocationRegistry:
+    """Tests for the in-memory mirror"""
+
+    def test_revoked_jti_is_rejected(self, db_session):
+        registry = RevocationRegistry(enabled=True)
+        registry.revoke("revoked-jti", _expiry())
+
+        assert registry.check("revoked-jti", "user-1", time.time(), db_session) == REVOKED
+        assert registry.check("other-jti", "user-1", time.time(), db_session) == ACTIVE
+
+    def test_revoked_before_applies_to_older_tokens_only(self, db_session):
+        registry = RevocationRegistry(enabled=True)
+        registry.revoke_user("user-1", datetime.now(timezone.utc))
+
+        assert registry.check("jti", "user-1", time.time() - 60, db_session) == REVOKED
+        assert registry.check("jti", "user-1", time.time() + 60, db_session) == ACTIVE
+        assert registry.check("jti", "user-2", time.time() - 60, db_session) == ACTIVE
+
+    def test_loads_revoked_sessions_from_database(self, db_session):
+        """user_sessions stays the source of truth"""
+        user, _ = _create_user_with_session(db_session)
+        session = db_session.query(models.UserSession).filter_by(user_id=user.id).first()
+        session.is_active = False
+        db_session.commit()
+
+        registry = RevocationRegistry(enabled=True)
+        assert registry.check(session.token_id, str(user.id), time.time(), db_session) == REVOKED
+
+    def test_concurrent_checks_do_not_wait_for_a_running_sync(self, db_session, monkeypatch):
+        """Only one thread syncs; the others answer from the mirror (or defer to the database)"""
+        registry = RevocationRegistry(enabled=True)
+        registry.check("jti", "user-1", time.time(), db_session)
+        monkeypatch.setattr(registry, "load_from_db", lambda db: pytest.fail("synced twice"))
+        registry._synced_at = registry._db_synced_at = 0.0
+
+        with registry._syncing:  # another thread is syncing
+            assert registry.check("jti", "user-1", time.time(), db_session) == ACTIVE
+
+    def test_revocations_propagate_through_shared_log(self, db_session):
+        server = fakeredis.FakeServer()
+        worker_a = RevocationRegistry(redis_client=fakeredis.FakeRedis(server=server), enabled=True)
+        worker_b = RevocationRegistry(redis_client=fakeredis.FakeRedis(server=server), enabled=True)
+        assert worker_b.check("shared-jti", "user-1", time.time(), db_session) == ACTIVE
+
+        worker_a.revoke("shared-jti", _expiry())
+        worker_b.sync()
+
+        assert worker_b.check("shared-jti", "user-1", time.time(), db_session) == REVOKED
+
+    def test_without_shared_log_defers_to_database_by_default(self, db_session):
+        """Other workers would never hear of a revocation made here"""
+        registry = RevocationRegistry()
+        registry.revoke("revoked-jti", _expiry())
+
+        assert registry.check("other-jti", "user-1", time.time(), db_session) == UNKNOWN
+        assert RevocationRegistry(redis_client=fakeredis.FakeRedis()).active
+
+    def test_unreachable_log_defers_to_database(self, db_session):
+        server = fakeredis.FakeServer()
+        registry = RevocationRegistry(redis_client=fakeredis.FakeRedis(server=server), enabled=True)
+        server.connected = False
+
+        assert registry.check("any-jti", "user-1", time.time(), db_session) == UNKNOWN
+
+
+class TestRevocationInGetCurrentUser:
+    """get_current_user validates sessions through the registry"""
+
+    @pytest.fixture(autouse=True)
+    def enabled_registry(self, monkeypatch):
+        """Forced on, as for a single worker (by default it needs Redis)"""
+        monkeypatch.setattr(revocation_registry, "enabled", True)
+
+    def _session_queries(self, client, headers):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", record)
+        try:
+            response = client.get("/api/users/me", headers=headers)
+        finally:
+            event.remove(test_engine, "before_cursor_execute", record)
+        return response, [s for s in statements if s.startswith("SELECT") and "user_sessions" in s]
+
+    def test_not_revoked_token_needs_no_session_query(self, client: TestClient, auth_header):
+        client.get("/api/users/me", headers=auth_header)  # loads the registry
+
+        response, queries = self._session_queries(client, auth_header)
+
+        assert response.status_code == 200
+        assert queries == []
+
+    def test_revoke_all_rejects_other_tokens(self, client: TestClient, test_user, db_session):
+        from app.core.security import create_access_token
+
+        user, token = test_user
+        other_token, other_jti = create_access_token(data={"sub": str(user.id)})
+        db_session.add(models.UserSession(
+            user_id=user.id, token_id=other_jti, is_active=True, expires_at=datetime.utcnow() + timedelta(days=1)
+        ))
+        db_session.commit()
+        headers = {"Authorization": f"Bearer {token}"}
+        other_headers = {"Authorization": f"Bearer {other_token}"}
+        assert client.get("/api/users/me", headers=other_headers).status_code == 200
+
+        response = client.post("/api/auth/sessions/revoke-all", headers=headers)
+
+        assert response.json()["revoked_count"] == 1
+        assert client.get("/api/users/me", headers=other_headers).status_code == 401
+        assert client.get("/api/users/me", headers=headers).status_code == 200
@@ -0,0 +1,58 @@
+"""
+Tests for the SQLite file-database profile
+"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+from app.database import sqlite
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'branch.sqlite'}", **sqlite.engine_kwargs())
+    sqlite.configure(engine)
+    return engine
+
+
+class TestSqliteProfile:
+    """File databases get pooled WAL connections with tuned pragmas"""
+
+    def test_only_file_databases_are_tuned(self):
+        assert sqlite.is_file_database("sqlite:///./vfix_db.sqlite")
+        assert not sqlite.is_file_database("sqlite:///:memory:")
+        assert not sqlite.is_file_database("sqlite://")
+        assert not sqlite.is_file_database("postgresql://localhost/vfix")
+
+    def test_connections_use_wal_and_tuned_pragmas(self, tmp_path):
+        engine = _engine(tmp_path)
+        with engine.connect() as conn:
+            pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()  # noqa: E731
+
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == sqlite.SQLITE_BUSY_TIMEOUT_MS
+            assert pragma("cache_size") == -sqlite.SQLITE_CACHE_SIZE_KB
+        engine.dispose()
+
+    def test_connections_are_reused(self, tmp_path):
+        engine = _engine(tmp_path)
+        assert isinstance(engine.pool, QueuePool)
+
+        with engine.connect() as conn:
+            first = conn.connection.dbapi_connection
+        with engine.connect() as conn:
+            second = conn.connection.dbapi_connection
+
+        assert first is second
+        engine.dispose()
+
+    def test_optimizer_runs_optimize_on_stop(self, tmp_path):
+        engine = _engine(tmp_path)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+        optimizer = sqlite.SqliteOptimizer(interval=3600)
+        optimizer.start(engine)
+
+        optimizer.stop()
+
+        assert statements == ["PRAGMA optimize"]
+        engine.dispose()
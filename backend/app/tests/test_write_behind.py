@@ -0,0 +1,93 @@
+"""
+Tests for the write-behind buffer (session activity and login history)
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import models
+from app.services.write_behind import WriteBehindBuffer
+from app.tests.conftest import TestSessionLocal, test_engine, _create_user_with_session
+
+
+@pytest.fixture
+def buffer():
+    """Enabled buffer writing to the test database (flushed manually)"""
+    buffer = WriteBehindBuffer(session_factory=TestSessionLocal, enabled=True)
+    buffer._stopped.set()  # no background thread in tests
+    return buffer
+
+
+@pytest.fixture
+def statements():
+    """SQL statements executed against the test database"""
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(test_engine, "before_cursor_execute", record)
+
+
+class TestWriteBehindBuffer:
+    """Tests for coalescing and batching"""
+
+    def test_session_touches_are_coalesced(self, buffer, db_session):
+        """Only the latest timestamp per session is written"""
+        user, _ = _create_user_with_session(db_session)
+        session = db_session.query(models.UserSession).filter_by(user_id=user.id).first()
+        latest = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+        buffer.touch_session(session.id, latest)
+        buffer.touch_session(session.id, latest - timedelta(minutes=1))
+        assert buffer.pending() == 1
+
+        assert buffer.flush() == 1
+        db_session.expire_all()
+        stored = db_session.get(models.UserSession, session.id).last_used_at
+        assert stored.replace(tzinfo=timezone.utc) == latest
+
+    def test_flush_uses_one_update_and_one_insert(self, buffer, db_session, statements):
+        """A flush writes many rows in a single UPDATE and a single INSERT"""
+        _create_user_with_session(db_session)
+        _create_user_with_session(db_session, email="other@example.com")
+        for session in db_session.query(models.UserSession).all():
+            buffer.touch_session(session.id)
+        for i in range(5):
+            buffer.record_login(email=f"user{i}@example.com", user_id=None, success=False)
+        statements.clear()
+
+        assert buffer.flush() == 7
+
+        assert len([s for s in statements if s.startswith("UPDATE user_sessions")]) == 1
+        assert len([s for s in statements if s.startswith("INSERT INTO login_history")]) == 1
+        assert db_session.query(models.LoginHistory).count() == 5
+
+    def test_failed_rows_are_dropped_not_retried_forever(self, buffer, db_session):
+        """A bad row does not block the rest of the batch"""
+        row_id = uuid.uuid4()
+        buffer.record_login(id=row_id, email="ok@example.com", user_id=None, success=True)
+        buffer.record_login(id=row_id, email="duplicate@example.com", user_id=None, success=True)
+
+        buffer.flush()
+
+        assert db_session.query(models.LoginHistory).filter_by(email="ok@example.com").count() == 1
+        assert buffer.pending() == 0
+        assert buffer.stats()["dropped"] == 1
+
+    def test_session_touches_by_token_id(self, buffer, db_session):
+        """Callers that only know the jti are flushed by token_id"""
+        user, _ = _create_user_with_session(db_session)
+        session = db_session.query(models.UserSession).filter_by(user_id=user.id).first()
+        latest = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+        buffer.touch_session_token(session.token_id, latest)
+
+        assert buffer.flush() == 1
+        db_session.expire_all()
+        stored = db_session.get(models.UserSession, session.id).last_used_at
+        assert stored.replace(tzinfo=timezone.utc) == latest
@@ -0,0 +1,115 @@
+"""
+Tests for the single-writer group-commit queue
+"""
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.database import write_queue as write_queue_module
+from app.database.write_queue import WriteQueue, create_writer_engine
+from app.services import repositories
+from app.services.repositories import ChatMessageRepository, ChatSessionRepository
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'branch.sqlite'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    writer = create_writer_engine(url)
+    yield sessionmaker(bind=engine, expire_on_commit=False), sessionmaker(bind=writer, expire_on_commit=False)
+    writer.dispose()
+    engine.dispose()
+
+
+def _add_product(db, barcode):
+    db.add(models.Product(barcode=barcode, brand="Brand", model="Model"))
+    db.flush()
+    return barcode
+
+
+class TestWriteQueue:
+    """Writes from many threads are committed together by one writer"""
+
+    def test_concurrent_writes_are_group_committed(self, database):
+        sessions, writer_sessions = database
+        write_queue = WriteQueue(session_factory=writer_sessions, enabled=True, max_wait_ms=50)
+        results = []
+        threads = [
+            threading.Thread(target=lambda i=i: results.append(write_queue.run(_add_product, f"BC{i}")))
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        write_queue.close()
+
+        assert sorted(results) == sorted(f"BC{i}" for i in range(20))
+        assert sessions().query(models.Product).count() == 20
+        assert write_queue.stats()["commits"] < 20
+
+    def test_failing_job_does_not_fail_its_batch(self, database):
+        sessions, writer_sessions = database
+        write_queue = WriteQueue(session_factory=writer_sessions, enabled=True, max_wait_ms=50)
+
+        futures = [write_queue.submit(_add_product, barcode) for barcode in ("DUP", "DUP", "OTHER")]
+        write_queue.close()
+
+        assert futures[0].result() == "DUP"
+        assert isinstance(futures[1].exception(), IntegrityError)
+        assert futures[2].result() == "OTHER"
+        assert sessions().query(models.Product).count() == 2
+        assert write_queue.stats()["failed_jobs"] == 1
+
+    def test_failing_fire_and_forget_job_is_logged(self, database, caplog):
+        sessions, writer_sessions = database
+        write_queue = WriteQueue(session_factory=writer_sessions, enabled=True)
+
+        with caplog.at_level(logging.ERROR, logger="app.database.write_queue"):
+            write_queue.submit(_add_product, "DUP")
+            write_queue.submit(_add_product, "DUP")
+            write_queue.close()
+
+        assert "Write job _add_product failed" in caplog.text
+
+    def test_timed_out_job_is_cancelled_before_it_runs(self, database, monkeypatch):
+        sessions, writer_sessions = database
+        write_queue = WriteQueue(session_factory=writer_sessions, enabled=True)
+        monkeypatch.setattr(write_queue_module, "WRITE_QUEUE_TIMEOUT", 0.05)
+        started, release = threading.Event(), threading.Event()
+        write_queue.submit(lambda db: started.set() or release.wait(5))
+        started.wait(5)
+
+        with pytest.raises(FutureTimeoutError):
+            write_queue.run(_add_product, "LATE")
+        release.set()
+        write_queue.close()
+
+        assert sessions().query(models.Product).count() == 0
+
+    def test_chat_writes_go_through_the_queue(self, database, monkeypatch):
+        sessions, writer_sessions = database
+        write_queue = WriteQueue(session_factory=writer_sessions, enabled=True)
+        monkeypatch.setattr(repositories, "write_queue", write_queue)
+        db = sessions()
+        user = models.User(email="queue@example.com", username="queue_user")
+        db.add(user)
+        db.commit()
+        chat = ChatSessionRepository(db).create(str(user.id), "Queue")
+
+        message = ChatMessageRepository(db).create(str(chat.id), "user", content="Merhaba")
+        ChatSessionRepository(db).increment_message_count(str(chat.id))
+        write_queue.close()
+
+        assert message.content == "Merhaba"
+        check = sessions()
+        assert [m.id for m in ChatMessageRepository(check).get_by_session(str(chat.id))] == [message.id]
+        assert check.get(models.ChatSession, chat.id).message_count == 1